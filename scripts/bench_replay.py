@@ -0,0 +1,375 @@
+"""
+Replay benchmark for SmartHomeAgent.handle.
+
+Replays a corpus of user utterances through the real agent (router, query
+engine, fastpath, escalation policy, memory, state) with:
+- a no-op action executor,
+- a deterministic mock llm_responder with configurable injected latency,
+- an isolated temporary data dir (SMART_HOME_DATA_DIR), so data/ is never
+  touched; rules.json and the intent model are copied in unless --no-seed.
+
+Reports p50/p95/p99 latency per route type, fastpath hit rate, file I/O
+counts (opens for read/write and renames under the data dir, collected with
+an audit hook) and turns per second, and writes everything as JSON so a run
+can be diffed against a baseline:
+
+    python scripts/bench_replay.py --corpus data/memory/long_term.jsonl --repeat 20
+    python scripts/bench_replay.py --corpus bench.yaml --llm-latency-ms 400 --out new.json --baseline old.json
+
+Corpus formats: .jsonl (uses the "user" field, e.g. long_term.jsonl /
+history.jsonl), .yaml/.yml (a list of strings or of {text: ...}, or
+{turns: [...]}; needs PyYAML) and plain .txt (one utterance per line).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_CORPUS = PROJECT_ROOT / "data" / "memory" / "long_term.jsonl"
+DEFAULT_OUT = PROJECT_ROOT / "data" / "metrics" / "bench_replay.json"
+# 跑之前複製進暫存 data dir 的唯讀輸入
+SEED_FILES = ("memory/rules.json", "memory/learned_commands.json", "models/intent_nb.npz")
+# baseline 比較時看的指標：(路徑, 越大越好?)
+DIFF_METRICS = (
+    (("overall", "p50_ms"), False),
+    (("overall", "p95_ms"), False),
+    (("overall", "p99_ms"), False),
+    (("throughput", "turns_per_sec"), True),
+    (("fastpath", "hit_rate"), True),
+    (("io", "write_opens"), False),
+    (("io", "read_opens"), False),
+    (("io", "renames"), False),
+)
+
+
+# -------------------------
+# Corpus
+# -------------------------
+def _load_yaml(path: Path) -> List[str]:
+    try:
+        import yaml  # PyYAML (optional)
+    except ImportError:
+        raise SystemExit("讀取 YAML 語料需要 PyYAML：pip install pyyaml")
+    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = data.get("turns") or data.get("corpus") or []
+    out = []
+    for item in data or []:
+        if isinstance(item, dict):
+            item = item.get("text") or item.get("user")
+        if item:
+            out.append(str(item))
+    return out
+
+
+def load_corpus(paths: Sequence[str]) -> List[str]:
+    texts: List[str] = []
+    for raw in paths:
+        path = Path(raw)
+        if not path.exists():
+            raise SystemExit(f"找不到語料檔: {path}")
+        suffix = path.suffix.lower()
+        if suffix in (".yaml", ".yml"):
+            texts.extend(_load_yaml(path))
+        elif suffix == ".jsonl":
+            for line in path.read_text(encoding="utf-8", errors="ignore").splitlines():
+                try:
+                    user = (json.loads(line).get("user") or "").strip()
+                except Exception:
+                    continue
+                if user:
+                    texts.append(user)
+        else:
+            texts.extend(ln.strip() for ln in path.read_text(encoding="utf-8").splitlines() if ln.strip())
+    return texts
+
+
+# -------------------------
+# Instrumentation
+# -------------------------
+class IOCounter:
+    """用 audit hook 計算 data dir 底下的 open / rename 次數（含背景 write-behind 執行緒）。"""
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.realpath(root)
+        self.active = False
+        self.counts: Counter = Counter()
+        self.by_file: Counter = Counter()
+        self._lock = threading.Lock()
+        sys.addaudithook(self._hook)
+
+    def _inside(self, path: Any) -> Optional[str]:
+        if not isinstance(path, (str, bytes, os.PathLike)):
+            return None
+        path = os.path.realpath(os.fsdecode(path))
+        if not path.startswith(self.root):
+            return None
+        return os.path.relpath(path, self.root)
+
+    def _hook(self, event: str, args: tuple) -> None:
+        if not self.active:
+            return
+        if event == "open":
+            rel = self._inside(args[0])
+            if rel is None:
+                return
+            mode = args[1] if isinstance(args[1], str) else ""
+            flags = args[2] if len(args) > 2 and isinstance(args[2], int) else 0
+            writing = any(c in mode for c in "wax+") or bool(flags & (os.O_WRONLY | os.O_RDWR))
+            kind = "write_opens" if writing else "read_opens"
+        elif event == "os.rename":
+            rel = self._inside(args[1])
+            if rel is None:
+                return
+            kind = "renames"
+        else:
+            return
+        # 暫存檔名每次都不同，歸到同一個目錄底下
+        if os.path.basename(rel).startswith(".tmp-"):
+            rel = os.path.join(os.path.dirname(rel), ".tmp-*")
+        with self._lock:
+            self.counts[kind] += 1
+            self.by_file[f"{kind}:{rel}"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "read_opens": self.counts["read_opens"],
+                "write_opens": self.counts["write_opens"],
+                "renames": self.counts["renames"],
+                "by_file": dict(sorted(self.by_file.items())),
+            }
+
+
+class MockLLM:
+    """Deterministic llm_responder: fixed latency (+ per-text jitter) and a reply derived from the text."""
+
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 0.0) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+
+    def __call__(self, user_input: str, memory_context: str) -> str:
+        self.calls += 1
+        h = zlib.crc32(user_input.encode("utf-8"))
+        delay = self.latency_ms + (h % 1000) / 1000.0 * self.jitter_ms
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return f"[mock-llm #{h % 10000:04d}] 收到：{user_input}"
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def latency_summary(values_ms: List[float]) -> Dict[str, Any]:
+    values = sorted(values_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+# -------------------------
+# Replay
+# -------------------------
+def run_replay(texts: List[str], args: argparse.Namespace, data_dir: str) -> Dict[str, Any]:
+    # src.* 必須在 SMART_HOME_DATA_DIR 設好之後才 import，所有路徑才會指到暫存目錄
+    from src.core.agent import SmartHomeAgent
+    from src.core.escalation_policy import DEFAULT_ESCALATION_POLICY
+    from src.core.memory_agent import MemoryAgent
+    from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS
+    from src.core.router import Router
+    from src.core.state_manager import StateManager
+    from src.llm.response_cache import DEFAULT_RESPONSE_CACHE
+    from src.utils.history_store import DEFAULT_HISTORY_STORE
+
+    io_counter = IOCounter(data_dir)
+    mock_llm = MockLLM(args.llm_latency_ms, args.llm_jitter_ms)
+    memory = MemoryAgent()
+    state = StateManager()
+    agent = SmartHomeAgent(
+        router=Router(),
+        memory=memory,
+        state=state,
+        action_executor=lambda actions: None,
+        llm_responder=mock_llm,
+    )
+
+    for text in texts[: args.warmup]:
+        agent.handle(text)
+
+    per_route: Dict[str, List[float]] = {}
+    all_ms: List[float] = []
+    statuses: Counter = Counter()
+    fastpath_hits = 0
+    io_counter.active = True
+    wall_start = time.perf_counter()
+    for text in texts:
+        start = time.perf_counter()
+        out = agent.handle(text)
+        ms = (time.perf_counter() - start) * 1000
+        all_ms.append(ms)
+        per_route.setdefault(out.route_type.value, []).append(ms)
+        statuses[state.status] += 1
+        if state.status == "executed" and out.actions:
+            fastpath_hits += 1
+    wall = time.perf_counter() - wall_start
+    # 把 write-behind 還沒寫的東西寫出去，I/O 次數才完整
+    for flushable in (state, memory, DEFAULT_RESPONSE_CACHE, DEFAULT_LEARNED_COMMANDS):
+        flushable.flush()
+    DEFAULT_HISTORY_STORE.close()
+    io_counter.active = False
+
+    return {
+        "overall": latency_summary(all_ms),
+        "routes": {route: latency_summary(v) for route, v in sorted(per_route.items())},
+        "statuses": dict(statuses),
+        "fastpath": {
+            "hits": fastpath_hits,
+            "hit_rate": round(fastpath_hits / len(texts), 4) if texts else 0.0,
+            "llm_calls": mock_llm.calls,
+            "escalation": DEFAULT_ESCALATION_POLICY.snapshot(),
+        },
+        "throughput": {
+            "turns": len(texts),
+            "wall_sec": round(wall, 4),
+            "turns_per_sec": round(len(texts) / wall, 2) if wall > 0 else 0.0,
+        },
+        "io": io_counter.snapshot(),
+    }
+
+
+def diff_against(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for path, higher_is_better in DIFF_METRICS:
+        old, new = baseline, current
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else {}
+            new = new.get(key, {}) if isinstance(new, dict) else {}
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        regressed = change < 0 if higher_is_better else change > 0
+        rows.append({
+            "metric": ".".join(path),
+            "baseline": old,
+            "current": new,
+            "change": round(change, 4) if change != float("inf") else None,
+            "regressed": regressed and new != old,
+        })
+    return rows
+
+
+def print_report(results: Dict[str, Any], diff: Optional[List[Dict[str, Any]]]) -> None:
+    tp = results["throughput"]
+    print(f"\n=== Replay: {tp['turns']} turns, {tp['wall_sec']} s, {tp['turns_per_sec']} turns/s ===")
+    print(f"{'route':14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, s in list(results["routes"].items()) + [("ALL", results["overall"])]:
+        print(f"{route:14} {s['count']:>6} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f}")
+    fp = results["fastpath"]
+    print(f"fastpath hit rate: {fp['hit_rate']:.1%} ({fp['hits']} hits, {fp['llm_calls']} mock LLM calls)")
+    io = results["io"]
+    print(f"file I/O: {io['read_opens']} read opens, {io['write_opens']} write opens, {io['renames']} renames")
+    if diff:
+        print("\n=== vs baseline ===")
+        for row in diff:
+            change = "n/a" if row["change"] is None else f"{row['change']:+.1%}"
+            flag = "  <-- regression" if row["regressed"] else ""
+            print(f"{row['metric']:26} {row['baseline']:>12} -> {row['current']:>12}  {change}{flag}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Replay a corpus through SmartHomeAgent.handle with a mock LLM.")
+    ap.add_argument("--corpus", action="append", help="jsonl / yaml / txt；可重複指定（預設 long_term.jsonl）")
+    ap.add_argument("--repeat", type=int, default=1, help="整份語料重播幾次")
+    ap.add_argument("--warmup", type=int, default=0, help="前幾句只暖機不計時")
+    ap.add_argument("--llm-latency-ms", type=float, default=300.0)
+    ap.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    ap.add_argument("--no-seed", action="store_true", help="不複製 rules.json / 學習指令 / 意圖模型")
+    ap.add_argument("--keep-data", action="store_true", help="保留暫存 data dir（檢查寫了什麼）")
+    ap.add_argument("--out", default=str(DEFAULT_OUT), help="JSON 結果輸出路徑")
+    ap.add_argument("--baseline", help="之前的 JSON 結果，用來比較")
+    ap.add_argument("--max-regression", type=float, default=None, help="任何指標變差超過這個比例就回傳 1（例如 0.2）")
+    args = ap.parse_args(argv)
+
+    texts = load_corpus(args.corpus or [str(DEFAULT_CORPUS)]) * max(1, args.repeat)
+    if not texts:
+        print("語料是空的。")
+        return 1
+
+    data_dir = tempfile.mkdtemp(prefix="smarthome-bench-")
+    if not args.no_seed:
+        for rel in SEED_FILES:
+            src = PROJECT_ROOT / "data" / rel
+            if src.exists():
+                dst = Path(data_dir) / rel
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+    os.environ["SMART_HOME_DATA_DIR"] = data_dir
+    os.environ.setdefault("RUNTIME_MODE", "desktop")
+
+    try:
+        results = run_replay(texts, args, data_dir)
+    finally:
+        if args.keep_data:
+            print(f"暫存 data dir: {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results["meta"] = {
+        "corpus": args.corpus or [str(DEFAULT_CORPUS)],
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_jitter_ms": args.llm_jitter_ms,
+        "seeded": not args.no_seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": int(time.time()),
+    }
+
+    diff = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            diff = diff_against(json.load(f), results)
+        results["baseline_diff"] = diff
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print_report(results, diff)
+    print(f"\n結果已寫入 {out}")
+
+    if diff and args.max_regression is not None:
+        worst = [r for r in diff if r["regressed"] and (r["change"] is None or abs(r["change"]) > args.max_regression)]
+        if worst:
+            print(f"有 {len(worst)} 項指標退步超過 {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -94,6 +94,9 @@ source .venv/bin/activate
 pip install --upgrade pip
 pip install -r requirements.txt
 
+echo "Step 5: 訓練本地意圖模型..."
+python -m src.core.intent_model train
+
 # 完成
 echo ""
 echo "安裝完成！"
@@ -0,0 +1,318 @@
+"""Audio Layer - 常駐錄音引擎
+
+sounddevice 開一條 16 kHz mono 的 InputStream，callback 把 PCM 寫進預先配置好的
+ring buffer；要辨識時直接從 ring 切出 float32 陣列交給 faster-whisper，
+不再經過 arecord 子行程與 SD 卡上的 latest.wav。
+
+- PcmRing       : 固定大小的 float32 環形緩衝，位置用「累計樣本數」表示
+- CaptureEngine : 管理 InputStream 與 ring，提供 record(duration) / record_utterance() / read(start, end)
+- archive_wav() : 選用，把一段 PCM 另存成 wav（除錯用，預設關閉）
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+# 確保專案根目錄在 sys.path 中（直接執行本檔時需要）
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+try:
+    import sounddevice as sd
+except Exception:  # PortAudio 不存在時（桌面測試 / CI）
+    sd = None
+
+import src.utils.config as config
+from src.audio.endpointer import EndpointResult
+
+
+class PcmRing:
+    """預先配置的 float32 環形緩衝。寫入端是音訊 callback，讀取端是辨識流程。"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._written = 0  # 累計寫入的樣本數（單調遞增）
+        self._cond = threading.Condition()
+
+    @property
+    def position(self) -> int:
+        """目前累計寫入的樣本數，可當作之後 read() 的起點。"""
+        with self._cond:
+            return self._written
+
+    @property
+    def oldest(self) -> int:
+        """ring 裡還保留著的最舊樣本位置。"""
+        with self._cond:
+            return max(0, self._written - self.capacity)
+
+    def write(self, samples: np.ndarray) -> None:
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        n = samples.shape[0]
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        with self._cond:
+            start = (self._written + n - samples.shape[0]) % self.capacity
+            first = min(samples.shape[0], self.capacity - start)
+            self._buf[start:start + first] = samples[:first]
+            if first < samples.shape[0]:
+                self._buf[:samples.shape[0] - first] = samples[first:]
+            self._written += n
+            self._cond.notify_all()
+
+    def read(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """複製 [start, end) 這段樣本；已被覆蓋掉的部分會自動裁掉。"""
+        with self._cond:
+            end = self._written if end is None else min(end, self._written)
+            start = max(start, self._written - self.capacity, 0)
+            if end <= start:
+                return np.zeros(0, dtype=np.float32)
+            i, j = start % self.capacity, end % self.capacity
+            if i < j:
+                return self._buf[i:j].copy()
+            return np.concatenate((self._buf[i:], self._buf[:j]))
+
+    def wait_until(self, position: int, timeout: Optional[float] = None) -> bool:
+        """阻塞直到累計寫入量 >= position；逾時回傳 False。"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._written >= position, timeout)
+
+    def clear(self) -> None:
+        with self._cond:
+            self._written = 0
+            self._buf.fill(0.0)
+
+
+_ALSA_PORT_RE = re.compile(r"(?:plug)?hw:(\d+)(?:,(\d+))?")
+
+
+def alsa_device_name(port: Optional[str]) -> Optional[str]:
+    """把 arecord 用的 "plughw:3,0" 轉成 sounddevice 可以用子字串比對的 "hw:3,0"；看不懂回傳 None。"""
+    m = _ALSA_PORT_RE.search(port or "")
+    if m is None:
+        return None
+    return f"hw:{m.group(1)},{m.group(2) or 0}"
+
+
+class LinearResampler:
+    """串流用的線性內插重取樣（麥克風只支援 44.1/48 kHz 時轉成 16 kHz）；跨 block 保持相位。"""
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate = int(src_rate)
+        self.dst_rate = int(dst_rate)
+        self.step = self.src_rate / self.dst_rate
+        self._pos = 0.0  # 下一個輸出樣本在 [上一塊最後一個樣本, 這一塊...] 裡的位置
+        self._prev: Optional[np.ndarray] = None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        buf = samples if self._prev is None else np.concatenate((self._prev, samples))
+        n = buf.shape[0]
+        if n < 2:
+            self._prev = buf
+            return np.zeros(0, dtype=np.float32)
+        idx = np.arange(self._pos, n - 1, self.step)
+        out = np.interp(idx, np.arange(n), buf).astype(np.float32)
+        self._pos += idx.shape[0] * self.step - (n - 1)
+        self._prev = buf[-1:]
+        return out
+
+
+class CaptureEngine:
+    """常駐的麥克風錄音引擎：start() 之後音訊持續流進 ring buffer。"""
+
+    def __init__(
+        self,
+        device: Union[str, int, None] = config.AUDIO_INPUT_DEVICE,
+        sample_rate: int = config.AUDIO_SAMPLE_RATE,
+        block_ms: int = config.AUDIO_BLOCK_MS,
+        ring_sec: float = config.AUDIO_RING_SEC,
+    ):
+        # 沒指定時沿用 arecord 的 DEVICE_PORT（樹莓派上的 USB 麥克風），而不是 PortAudio 的系統預設
+        self._device_from_port = device is None
+        self.device = device if device is not None else alsa_device_name(config.DEVICE_PORT)
+        self.sample_rate = int(sample_rate)
+        self.block_ms = block_ms
+        self.blocksize = max(1, int(self.sample_rate * block_ms / 1000))
+        self.device_rate = self.sample_rate  # 實際開串流的取樣率（裝置不支援 16 kHz 時用原生取樣率再重取樣）
+        self._resampler: Optional[LinearResampler] = None
+        self.ring = PcmRing(int(self.sample_rate * ring_sec))
+        self.overflows = 0
+        # 這個位置之前的音訊可能含有自己播的 TTS，不拿來估噪音底
+        self.playback_end = 0
+        self._stream = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return sd is not None
+
+    @property
+    def running(self) -> bool:
+        return self._stream is not None
+
+    def _resolve_device(self):
+        """DEVICE_PORT 推出來的裝置不存在時（例如桌機開發）退回系統預設；明確指定的就照用。"""
+        if not self._device_from_port or self.device is None:
+            return self.device
+        try:
+            sd.query_devices(self.device, "input")
+        except ValueError:
+            print(f"⚠️ 找不到錄音裝置 {self.device}（DEVICE_PORT={config.DEVICE_PORT}），改用系統預設麥克風")
+            return None
+        return self.device
+
+    def _callback(self, indata, frames, time_info, status) -> None:
+        if status and status.input_overflow:
+            self.overflows += 1
+        # int16 -> float32 [-1, 1)，faster-whisper 要的格式
+        samples = indata[:, 0].astype(np.float32) * (1.0 / 32768.0)
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        self.ring.write(samples)
+
+    def _stream_rate(self, device) -> int:
+        """
+        裝置支援 16 kHz 就直接用；不支援（只吃 44.1/48 kHz 的 USB 麥克風，
+        arecord 以前靠 plughw 的 plug 層轉換）就用裝置預設取樣率，callback 裡再重取樣。
+        """
+        try:
+            sd.check_input_settings(device=device, samplerate=self.sample_rate, channels=1, dtype="int16")
+            return self.sample_rate
+        except Exception:
+            rate = int(sd.query_devices(device, "input")["default_samplerate"])
+            print(f"ℹ️ 錄音裝置不支援 {self.sample_rate} Hz，改用 {rate} Hz 錄音再轉換")
+            return rate
+
+    def start(self) -> None:
+        """開啟 InputStream（重複呼叫無副作用）。"""
+        if sd is None:
+            raise RuntimeError("sounddevice 未安裝或找不到 PortAudio，請先安裝 requirements.txt")
+        with self._lock:
+            if self._stream is not None:
+                return
+            device = self._resolve_device()
+            rate = self._stream_rate(device)
+            self.device_rate = rate
+            self._resampler = None if rate == self.sample_rate else LinearResampler(rate, self.sample_rate)
+            stream = sd.InputStream(
+                samplerate=rate,
+                channels=1,
+                dtype="int16",
+                blocksize=max(1, int(rate * self.block_ms / 1000)),
+                device=device,
+                callback=self._callback,
+            )
+            stream.start()
+            self._stream = stream
+
+    def stop(self) -> None:
+        with self._lock:
+            stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def mark(self) -> int:
+        """回傳目前位置，之後可用 read(mark) 取出這之後的音訊。"""
+        return self.ring.position
+
+    def read(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        return self.ring.read(start, end)
+
+    def mark_playback_end(self) -> None:
+        """喇叭剛播完回覆時呼叫：之後估噪音底只用這個位置之後的音訊。"""
+        self.playback_end = self.mark()
+
+    def record(self, duration: float) -> np.ndarray:
+        """從現在開始錄 duration 秒，回傳 float32 陣列（不寫檔）。"""
+        self.start()
+        start = self.mark()
+        end = start + int(duration * self.sample_rate)
+        # callback 停掉時不要卡死：多給一秒緩衝
+        if not self.ring.wait_until(end, timeout=duration + 1.0):
+            print("⚠️ 錄音資料不足，麥克風可能沒有輸入")
+        return self.read(start, end)
+
+    def record_utterance(self, endpointer, start: Optional[int] = None) -> "EndpointResult":
+        """
+        邊錄邊做端點偵測，說完話就停；回傳裁好的語音與起訖時間。
+        start 可以指向 ring 裡過去的位置（例如喚醒詞結束處），已錄到的部分會先補餵進去。
+        """
+        self.start()
+        endpointer.reset()
+        start = self.mark() if start is None else max(start, self.ring.oldest)
+        # ring 一直在錄：噪音底用起點前幾秒的音訊估（開頭可能就是語音，也可能一直有風扇聲），
+        # 但不含剛播完的 TTS；剩下太短時 calibrate() 不動作，改由開頭幾個 frame 校正
+        calib_from = max(start - 3 * self.sample_rate, self.playback_end)
+        endpointer.calibrate(self.read(calib_from, start))
+        pos = start
+        step = endpointer.frame_len
+        while not endpointer.done:
+            # 正常情況下一個 frame 只要數十毫秒；一秒都沒進資料代表麥克風停了
+            if not self.ring.wait_until(pos + step, timeout=1.0):
+                print("⚠️ 錄音資料中斷，麥克風可能沒有輸入")
+                break
+            end = self.ring.position
+            endpointer.feed(self.read(pos, end))
+            pos = end
+        return endpointer.result(self.read(start, pos))
+
+    def close(self) -> None:
+        self.stop()
+
+
+def archive_wav(pcm: np.ndarray, path: Union[str, Path], sample_rate: int = config.AUDIO_SAMPLE_RATE) -> str:
+    """把 float32 PCM 存成 16-bit wav（只在需要留存錄音時呼叫）。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = (np.clip(pcm, -1.0, 32767.0 / 32768.0) * 32768.0).astype("<i2")
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(int(sample_rate))
+        wf.writeframes(data.tobytes())
+    return str(path)
+
+
+_DEFAULT_CAPTURE: Optional[CaptureEngine] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_capture() -> CaptureEngine:
+    """共用的錄音引擎（第一次用到才建立，串流只開一次）。"""
+    global _DEFAULT_CAPTURE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CAPTURE is None:
+            _DEFAULT_CAPTURE = CaptureEngine()
+        return _DEFAULT_CAPTURE
+
+
+# ====================== 測試區塊 ======================
+if __name__ == "__main__":
+    if not CaptureEngine.available():
+        print("sounddevice 不可用，只測 ring buffer")
+        ring = PcmRing(8)
+        ring.write(np.arange(5, dtype=np.float32))
+        ring.write(np.arange(5, 10, dtype=np.float32))
+        print("position:", ring.position, "read:", ring.read(0))
+    else:
+        engine = CaptureEngine()
+        t0 = time.perf_counter()
+        pcm = engine.record(3)
+        print(f"錄到 {pcm.shape[0]} 樣本，耗時 {time.perf_counter() - t0:.2f}s，峰值 {float(np.abs(pcm).max() if pcm.size else 0):.3f}")
+        engine.close()
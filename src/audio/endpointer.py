@@ -0,0 +1,249 @@
+"""Audio Layer - 語音端點偵測（VAD endpointing）
+
+以 frame 為單位計算能量 (RMS) 與過零率 (ZCR)：
+- 能量高於「噪音底 × energy_ratio」→ 語音
+- 能量稍低但 ZCR 高（ㄙ、ㄘ、s 之類的氣音）→ 也算語音
+- 非語音 frame 持續更新噪音底（EMA），環境變吵或變安靜都能跟上
+
+噪音底先用 calibrate()（錄音起點之前的音訊）估；沒有的話前 calibration_frames 個 frame
+只拿來校正，不判斷語音。開始說話要連續 start_frames 個「能量」夠高的 frame
+（白噪音的過零率也很高，ZCR 只用在已經開始說話之後）；說話後靜音超過 hangover 就結束，
+另有 max_utterance 上限與 no_speech_timeout（一直沒人說話就放棄）。
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# 確保專案根目錄在 sys.path 中（直接執行本檔時需要）
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+import src.utils.config as config
+
+REASON_SILENCE = "silence"        # 說完話後靜音超過 hangover
+REASON_MAX_LENGTH = "max_length"  # 超過最長錄音上限
+REASON_NO_SPEECH = "no_speech"    # 等不到人說話
+
+
+@dataclass
+class EndpointResult:
+    """一次錄音的端點偵測結果；時間以錄音開始為 0 秒。"""
+    audio: np.ndarray
+    reason: str
+    speech_start: Optional[float]  # 偵測到的語音開始（秒），沒說話為 None
+    speech_end: Optional[float]    # 最後一個語音 frame 的結尾（秒）
+    captured: float                # 實際錄了多久（秒）
+
+    @property
+    def has_speech(self) -> bool:
+        return self.speech_start is not None and self.audio.size > 0
+
+
+def frame_features(samples: np.ndarray, frame_len: int):
+    """把 samples 切成完整 frame，回傳 (rms, zcr) 兩個陣列。"""
+    n = samples.shape[0] // frame_len
+    if n == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty
+    frames = samples[: n * frame_len].reshape(n, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_len - 1)
+    return rms, zcr.astype(np.float32)
+
+
+class Endpointer:
+    """串流式端點偵測：一次餵一段 PCM，回傳是否該停止錄音。"""
+
+    def __init__(
+        self,
+        sample_rate: int = config.AUDIO_SAMPLE_RATE,
+        frame_ms: int = config.VAD_FRAME_MS,
+        hangover_ms: int = config.VAD_HANGOVER_MS,
+        max_utterance_sec: float = config.VAD_MAX_UTTERANCE_SEC,
+        no_speech_timeout_sec: float = config.VAD_NO_SPEECH_TIMEOUT_SEC,
+        energy_ratio: float = config.VAD_ENERGY_RATIO,
+        min_rms: float = config.VAD_MIN_RMS,
+        zcr_threshold: float = config.VAD_ZCR_THRESHOLD,
+        start_frames: int = 3,
+        calibration_frames: int = 5,
+        noise_alpha: float = 0.05,
+        preroll_ms: int = 200,
+        tail_ms: int = 150,
+    ):
+        self.sample_rate = int(sample_rate)
+        self.frame_len = max(2, int(self.sample_rate * frame_ms / 1000))
+        self.hangover_frames = max(1, int(round(hangover_ms / frame_ms)))
+        self.max_frames = max(1, int(max_utterance_sec * 1000 / frame_ms))
+        self.no_speech_frames = max(1, int(no_speech_timeout_sec * 1000 / frame_ms))
+        self.energy_ratio = float(energy_ratio)
+        self.min_rms = float(min_rms)
+        self.zcr_threshold = float(zcr_threshold)
+        self.start_frames = max(1, int(start_frames))
+        self.calibration_frames = max(1, int(calibration_frames))
+        self.noise_alpha = float(noise_alpha)
+        self.preroll_frames = int(preroll_ms / frame_ms)
+        self.tail_frames = int(tail_ms / frame_ms)
+        self.reset()
+
+    def reset(self) -> None:
+        self.noise_floor = self.min_rms
+        self.frames = 0
+        self.speech_run = 0
+        self.silence_run = 0
+        self.start_frame: Optional[int] = None
+        self.last_speech_frame: Optional[int] = None
+        self.reason: Optional[str] = None
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._calib: list = []
+
+    def calibrate(self, samples: np.ndarray) -> None:
+        """
+        用一段「之前」的音訊估噪音底（取 frame RMS 的第 20 百分位），
+        給從喚醒詞後面接著錄、開頭就是語音、沒有安靜片段可以校正的情況。
+        """
+        rms, _zcr = frame_features(np.asarray(samples, dtype=np.float32).reshape(-1), self.frame_len)
+        if rms.size >= self.calibration_frames:
+            self.noise_floor = max(float(np.percentile(rms, 20)), 1e-4)
+            self._calib = [self.noise_floor] * self.calibration_frames
+
+    @property
+    def done(self) -> bool:
+        return self.reason is not None
+
+    @property
+    def in_speech(self) -> bool:
+        return self.start_frame is not None and self.reason is None
+
+    @property
+    def calibrated(self) -> bool:
+        return len(self._calib) >= self.calibration_frames
+
+    def _is_loud(self, rms: float) -> bool:
+        return rms >= max(self.noise_floor * self.energy_ratio, self.min_rms)
+
+    def _is_speech(self, rms: float, zcr: float) -> bool:
+        if self._is_loud(rms):
+            return True
+        # 氣音：能量只有噪音底的 √ratio 倍以上，但過零率很高
+        soft = max(self.noise_floor * np.sqrt(self.energy_ratio), self.min_rms)
+        return rms >= soft and zcr >= self.zcr_threshold
+
+    def _update_floor(self, rms: float) -> None:
+        if len(self._calib) < self.calibration_frames:
+            self._calib.append(rms)
+            self.noise_floor = max(float(np.mean(self._calib)), 1e-4)
+            return
+        # 往下掉要快（突然安靜），往上爬要慢（避免把說話聲吃進噪音底）
+        alpha = self.noise_alpha * 4 if rms < self.noise_floor else self.noise_alpha
+        self.noise_floor = max((1 - alpha) * self.noise_floor + alpha * rms, 1e-4)
+
+    def _step(self, rms: float, zcr: float) -> None:
+        idx = self.frames
+        self.frames += 1
+        if self.start_frame is None:
+            # 還沒校正完不判斷語音；開始說話只看能量
+            if self.calibrated and self._is_loud(rms):
+                self.speech_run += 1
+                if self.speech_run >= self.start_frames:
+                    self.start_frame = idx - self.start_frames + 1
+                    self.last_speech_frame = idx
+            else:
+                self.speech_run = 0
+                self._update_floor(rms)
+                if self.frames >= self.no_speech_frames:
+                    self.reason = REASON_NO_SPEECH
+        else:
+            if self._is_speech(rms, zcr):
+                self.silence_run = 0
+                self.last_speech_frame = idx
+            else:
+                self.silence_run += 1
+                self._update_floor(rms)
+                if self.silence_run >= self.hangover_frames:
+                    self.reason = REASON_SILENCE
+
+        if self.reason is None and self.frames >= self.max_frames:
+            self.reason = REASON_MAX_LENGTH
+
+    def feed(self, samples: np.ndarray) -> bool:
+        """餵進一段 float32 PCM；回傳 True 代表端點已確定，可以停止錄音。"""
+        if self.done:
+            return True
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        rms, zcr = frame_features(samples, self.frame_len)
+        used = rms.shape[0] * self.frame_len
+        self._pending = samples[used:].copy()
+        for r, z in zip(rms.tolist(), zcr.tolist()):
+            self._step(r, z)
+            if self.done:
+                break
+        return self.done
+
+    def speech_span(self):
+        """回傳 (start_sample, end_sample)，已含 pre-roll 與尾巴；沒偵測到語音回傳 None。"""
+        if self.start_frame is None or self.last_speech_frame is None:
+            return None
+        start = max(0, self.start_frame - self.preroll_frames) * self.frame_len
+        end = min(self.frames, self.last_speech_frame + 1 + self.tail_frames) * self.frame_len
+        return start, end
+
+    def result(self, audio: np.ndarray) -> EndpointResult:
+        """依偵測結果裁切 audio（從錄音開始算起的完整 PCM）。"""
+        sec = float(self.frame_len) / self.sample_rate
+        span = self.speech_span()
+        if span is None:
+            clip = np.zeros(0, dtype=np.float32)
+            start_t = end_t = None
+        else:
+            clip = audio[span[0]:span[1]]
+            start_t = round(self.start_frame * sec, 3)
+            end_t = round((self.last_speech_frame + 1) * sec, 3)
+        return EndpointResult(
+            audio=clip,
+            reason=self.reason or REASON_MAX_LENGTH,
+            speech_start=start_t,
+            speech_end=end_t,
+            captured=round(self.frames * sec, 3),
+        )
+
+
+# ====================== 測試區塊 ======================
+if __name__ == "__main__":
+    import time
+
+    sr = config.AUDIO_SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    noise = lambda sec: (rng.standard_normal(int(sr * sec)) * 0.003).astype(np.float32)
+    t = np.arange(int(sr * 0.8)) / sr
+    voice = (0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32) + noise(0.8)
+    stream = np.concatenate((noise(0.5), voice, noise(2.0)))
+
+    ep = Endpointer()
+    t0 = time.perf_counter()
+    for i in range(0, stream.shape[0], 480):
+        if ep.feed(stream[i:i + 480]):
+            break
+    res = ep.result(stream)
+    print(f"reason={res.reason} start={res.speech_start}s end={res.speech_end}s captured={res.captured}s "
+          f"clip={res.audio.shape[0] / sr:.2f}s ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+    # 風扇 / 冷氣之類的持續背景噪音（RMS 0.015）：應該在說完話後結束，而不是錄到上限
+    fan = lambda sec: (rng.standard_normal(int(sr * sec)) * 0.015).astype(np.float32)
+    noisy = np.concatenate((fan(0.5), voice + fan(0.8), fan(2.0)))
+    for label, calib in (("ring calibrated", fan(3.0)), ("in-stream", None)):
+        ep = Endpointer()
+        if calib is not None:
+            ep.calibrate(calib)
+        ep.feed(noisy)
+        res = ep.result(noisy)
+        print(f"[{label}] reason={res.reason} start={res.speech_start}s end={res.speech_end}s captured={res.captured}s")
@@ -0,0 +1,215 @@
+"""Audio Layer - 回覆語音快取
+
+大部分回覆都是固定字串（「好的，已為你處理。」、「我在，請說！」…），
+每次都重新合成很浪費。這裡用 (語音模型 hash, 文字) 當 key 存 Piper 輸出的 raw PCM：
+- 啟動時背景把已知的固定回覆先合成好（prefill）
+- LLM 的回覆第一次唸的時候順便存起來（PiperWorker 邊播邊收）
+- 命中時直接 mmap 檔案交給播放端，完全不用合成
+- 磁碟用量超過上限就刪最久沒用到的（LRU，以檔案 mtime 當最後使用時間）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+import src.utils.config as config
+
+
+def normalize_text(text: str) -> str:
+    """跟 PiperWorker.say 一樣把空白攤平，同一句話才會對到同一個 key。"""
+    return " ".join((text or "").split())
+
+
+def file_hash(path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+class ReplyAudioCache:
+    """以內容定址的 PCM 快取；檔案放在 cache_dir/<voice hash>/<text hash>.pcm。"""
+
+    def __init__(
+        self,
+        cache_dir=config.TTS_CACHE_DIR,
+        model=config.TTS_MODEL,
+        max_bytes: int = int(config.TTS_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.model = str(model)
+        self.max_bytes = int(max_bytes)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._voice: Optional[str] = None
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes，舊 → 新
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # ---------------- key / 索引 ----------------
+    @property
+    def voice_hash(self) -> str:
+        """語音模型內容的 hash：換模型後舊的快取自然不會命中。"""
+        if self._voice is None:
+            self._voice = file_hash(self.model)
+        return self._voice
+
+    def key(self, text: str) -> str:
+        payload = f"{self.voice_hash}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:32]
+
+    @property
+    def voice_dir(self) -> Path:
+        return self.cache_dir / self.voice_hash
+
+    def _path(self, key: str) -> Path:
+        return self.voice_dir / f"{key}.pcm"
+
+    def _load_index(self) -> None:
+        if self._loaded:
+            return
+        entries = []
+        if self.voice_dir.is_dir():
+            for p in self.voice_dir.glob("*.pcm"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, p.stem, st.st_size))
+        entries.sort()
+        self._index = OrderedDict((k, size) for _mtime, k, size in entries)
+        self._total = sum(self._index.values())
+        self._loaded = True
+
+    # ---------------- 讀寫 ----------------
+    def __contains__(self, text: str) -> bool:
+        with self._lock:
+            self._load_index()
+            return self.key(text) in self._index
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load_index()
+            return len(self._index)
+
+    def get(self, text: str) -> Optional[mmap.mmap]:
+        """命中回傳唯讀 mmap（用完要 close）；沒有回傳 None。"""
+        with self._lock:
+            self._load_index()
+            k = self.key(text)
+            if k not in self._index:
+                self.stats["misses"] += 1
+                return None
+            path = self._path(k)
+            try:
+                with open(path, "rb") as f:
+                    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                os.utime(path)  # mtime = 最後使用時間，重啟後 LRU 順序還在
+            except (OSError, ValueError):
+                self._drop(k)
+                self.stats["misses"] += 1
+                return None
+            self._index.move_to_end(k)
+            self.stats["hits"] += 1
+            return buf
+
+    def put(self, text: str, pcm: bytes) -> None:
+        if not pcm or not normalize_text(text):
+            return
+        with self._lock:
+            self._load_index()
+            k = self.key(text)
+            path = self._path(k)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=str(path.parent))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(pcm)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+            self._total += len(pcm) - self._index.pop(k, 0)
+            self._index[k] = len(pcm)
+            self.stats["stores"] += 1
+            self._evict()
+
+    def _drop(self, k: str) -> None:
+        self._total -= self._index.pop(k, 0)
+        try:
+            self._path(k).unlink()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        # 至少留下剛存進來的那一筆
+        while self._total > self.max_bytes and len(self._index) > 1:
+            oldest = next(iter(self._index))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._load_index()
+            for k in list(self._index):
+                self._drop(k)
+
+    # ---------------- 預先合成 ----------------
+    def prefill(self, texts: Iterable[str], worker) -> int:
+        """把還沒快取的固定回覆排給 worker 合成（只收 PCM 不播放）；回傳排了幾句。"""
+        queued = 0
+        seen = set()
+        for text in texts:
+            text = normalize_text(text)
+            if not text or text in seen or text in self:
+                continue
+            seen.add(text)
+            worker.synthesize(text)
+            queued += 1
+        return queued
+
+
+def canned_replies(extra: Iterable[str] = ()) -> list:
+    """程式裡寫死的回覆句；extra 放呼叫端自己的固定句（例如 true_main 的開關機提示）。"""
+    from src.core.agent import CANNED_REPLIES  # 避免循環 import
+    from src.core.parser import FAST_REPLIES_EN, FAST_REPLIES_ZH
+    from src.llm.llm_engine import DEFAULT_REPLY
+
+    return list(extra) + list(CANNED_REPLIES) + list(FAST_REPLIES_ZH) + [DEFAULT_REPLY] + list(FAST_REPLIES_EN)
+
+
+_DEFAULT_CACHE: Optional[ReplyAudioCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_reply_cache() -> ReplyAudioCache:
+    """共用的回覆語音快取（第一次用到才建立）。"""
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = ReplyAudioCache()
+        return _DEFAULT_CACHE
+
+
+# ====================== 測試區塊 ======================
+if __name__ == "__main__":
+    if not os.path.exists(config.TTS_MODEL):
+        print(f"找不到語音模型：{config.TTS_MODEL}")
+    else:
+        cache = get_default_reply_cache()
+        t0 = time.perf_counter()
+        print(f"voice={cache.voice_hash}（hash {(time.perf_counter() - t0) * 1000:.0f} ms），已快取 {len(cache)} 句")
+        for text in canned_replies():
+            print(("✅ " if text in cache else "⬜ ") + text)
@@ -1,7 +1,7 @@
 """Audio Layer - 耳朵 + 嘴巴
 
 負責：
-- speech_to_text()  : 錄音 → Whisper 轉文字
+- speech_to_text()  : 錄音 → Whisper 轉文字（預設走記憶體 ring buffer，不落地；說完話就停）
 - text_to_speech()  : 文字 → Piper TTS 播放
 """
 
@@ -23,21 +23,61 @@ from src.utils.config import (
     RECORDING_DURATION,
     LANGUAGE,
     RECORDINGS_DIR,
+    AUDIO_CAPTURE_BACKEND,
+    AUDIO_ARCHIVE_ENABLED,
+    VAD_ENABLED,
+    VAD_MAX_UTTERANCE_SEC,
+    VAD_NO_SPEECH_TIMEOUT_SEC,
 )
-from src.utils.tts import speak  # ← 嘴巴功能直接使用現有 TTS
+from src.audio.capture import CaptureEngine, archive_wav, get_default_capture
+from src.audio.endpointer import Endpointer
+from src.utils.tts import speak, cancel_speech, wait_speech_done  # ← 嘴巴功能直接使用現有 TTS
 
 
 class SpeechProcessor:
     """整合錄音、語音辨識、語音合成的完整音訊處理器。"""
 
-    def __init__(self, device: str = DEVICE_PORT, default_duration: int = RECORDING_DURATION):
+    def __init__(
+        self,
+        device: str = DEVICE_PORT,
+        default_duration: int = RECORDING_DURATION,
+        capture: Optional[CaptureEngine] = None,
+        backend: str = AUDIO_CAPTURE_BACKEND,
+        archive: bool = AUDIO_ARCHIVE_ENABLED,
+        use_vad: bool = VAD_ENABLED,
+    ):
         self.device = device
         self.default_duration = default_duration
-        Path(RECORDINGS_DIR).mkdir(parents=True, exist_ok=True)
+        # sounddevice 可用就走常駐錄音引擎；否則退回 arecord + latest.wav
+        self.capture = capture
+        if self.capture is None and backend == "sounddevice" and CaptureEngine.available():
+            self.capture = get_default_capture()
+        self.archive = archive
+        self.use_vad = use_vad
+        self.last_endpoint = None  # 最近一次的 EndpointResult（語音起訖時間），給 log / benchmark 用
+        if self.capture is None or self.archive:
+            Path(RECORDINGS_DIR).mkdir(parents=True, exist_ok=True)
 
     # ====================== 耳朵（輸入） ======================
-    def speech_to_text(self, duration: Optional[int] = None, language: str = LANGUAGE) -> str:
-        """完整流程：錄音 → Whisper 轉文字 → 只回傳文字（不寫檔）"""
+    def speech_to_text(self, duration: Optional[int] = None, language: str = LANGUAGE, start: Optional[int] = None) -> str:
+        """
+        完整流程：錄音 → Whisper 轉文字 → 只回傳文字（不寫檔）
+        start：ring buffer 位置（例如喚醒詞前端回報的位置），從那裡開始算，不漏掉已經說出口的字
+        """
+        if self.capture is not None and not self._ensure_capture():
+            start = None  # ring 位置對 arecord 沒有意義
+        if self.capture is not None:
+            try:
+                pcm = self._capture_audio(duration, start)
+                if pcm.size == 0:
+                    return ""  # 沒人說話，不必叫醒 Whisper
+                text = self._transcribe_pcm(pcm, language)
+            except Exception as e:
+                print(f"❌ 錄音/轉錄失敗：{e}")
+                return ""
+            print(f"👤 [你說]: {text}")
+            return text.strip()
+
         wav_path = self._record_audio(duration)
         if not wav_path:
             return ""
@@ -53,13 +93,69 @@ class SpeechProcessor:
         return text
 
     # ====================== 嘴巴（輸出） ======================
-    def text_to_speech(self, text: str) -> None:
-        """播放回覆（整合原本 tts.py 的 speak）"""
+    def text_to_speech(self, text: str, wait: bool = True) -> None:
+        """播放回覆（整合原本 tts.py 的 speak）；wait=False 只排進佇列"""
         if not text:
             return
-        speak(text)  # 直接呼叫現有 TTS 邏輯
+        speak(text, wait=wait)  # 直接呼叫現有 TTS 邏輯
+        if wait:
+            self._mark_playback_end()
+
+    def wait_speech_done(self) -> None:
+        """等排隊中的回覆播完再開麥克風，避免把自己的聲音錄進去"""
+        wait_speech_done()
+        self._mark_playback_end()
+
+    def _mark_playback_end(self) -> None:
+        # 錄音串流一直開著：告訴錄音引擎回覆播到哪裡，噪音底才不會用到自己的聲音
+        if self.capture is not None:
+            self.capture.mark_playback_end()
+
+    def cancel_speech(self) -> None:
+        cancel_speech()
+
+    def close(self) -> None:
+        if self.capture is not None:
+            self.capture.close()
 
     # ====================== 私有輔助方法 ======================
+    def _ensure_capture(self) -> bool:
+        """開錄音串流；開不起來（裝置取樣率 / 格式不合）就改回 arecord，不要每輪都回傳空字串。"""
+        try:
+            self.capture.start()
+            return True
+        except Exception as e:
+            print(f"⚠️ 錄音串流無法開啟（{e}），改用 arecord 錄音")
+            self.capture = None
+            Path(RECORDINGS_DIR).mkdir(parents=True, exist_ok=True)
+            return False
+
+    def _capture_audio(self, duration: Optional[int] = None, start: Optional[int] = None):
+        """
+        從 ring buffer 錄音，回傳 float32 陣列；開 archive 時順便存 latest.wav
+        - 開 VAD：說完話就停，duration 有給時當作整段錄音的上限
+        - 關 VAD：固定錄 duration 秒（舊行為）
+        """
+        if self.use_vad:
+            cap = float(duration) if duration else VAD_MAX_UTTERANCE_SEC
+            endpointer = Endpointer(
+                sample_rate=self.capture.sample_rate,
+                max_utterance_sec=cap,
+                no_speech_timeout_sec=min(VAD_NO_SPEECH_TIMEOUT_SEC, cap),
+            )
+            res = self.capture.record_utterance(endpointer, start=start)
+            self.last_endpoint = res
+            if res.has_speech:
+                print(f"🎙️ 語音 {res.speech_start:.2f}s → {res.speech_end:.2f}s（{res.reason}，錄了 {res.captured:.2f}s）")
+            pcm = res.audio
+        else:
+            pcm = self.capture.record(duration or self.default_duration)
+        if pcm.size == 0:
+            return pcm
+        if self.archive:
+            archive_wav(pcm, Path(RECORDINGS_DIR) / "latest.wav", self.capture.sample_rate)
+        return pcm
+
     def _record_audio(self, duration: Optional[int] = None) -> str:
         """使用 arecord 錄音，返回 wav 路徑"""
         record_seconds = duration or self.default_duration
@@ -95,6 +191,13 @@ class SpeechProcessor:
         )
         return text if text != "[無辨識結果]" else ""
 
+    def _transcribe_pcm(self, pcm, language: str = LANGUAGE) -> str:
+        """記憶體中的 PCM 直接丟給 faster-whisper"""
+        from src.utils.whisper_local import transcribe_array  # 避免循環 import
+
+        text = transcribe_array(pcm, language=language, model_name=None)
+        return text if text != "[無辨識結果]" else ""
+
 
 # ====================== 測試區塊 ======================
 if __name__ == "__main__":
@@ -0,0 +1,456 @@
+"""Audio Layer - 常駐 Piper TTS worker
+
+原本每句話都跑一次 `echo ... | piper --output-raw | aplay`：每次重新載入 ONNX 語音模型、
+文字要經過 shell quoting，而且整段播完才返回。這裡改成：
+- Piper 行程只啟動一次，模型常駐；句子一行一行從 stdin 餵進去（不經過 shell）
+- stdout 的 raw PCM 直接串流到常駐的播放端（sounddevice 輸出串流，沒有就用一條 aplay）
+- 句子排隊播放；cancel() 會清空佇列並丟掉正在播的音訊
+- 預先合成（prefill）走低優先序：要播的句子一律插到前面，wait_idle() 也不等它
+- 每句的邊界：Piper 每合成完一句會在 stderr 印 "Real-time factor"，看到它且 stdout 靜下來就算結束
+- 有 ReplyAudioCache 時：命中直接播 mmap 的 PCM（零合成），沒命中就邊播邊收、播完存進快取
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import queue
+import select
+import subprocess
+import threading
+import time
+from typing import Optional
+
+try:
+    import sounddevice as sd
+except Exception:  # PortAudio 不存在時
+    sd = None
+
+import src.utils.config as config
+
+_DONE_MARKER = "Real-time factor"
+
+# 佇列優先序：數字小的先做
+_LANE_SAY = 0
+_LANE_PREFILL = 1
+
+
+def voice_sample_rate(model_path, default: int = 22050) -> int:
+    """讀 voice.onnx.json 的 audio.sample_rate；讀不到就用 Piper 常見的 22050。"""
+    try:
+        with open(f"{model_path}.json", encoding="utf-8") as f:
+            return int(json.load(f)["audio"]["sample_rate"])
+    except Exception:
+        return default
+
+
+class PcmSink:
+    """常駐的播放端：sounddevice RawOutputStream，沒有的話開一條 aplay 吃 raw PCM。"""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = int(sample_rate)
+        self.bytes_per_sec = self.sample_rate * 2  # S16_LE mono
+        self._stream = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._play_until = 0.0  # 已寫入的音訊預計播完的時間 (monotonic)
+        self._carry = b""
+        self._lock = threading.Lock()  # worker 寫入與 cancel 的 discard 來自不同執行緒
+
+    def _open(self) -> None:
+        if self._stream is not None or (self._proc is not None and self._proc.poll() is None):
+            return
+        if sd is not None:
+            self._stream = sd.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype="int16")
+            self._stream.start()
+        else:
+            self._proc = subprocess.Popen(
+                ["aplay", "-q", "-r", str(self.sample_rate), "-f", "S16_LE", "-t", "raw", "-c", "1", "-"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+    def write(self, pcm: bytes) -> None:
+        with self._lock:
+            # pipe 讀到的長度可能是奇數，不足一個 sample 的 byte 留到下次
+            pcm = self._carry + pcm
+            cut = len(pcm) - (len(pcm) % 2)
+            pcm, self._carry = pcm[:cut], pcm[cut:]
+            if not pcm:
+                return
+            self._open()
+            if self._stream is not None:
+                self._stream.write(pcm)
+            else:
+                self._proc.stdin.write(pcm)
+                self._proc.stdin.flush()
+            now = time.monotonic()
+            self._play_until = max(self._play_until, now) + len(pcm) / self.bytes_per_sec
+
+    def wait_drained(self) -> None:
+        """等已寫入的音訊播完（依寫入量估算）；discard() 之後立刻返回。"""
+        while True:
+            remaining = self._play_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.05))
+
+    def discard(self) -> None:
+        """丟掉還沒播出去的音訊（取消用）。"""
+        with self._lock:
+            self._play_until = 0.0
+            self._carry = b""
+            if self._stream is not None:
+                self._stream.abort()
+                self._stream.start()
+            elif self._proc is not None:
+                self._proc.kill()
+                self._proc = None
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=2)
+            except Exception:
+                self._proc.kill()
+            self._proc = None
+
+
+class _Utterance:
+    __slots__ = ("text", "generation", "done", "pcm", "play", "collect", "started", "skip")
+
+    def __init__(self, text: str, generation: int, pcm=None, play: bool = True, collect: bool = False):
+        self.text = text
+        self.generation = generation
+        self.done = threading.Event()
+        self.pcm = pcm                           # 快取命中的 PCM（mmap），有的話就不用合成
+        self.play = play                         # False = 只合成進快取（prefill）
+        self.collect = [] if collect else None   # 合成時順便收集 PCM 給快取
+        self.started = False                     # worker 已經拿去合成
+        self.skip = False                        # prefill 還沒輪到就被 say() 接手，不用再合成
+
+    def release(self) -> None:
+        if self.pcm is not None and hasattr(self.pcm, "close"):
+            self.pcm.close()
+        self.pcm = None
+
+
+class PiperWorker:
+    """持有 Piper 行程與播放端的 TTS worker；say() 排進佇列，由背景執行緒依序合成播放。"""
+
+    def __init__(
+        self,
+        piper_exe=config.PIPER_EXE,
+        model=config.TTS_MODEL,
+        sample_rate: Optional[int] = None,
+        sentence_timeout_sec: float = config.TTS_SENTENCE_TIMEOUT_SEC,
+        cache=None,
+        use_cache: bool = config.TTS_CACHE_ENABLED,
+    ):
+        self.piper_exe = str(piper_exe)
+        self.model = str(model)
+        self.sample_rate = sample_rate or voice_sample_rate(self.model)
+        self.sentence_timeout_sec = sentence_timeout_sec
+        self.sink = PcmSink(self.sample_rate)
+        # 回覆語音快取（None 代表用預設快取）
+        self.cache = cache
+        self.use_cache = use_cache
+        self.stats = {"spawns": 0, "sentences": 0, "cached_plays": 0, "cancelled": 0, "last_first_audio_ms": None, "spawn_ms": None}
+        # (lane, 序號, utterance)：say 的句子永遠排在 prefill 前面，同 lane 內照順序
+        self._queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._prefill_jobs: dict = {}  # text -> 還沒合成完的 prefill _Utterance
+        self._generation = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._markers = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = 0  # 排隊中 + 播放中的句子數（不含 prefill）
+        self._idle = threading.Event()
+        self._idle.set()
+
+    @staticmethod
+    def available(piper_exe=config.PIPER_EXE, model=config.TTS_MODEL) -> bool:
+        return os.path.exists(piper_exe) and os.path.exists(model)
+
+    # ---------------- Piper 行程 ----------------
+    def _spawn(self) -> subprocess.Popen:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            [self.piper_exe, "--model", self.model, "--output-raw"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        self._markers = threading.Semaphore(0)
+        threading.Thread(target=self._stderr_loop, args=(proc, self._markers), name="piper-stderr", daemon=True).start()
+        self.stats["spawns"] += 1
+        self.stats["spawn_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return proc
+
+    def _ensure_proc(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = self._spawn()
+        return self._proc
+
+    @staticmethod
+    def _stderr_loop(proc: subprocess.Popen, markers: threading.Semaphore) -> None:
+        for raw in iter(proc.stderr.readline, b""):
+            if _DONE_MARKER.encode() in raw:
+                markers.release()
+
+    # ---------------- 對外 API ----------------
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="piper-worker", daemon=True)
+                self._thread.start()
+
+    def prewarm(self) -> None:
+        """先把 Piper 行程跟語音模型載起來，第一句話就不用等。"""
+        self.start()
+        with self._lock:
+            self._ensure_proc()
+
+    def _get_cache(self):
+        if not self.use_cache:
+            return None
+        if self.cache is None:
+            from src.audio.reply_cache import get_default_reply_cache  # 避免循環 import
+            self.cache = get_default_reply_cache()
+        return self.cache
+
+    def say(self, text: str, wait: bool = True) -> threading.Event:
+        """排入一句話；wait=True 時阻塞到這句播完。回傳播完時會 set 的 Event。"""
+        # Piper 一行一句：換行會被當成兩句，先攤平
+        text = " ".join((text or "").split())
+        cache = self._get_cache()
+        pcm = cache.get(text) if cache is not None and text else None
+        if pcm is None and cache is not None and self._claim_prefill(text):
+            pcm = cache.get(text)  # prefill 剛合成完這句
+        return self._enqueue(_Utterance(text, self._generation, pcm=pcm, collect=cache is not None and pcm is None), wait)
+
+    def _claim_prefill(self, text: str) -> bool:
+        """
+        同一句還在 prefill 佇列：還沒開始就取消它（這次 say 會邊播邊存，不合成兩次）；
+        已經在合成就等它合成完再從快取播。回傳 True 代表等到了 prefill 的結果。
+        """
+        with self._lock:
+            job = self._prefill_jobs.get(text)
+            if job is None:
+                return False
+            if not job.started:
+                job.skip = True
+                self._prefill_jobs.pop(text, None)
+                return False
+        return job.done.wait(self.sentence_timeout_sec)
+
+    def synthesize(self, text: str, wait: bool = False) -> threading.Event:
+        """只合成不播放，結果存進快取（啟動時預先合成固定回覆用）。"""
+        text = " ".join((text or "").split())
+        if self._get_cache() is None:
+            done = threading.Event()
+            done.set()
+            return done
+        with self._lock:
+            job = self._prefill_jobs.get(text)
+        if job is not None:
+            return job.done  # 同一句已經排著
+        return self._enqueue(_Utterance(text, self._generation, play=False, collect=True), wait)
+
+    def _enqueue(self, utt: _Utterance, wait: bool) -> threading.Event:
+        if not utt.text:
+            utt.done.set()
+            return utt.done
+        self.start()
+        with self._lock:
+            if utt.play:
+                self._pending += 1
+                self._idle.clear()
+            else:
+                self._prefill_jobs[utt.text] = utt
+        self._queue.put((_LANE_SAY if utt.play else _LANE_PREFILL, next(self._seq), utt))
+        if wait:
+            utt.done.wait()
+        return utt.done
+
+    def cancel(self) -> None:
+        """清空佇列並停掉正在播的句子（Piper 行程與模型保留）；還沒輪到的 prefill 留著。"""
+        self._generation += 1
+        self.stats["cancelled"] += 1
+        keep = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            utt = item[2]
+            if utt is None:
+                keep.append(item)
+            elif not utt.play:
+                utt.generation = self._generation
+                keep.append(item)
+            else:
+                utt.release()
+                utt.done.set()
+                self._finished(utt)
+        for item in keep:
+            self._queue.put(item)
+        self.sink.discard()
+
+    def _finished(self, utt: _Utterance) -> None:
+        with self._lock:
+            if not utt.play:
+                if self._prefill_jobs.get(utt.text) is utt:
+                    del self._prefill_jobs[utt.text]
+                return
+            self._pending = max(0, self._pending - 1)
+            if self._pending == 0:
+                self._idle.set()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等佇列裡所有句子播完。"""
+        return self._idle.wait(timeout)
+
+    def close(self) -> None:
+        self.cancel()
+        self._queue.put((_LANE_SAY, next(self._seq), None))
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=2)
+                except Exception:
+                    self._proc.kill()
+                self._proc = None
+        self.sink.close()
+
+    # ---------------- 背景執行緒 ----------------
+    def _run(self) -> None:
+        while True:
+            utt = self._queue.get()[2]
+            if utt is None:
+                return
+            with self._lock:
+                utt.started = not utt.skip
+            try:
+                if utt.started and utt.generation == self._generation:
+                    if utt.pcm is not None:
+                        self._play_cached(utt)
+                    else:
+                        self._speak_one(utt)
+            except Exception as e:
+                print(f"播放語音失敗: {e}")
+                with self._lock:
+                    if self._proc is not None:
+                        self._proc.kill()
+                        self._proc = None
+            finally:
+                utt.release()
+                utt.done.set()
+                self._finished(utt)
+
+    def _play_cached(self, utt: _Utterance) -> None:
+        """快取命中：直接從 mmap 切塊寫進播放端，每塊之間檢查是否被取消。"""
+        view = memoryview(utt.pcm)
+        try:
+            for i in range(0, len(view), 8192):
+                if utt.generation != self._generation:
+                    return
+                self.sink.write(view[i:i + 8192])
+        finally:
+            view.release()
+        self.stats["cached_plays"] += 1
+        if utt.generation == self._generation:
+            self.sink.wait_drained()
+
+    def _speak_one(self, utt: _Utterance) -> None:
+        with self._lock:
+            proc = self._ensure_proc()
+            markers = self._markers
+        t0 = time.perf_counter()
+        proc.stdin.write((utt.text + "\n").encode("utf-8"))
+        proc.stdin.flush()
+
+        fd = proc.stdout.fileno()
+        synthesized = False
+        first_audio = True
+        deadline = time.monotonic() + self.sentence_timeout_sec
+        while time.monotonic() < deadline:
+            ready, _, _ = select.select([fd], [], [], 0.05)
+            if ready:
+                chunk = os.read(fd, 8192)
+                if not chunk:
+                    raise RuntimeError("Piper 行程意外結束")
+                if utt.generation != self._generation:
+                    continue  # 已取消：把這句剩下的音訊讀掉但不播
+                if utt.collect is not None:
+                    utt.collect.append(chunk)
+                if not utt.play:
+                    continue
+                if first_audio:
+                    self.stats["last_first_audio_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                    first_audio = False
+                self.sink.write(chunk)
+                continue
+            # stdout 暫時沒資料：這句合成完了嗎？
+            if not synthesized and markers.acquire(blocking=False):
+                synthesized = True
+                continue  # 標記跟音訊走不同 pipe，再確認一次 stdout 已經清空
+            if synthesized:
+                break
+        else:
+            print("⚠️ Piper 合成逾時，重新啟動 TTS 行程")
+            with self._lock:
+                proc.kill()
+                self._proc = None
+            return
+
+        self.stats["sentences"] += 1
+        if utt.generation != self._generation:
+            return
+        if utt.collect:
+            # 整句合成完整才存（被取消的半句不存）
+            try:
+                self.cache.put(utt.text, b"".join(utt.collect))
+            except OSError as e:
+                print(f"⚠️ 回覆語音快取寫入失敗: {e}")
+        if utt.play:
+            self.sink.wait_drained()
+
+
+_DEFAULT_WORKER: Optional[PiperWorker] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_worker() -> PiperWorker:
+    """共用的 Piper worker（第一次用到才建立）。"""
+    global _DEFAULT_WORKER
+    with _DEFAULT_LOCK:
+        if _DEFAULT_WORKER is None:
+            _DEFAULT_WORKER = PiperWorker()
+        return _DEFAULT_WORKER
+
+
+# ====================== 測試區塊 ======================
+if __name__ == "__main__":
+    if not PiperWorker.available():
+        print(f"找不到 Piper 或語音模型：{config.PIPER_EXE} / {config.TTS_MODEL}")
+    else:
+        worker = get_default_worker()
+        t0 = time.perf_counter()
+        worker.prewarm()
+        print(f"Piper 啟動 {(time.perf_counter() - t0) * 1000:.0f} ms")
+        for sentence in ["好的，已為你處理。", "客廳燈已經打開。"]:
+            t0 = time.perf_counter()
+            worker.say(sentence)
+            print(f"{sentence} → {(time.perf_counter() - t0) * 1000:.0f} ms, stats={worker.stats}")
+        worker.close()
@@ -0,0 +1,169 @@
+"""Audio Layer - 常駐喚醒詞前端
+
+跟 SpeechProcessor 共用同一條 sounddevice 串流（CaptureEngine 的 ring buffer）：
+- Porcupine 只建立一次，待機時一個 frame 一個 frame 從 ring 讀出來判斷
+- 偵測到喚醒詞時回傳 ring 裡的位置；喚醒詞之後已經說出口的指令還在 ring 裡，
+  直接從那裡交給 STT，不用重開麥克風，也不會漏掉第一個字
+- stats 記錄每個 frame 花掉的 CPU 時間
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+import src.utils.config as config
+from src.audio.capture import CaptureEngine
+from src.audio.endpointer import Endpointer
+
+
+@dataclass
+class WakeStats:
+    """喚醒詞前端的 CPU 統計（thread CPU time，不含等待音訊的時間）。"""
+    frames: int = 0
+    detections: int = 0
+    cpu_ms: float = 0.0
+    max_frame_us: float = 0.0
+    audio_sec: float = 0.0
+
+    @property
+    def avg_frame_us(self) -> Optional[float]:
+        return (self.cpu_ms * 1000 / self.frames) if self.frames else None
+
+    @property
+    def cpu_load(self) -> Optional[float]:
+        """CPU 時間 / 音訊時間；0.02 代表單核 2%。"""
+        return (self.cpu_ms / 1000 / self.audio_sec) if self.audio_sec else None
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "cpu_ms": round(self.cpu_ms, 1),
+            "avg_frame_us": None if self.avg_frame_us is None else round(self.avg_frame_us, 1),
+            "max_frame_us": round(self.max_frame_us, 1),
+            "cpu_load": None if self.cpu_load is None else round(self.cpu_load, 4),
+        }
+
+
+class WakeWordFrontEnd:
+    """持有 Porcupine 與共用錄音串流的喚醒詞前端。"""
+
+    def __init__(
+        self,
+        capture: CaptureEngine,
+        engine: Any = None,
+        follow_window_ms: int = config.WAKE_FOLLOW_WINDOW_MS,
+        sensitivity: float = config.WAKE_SENSITIVITY,
+    ):
+        self.capture = capture
+        self.engine = engine  # None 代表第一次 wait() 時才建立 Porcupine
+        self.follow_window = int(capture.sample_rate * follow_window_ms / 1000)
+        self.sensitivity = sensitivity
+        self.stats = WakeStats()
+        self.last_position: Optional[int] = None
+
+    @staticmethod
+    def available() -> bool:
+        return CaptureEngine.available()
+
+    def _ensure_engine(self) -> bool:
+        if self.engine is None:
+            from src.utils.wait_wakeword import create_porcupine  # 避免循環 import
+
+            try:
+                self.engine = create_porcupine(self.sensitivity)
+            except Exception as e:
+                print(f"喚醒詞引擎發生錯誤: {e}")
+                return False
+        if self.engine is not None and self.engine.sample_rate != self.capture.sample_rate:
+            print(f"錯誤: 喚醒詞引擎需要 {self.engine.sample_rate} Hz，錄音串流是 {self.capture.sample_rate} Hz")
+            return False
+        return self.engine is not None
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        阻塞直到聽到喚醒詞，回傳偵測當下的 ring 位置；
+        引擎不可用、麥克風沒資料或逾時回傳 None。
+        """
+        if not self._ensure_engine():
+            return None
+        try:
+            self.capture.start()
+        except Exception as e:
+            print(f"⚠️ 錄音串流無法開啟: {e}")
+            return None
+        frame_len = int(self.engine.frame_length)
+        pos = self.capture.mark()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            if not self.capture.ring.wait_until(pos + frame_len, timeout=1.0):
+                if not self.capture.running:
+                    return None
+                continue
+            t0 = time.thread_time_ns()
+            frame = self.capture.read(pos, pos + frame_len)
+            pos += frame_len
+            if frame.shape[0] < frame_len:
+                # 處理太慢被 ring 覆蓋掉了：跳到最新位置重新對齊
+                pos = self.capture.mark()
+                continue
+            pcm = (np.clip(frame, -1.0, 32767.0 / 32768.0) * 32768.0).astype(np.int16)
+            result = self.engine.process(pcm)
+            elapsed_us = (time.thread_time_ns() - t0) / 1000
+            self.stats.frames += 1
+            self.stats.cpu_ms += elapsed_us / 1000
+            self.stats.audio_sec += frame_len / self.capture.sample_rate
+            if elapsed_us > self.stats.max_frame_us:
+                self.stats.max_frame_us = elapsed_us
+            if result >= 0:
+                self.stats.detections += 1
+                self.last_position = pos
+                return pos
+        return None
+
+    def command_start(self, position: int) -> int:
+        """
+        指令錄音的起點：就是偵測位置。Porcupine 在喚醒詞說完才報，往前多留 pre-roll
+        只會把「pi / 派」的尾巴錄進指令裡；指令開頭的緩衝由 Endpointer 自己的 pre-roll 處理。
+        """
+        return max(position, self.capture.ring.oldest)
+
+    def speech_follows(self, position: int) -> bool:
+        """
+        喚醒詞後 follow_window 內使用者有沒有接著說話（「嗨 my pi 開燈」一口氣講完）。
+        有的話主迴圈就不播「我在，請說」，直接從 ring 裡的位置轉錄。
+        """
+        end = position + self.follow_window
+        self.capture.ring.wait_until(end, timeout=self.follow_window / self.capture.sample_rate + 0.5)
+        ep = Endpointer(sample_rate=self.capture.sample_rate)
+        ep.calibrate(self.capture.read(max(position - 3 * self.capture.sample_rate, self.capture.playback_end), position))
+        ep.feed(self.capture.read(position, end))
+        return ep.start_frame is not None
+
+    def close(self) -> None:
+        if self.engine is not None:
+            try:
+                self.engine.delete()
+            except Exception:
+                pass
+            self.engine = None
+
+
+# ====================== 測試區塊 ======================
+if __name__ == "__main__":
+    from src.audio.capture import get_default_capture
+
+    if not WakeWordFrontEnd.available():
+        print("sounddevice 不可用，無法測試喚醒詞前端")
+    else:
+        front = WakeWordFrontEnd(get_default_capture())
+        print("請說喚醒詞...")
+        pos = front.wait(timeout=30)
+        print("偵測位置:", pos, "接著說話:", pos is not None and front.speech_follows(pos))
+        print("CPU 統計:", front.stats.as_dict())
+        front.close()
+        front.capture.close()
@@ -15,11 +15,34 @@ try:
 	from .router import Intent, RouteType, Router, is_system_reset_command
 	from .state_manager import StateManager
 	from .parser import DEFAULT_PARSER, ParserFacade
+	from .query_engine import DEFAULT_QUERY_ENGINE, LocalQueryEngine
+	from .escalation_policy import DEFAULT_ESCALATION_POLICY, Decision, EscalationDecision, EscalationPolicy
+	from src.utils.text_normalizer import DEFAULT_TEXT_NORMALIZER, TextNormalizer
 except ImportError:
 	from src.core.memory_agent import MemoryAgent
 	from src.core.router import Intent, RouteType, Router, is_system_reset_command
 	from src.core.state_manager import StateManager
 	from src.core.parser import DEFAULT_PARSER, ParserFacade
+	from src.core.query_engine import DEFAULT_QUERY_ENGINE, LocalQueryEngine
+	from src.core.escalation_policy import DEFAULT_ESCALATION_POLICY, Decision, EscalationDecision, EscalationPolicy
+	from src.utils.text_normalizer import DEFAULT_TEXT_NORMALIZER, TextNormalizer
+
+
+# 固定回覆句（src/audio/reply_cache.py 啟動時會預先合成語音）
+REPLY_SYSTEM_RESET = "好的，已清除短期記憶並重置對話狀態。"
+REPLY_EMPTY_INPUT = "請告訴我你想控制的設備或需求。"
+REPLY_STANDBY = "好的，我先休息囉，有需要請隨時叫我！"
+REPLY_RULE_LEARNED = "好的，我已經記住這條規則。"
+REPLY_DONE = "好的，已為你處理。"
+REPLY_CLARIFY = "可以再說清楚一點嗎？"
+CANNED_REPLIES = (
+	REPLY_SYSTEM_RESET,
+	REPLY_EMPTY_INPUT,
+	REPLY_STANDBY,
+	REPLY_RULE_LEARNED,
+	REPLY_DONE,
+	REPLY_CLARIFY,
+)
 
 
 @dataclass(slots=True)
@@ -51,11 +74,19 @@ class SmartHomeAgent:
 		state: Optional[StateManager] = None,
 		action_executor: Optional[Callable[[list[dict[str, Any]]], None]] = None,
 		llm_responder: Optional[Callable[[str, str], str]] = None,
+		query_engine: Optional[LocalQueryEngine] = None,
+		normalizer: Optional[TextNormalizer] = None,
+		escalation: Optional[EscalationPolicy] = None,
 	) -> None:
 		self.router = router or Router()
 		self.parser = parser or DEFAULT_PARSER
 		self.memory = memory or MemoryAgent()
 		self.state = state or StateManager()
+		# 設備狀態查詢（「客廳燈有開嗎」「現在幾度」）直接用 state 回答，不打 LLM
+		self.query_engine = query_engine or DEFAULT_QUERY_ENGINE
+		# 簡體 / 全形 / 重複標點在入口統一正規化一次，router、fastpath、規則都吃同一份文字
+		self.normalizer = normalizer or DEFAULT_TEXT_NORMALIZER
+		self.escalation = escalation or DEFAULT_ESCALATION_POLICY
 
 		# action_executor(actions) -> side effects (GPIO/API/etc.)
 		self.action_executor = action_executor or self._noop_action_executor
@@ -75,7 +106,7 @@ class SmartHomeAgent:
 		if is_system_reset_command(user_input):
 			self.memory.clear_memory()
 			self.state.reset_conversation()
-			reply = "好的，已清除短期記憶並重置對話狀態。"
+			reply = REPLY_SYSTEM_RESET
 			return AgentResult(
 				reply=reply,
 				actions=[],
@@ -103,9 +134,9 @@ class SmartHomeAgent:
 
 	def handle(self, user_input: str, current_temp: Optional[int] = None, ambient_temp: Optional[int] = None) -> AgentResult:
 		"""Process one user input and return a unified AgentResult."""
-		clean_input = (user_input or "").strip()
+		clean_input = self.normalizer.normalize(user_input or "")
 		if not clean_input:
-			reply = "請告訴我你想控制的設備或需求。"
+			reply = REPLY_EMPTY_INPUT
 			out = AgentResult(
 				reply=reply,
 				actions=[],
@@ -117,7 +148,7 @@ class SmartHomeAgent:
 		
 		exit_keywords = ["掰掰", "再見", "結束", "退出", "待機"]
 		if any(ek in clean_input for ek in exit_keywords):
-			reply = "好的，我先休息囉，有需要請隨時叫我！"
+			reply = REPLY_STANDBY
 			out = AgentResult(
                 reply=reply,
                 actions=[{"type": "ENTER_STANDBY"}],
@@ -128,6 +159,9 @@ class SmartHomeAgent:
 			return out
 
 
+		# 上一輪剛執行的學習指令被說「不對 / 取消」→ 降級（learned_commands.py）
+		self.parser.fastpath.feedback(clean_input)
+
 		decision = self.router.route(clean_input)
 		# 如果沒有傳入新值，就沿用 state 目前保留的數值
 		new_setpoint = current_temp if current_temp is not None else self.state.setpoint_temp
@@ -153,7 +187,7 @@ class SmartHomeAgent:
 		# Rule-teaching commands are handled by fastpath learner directly.
 		learned = self.parser.fastpath.learn_rule(clean_input)
 		if learned is not None:
-			reply = "好的，我已經記住這條規則。"
+			reply = REPLY_RULE_LEARNED
 			self.state.set_state(
 				status="executed",
 				llm_reply=reply,
@@ -167,53 +201,100 @@ class SmartHomeAgent:
 			self._save_turn(clean_input, result.reply)
 			return result
 
-		question_keywords = ["嗎", "呢", "狀態", "有沒有", "是不是", "確認", "幾度", "?", "？", "高", "低", "升", "降", "調"]
-		is_question = any(q in clean_input for q in question_keywords)
-		if not is_question:
-			fast_actions = self.parser.fastpath.parse(clean_input)
-			if fast_actions:
-				is_valid, error_msg = self._validate_actions(fast_actions)
-				if not is_valid:
-					result = AgentResult(
-                        reply=error_msg,
-                        actions=[],
-                        route_type=RouteType.FAST_COMMAND,
-                        intent=Intent.DEVICE_CONTROL
-                    )
-					self._save_turn(clean_input, result.reply)
-					return result
-	
-				self.action_executor(fast_actions)
-				reply = "好的，已為你處理。"
-
-				self.state.set_state(
-					raw_actions=fast_actions,
-					validated_actions=fast_actions,
-					status="executed",
-					llm_reply=reply,
-				)
-
-				for action in fast_actions:
-					action_type = str(action.get("type", ""))
-					if action_type == "SET_TEMP":
-						self.state.set_state(setpoint_temp=action.get("value"))
-					elif action_type == "FAN":
-						self.state.set_state(fan_state=action.get("state"))
-					elif action_type == "LED":
-						loc = str(action.get("location", "UNKNOWN")).upper()
-						self.state.led_states[loc] = action.get("state")
-						self.state.set_state(led_states=self.state.led_states)
+		# Status questions are answered from StateManager without the LLM.
+		# 模板查詢只要幾微秒、而且本身就會排除指令句，所以不管 Router 怎麼分都先試
+		# （意圖模型常把 "is the fan on" 分成 DEVICE_CONTROL）。
+		query_answer = self.query_engine.answer(clean_input, self.state)
+		if query_answer is not None:
+			self.state.set_state(
+				last_intent=Intent.QUERY.value,
+				status="query_answered",
+				parse_source="local_query",
+				llm_reply=query_answer.reply,
+			)
+			result = AgentResult(
+				reply=query_answer.reply,
+				actions=[],
+				route_type=RouteType.LOCAL_QUERY,
+				intent=Intent.QUERY,
+			)
+			self._save_turn(clean_input, result.reply)
+			return result
 
+		# fastpath 回傳分數 / 歧義 / 覆蓋率，由 escalation policy 決定：本地執行、反問、或交給 LLM
+		fast = self.parser.fastpath.analyze(
+			clean_input,
+			current_temp=self.state.setpoint_temp,
+			fan_state=self.state.fan_state,
+			led_states=self.state.led_states,
+		)
+		if decision.route_type == RouteType.LOCAL_QUERY and not self.parser.fastpath.is_explicit_command(clean_input):
+			# Router 判斷是查詢、模板又答不了（天氣、時間、開放式問題）：沒有明確指令就不在本地執行或反問，直接交給 LLM
+			decision_out = EscalationDecision(Decision.ESCALATE, "router_query")
+		else:
+			decision_out = self.escalation.decide(fast)
+		if decision_out.decision == Decision.EXECUTE:
+			fast_actions = fast.actions
+			is_valid, error_msg = self._validate_actions(fast_actions)
+			if not is_valid:
 				result = AgentResult(
-					reply=reply,
-					actions=fast_actions,
-					route_type=RouteType.FAST_COMMAND,
-					intent=Intent.DEVICE_CONTROL,
-				)
+                    reply=error_msg,
+                    actions=[],
+                    route_type=RouteType.FAST_COMMAND,
+                    intent=Intent.DEVICE_CONTROL
+                )
 				self._save_turn(clean_input, result.reply)
 				return result
-		else:
-			print(f"偵測到疑問句 '{clean_input}'，跳過 FastPath，準備交給 LLM...")
+
+			self.action_executor(fast_actions)
+			self.parser.fastpath.record(clean_input, fast_actions, fast)
+			reply = REPLY_DONE
+
+			self.state.set_state(
+				raw_actions=fast_actions,
+				validated_actions=fast_actions,
+				status="executed",
+				llm_reply=reply,
+			)
+
+			for action in fast_actions:
+				action_type = str(action.get("type", ""))
+				if action_type == "SET_TEMP":
+					self.state.set_state(setpoint_temp=action.get("value"))
+				elif action_type == "FAN":
+					self.state.set_state(fan_state=action.get("state"))
+				elif action_type == "LED":
+					loc = str(action.get("location", "UNKNOWN")).upper()
+					self.state.led_states[loc] = action.get("state")
+					self.state.set_state(led_states=self.state.led_states)
+
+			result = AgentResult(
+				reply=reply,
+				actions=fast_actions,
+				route_type=RouteType.FAST_COMMAND,
+				intent=Intent.DEVICE_CONTROL,
+			)
+			self._save_turn(clean_input, result.reply)
+			return result
+
+		if decision_out.decision == Decision.CLARIFY:
+			reply = decision_out.clarification or REPLY_CLARIFY
+			self.state.set_state(
+				status="needs_clarification",
+				needs_clarification=True,
+				clarification_message=reply,
+				llm_reply=reply,
+			)
+			result = AgentResult(
+				reply=reply,
+				actions=[],
+				route_type=RouteType.FAST_COMMAND,
+				intent=Intent.DEVICE_CONTROL,
+			)
+			self._save_turn(clean_input, result.reply)
+			return result
+
+		print(f"FastPath 無法確定 '{clean_input}'（{decision_out.reason}, score={fast.score:.2f}），準備交給 LLM...")
 		memory_context = self.memory.get_context(limit=5)
 		current_status_info = (
             f"[系統當前硬體狀態] "
@@ -232,7 +313,7 @@ class SmartHomeAgent:
 		result = AgentResult(
 			reply=llm_reply,
 			actions=[],
-			route_type=decision.route_type,
+			route_type=RouteType.LLM,
 			intent=decision.intent,
 		)
 		self._save_turn(clean_input, result.reply)
@@ -278,20 +359,36 @@ if __name__ == "__main__":
 #
 # SmartHomeAgent.handle(...) 一輪完整流程：
 # Step 1: 清理輸入
-# - 將 user_input 做 strip。
+# - normalizer.normalize(user_input)：全形轉半形 (NFKC)、常用指令字簡轉繁、
+#   重複標點/空白收斂，最後 strip。
 # - 若為空字串，直接回覆提示訊息，並寫入 memory。
 #
 # Step 2: 路由判斷
-# - 呼叫 router.route(clean_input) 得到 intent 與 route_type。
+# - 呼叫 router.route(clean_input) 得到 intent、route_type 與信心度
+#   （有訓練好的 n-gram 模型時用模型，否則用關鍵字）。
 # - 同步更新 state：conversation_active、last_user_input、last_intent。
 #
 # Step 3: SYSTEM 指令快速處理
 # - 若 intent 是 SYSTEM，交給 _handle_system_intent。
 # - 目前支援「清除記憶/reset」：會清 short-term memory 並重置對話狀態。
 #
+# Step 3.5: 本地狀態查詢
+# - query_engine.answer(clean_input, state) 能回答的設備狀態問題
+#   （設定溫度、室溫、濕度、風扇、各房間燈、哪些開著）直接用模板回覆，
+#   intent=QUERY、route=LOCAL_QUERY；開放式問題才交給 LLM。
+# - 不管 Router 怎麼分都先試（模板查詢很便宜，而且會排除指令句）。
+# - Router 判斷為查詢 (route=LOCAL_QUERY) 但模板答不了（天氣、時間…），
+#   句子裡又沒有明確的開/關或調溫說法 → 不走 Step 4，直接進 Step 5 交給 LLM。
+#
 # Step 4: FAST_COMMAND 路徑
-# - 呼叫 parser.parse(..., return_reply=True)：
-#   parser 內部流程是 fastpath -> gemini fallback。
+# - fastpath.analyze(...) 回傳 FastPathResult（actions、score、coverage、ambiguities）。
+# - escalation.decide(result) 決定：
+#   EXECUTE  -> 本地執行；
+#   CLARIFY  -> 缺開/關、指令互相衝突、不存在的房間 → 本地反問，不呼叫 LLM；
+#   ESCALATE -> 疑問句、分數太低或沒命中 → 進入 Step 5。
+#   門檻在 config.FASTPATH_*，每次決策都有計數，關機時寫到 data/metrics/。
+# - LLM 反覆解成同樣動作的句子會被 learned_commands 升級成 fastpath 指令（source="learned"）；
+#   執行後使用者馬上說「不對 / 取消」或對同一設備下相反指令，該指令會被降級。
 # - 取得 actions 後，交給 action_executor(actions) 執行。
 # - 若 parser 沒給 reply，使用預設 reply。
 # - 根據 actions 更新 state.device_states：
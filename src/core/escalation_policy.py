@@ -0,0 +1,141 @@
+# src/core/escalation_policy.py
+"""
+Decide what to do with a FastPathResult: execute locally, ask a local
+clarification, or escalate to the LLM.
+
+This replaces the agent's hand-written question_keywords gate. The thresholds
+live in config (FASTPATH_*) and every decision is counted, together with a
+histogram of fastpath scores, so the hit-rate / accuracy trade-off can be
+tuned from data: `snapshot()` returns the counters and `dump()` writes them to
+data/metrics/fastpath_decisions.json.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any, Dict, Optional
+
+import src.utils.config as config
+from src.core.parser.fastpath_parser import (
+    AMBIGUITY_CONFLICTING_STATE,
+    AMBIGUITY_MISSING_STATE,
+    AMBIGUITY_QUESTION_FORM,
+    AMBIGUITY_UNKNOWN_LOCATION,
+    FastPathResult,
+)
+from src.utils.file_io import atomic_write_text
+
+CLARIFIABLE = (AMBIGUITY_MISSING_STATE, AMBIGUITY_CONFLICTING_STATE, AMBIGUITY_UNKNOWN_LOCATION)
+
+
+class Decision(StrEnum):
+    EXECUTE = "execute"
+    CLARIFY = "clarify"
+    ESCALATE = "escalate"
+
+
+@dataclass(slots=True)
+class EscalationDecision:
+    decision: Decision
+    reason: str
+    clarification: Optional[str] = None
+
+
+class EscalationPolicy:
+    """Threshold policy over FastPathResult, with per-decision counters."""
+
+    def __init__(
+        self,
+        execute_threshold: float = config.FASTPATH_EXECUTE_THRESHOLD,
+        clarify_min_coverage: float = config.FASTPATH_CLARIFY_MIN_COVERAGE,
+        stats_path=config.FASTPATH_STATS_FILE,
+    ) -> None:
+        self.execute_threshold = execute_threshold
+        self.clarify_min_coverage = clarify_min_coverage
+        self.stats_path = str(stats_path)
+        self.decisions: Counter = Counter()
+        self.reasons: Counter = Counter()
+        self.score_histogram: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # ---------- decision ----------
+    def _decide(self, result: FastPathResult) -> EscalationDecision:
+        ambiguities = set(result.ambiguities)
+        # 「燈開了嗎」「風扇開了沒」是在問狀態；不是禮貌請求的問句一律不在本地執行
+        if AMBIGUITY_QUESTION_FORM in ambiguities:
+            return EscalationDecision(Decision.ESCALATE, AMBIGUITY_QUESTION_FORM)
+        if result.actions and result.score >= self.execute_threshold:
+            return EscalationDecision(Decision.EXECUTE, "score")
+
+        clarifiable = [a for a in result.ambiguities if a in CLARIFIABLE]
+        if (
+            clarifiable
+            and AMBIGUITY_QUESTION_FORM not in ambiguities
+            and result.coverage >= self.clarify_min_coverage
+        ):
+            reason = clarifiable[0]
+            return EscalationDecision(Decision.CLARIFY, reason, self.clarification(reason, result))
+
+        if not result.actions:
+            reason = result.ambiguities[0] if result.ambiguities else "no_match"
+        elif result.ambiguities:
+            reason = result.ambiguities[0]
+        else:
+            reason = "low_score"
+        return EscalationDecision(Decision.ESCALATE, reason)
+
+    def decide(self, result: FastPathResult) -> EscalationDecision:
+        out = self._decide(result)
+        with self._lock:
+            self.decisions[out.decision.value] += 1
+            self.reasons[f"{out.decision.value}:{out.reason}"] += 1
+            if result.actions:
+                self.score_histogram[f"{min(int(result.score * 10), 9) / 10:.1f}"] += 1
+        return out
+
+    @staticmethod
+    def clarification(reason: str, result: FastPathResult) -> str:
+        english = result.text.isascii()
+        if reason == AMBIGUITY_UNKNOWN_LOCATION:
+            if english:
+                return "I can only control the living room, kitchen and guest room lights. Which one do you mean?"
+            return "目前只能控制客廳、廚房和客房的燈喔，請問要哪一間？"
+        if english:
+            target = " and ".join(result.targets) or "device"
+            return f"Do you want the {target} on or off?"
+        target = "和".join(result.targets) or "設備"
+        return f"請問{target}要開還是關呢？"
+
+    # ---------- counters ----------
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "thresholds": {
+                    "execute": self.execute_threshold,
+                    "clarify_min_coverage": self.clarify_min_coverage,
+                },
+                "decisions": dict(self.decisions),
+                "reasons": dict(self.reasons),
+                "score_histogram": dict(sorted(self.score_histogram.items())),
+            }
+
+    def dump(self, path: Optional[str] = None) -> None:
+        """把計數器寫成 JSON（關機時呼叫）。"""
+        if not self.decisions:
+            return
+        try:
+            atomic_write_text(path or self.stats_path, json.dumps(self.snapshot(), ensure_ascii=False, indent=2))
+        except Exception as e:
+            print(f"寫入 fastpath 統計失敗: {e}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self.decisions.clear()
+            self.reasons.clear()
+            self.score_histogram.clear()
+
+
+DEFAULT_ESCALATION_POLICY = EscalationPolicy()
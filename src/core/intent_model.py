@@ -0,0 +1,367 @@
+# src/core/intent_model.py
+"""
+Local character n-gram Naive Bayes intent model (NumPy only).
+
+IntentClassifier used to scan keyword lists and return the first intent whose
+list matched. This model scores every Intent at once from hashed character
+1~3-grams, so it also handles utterances with no listed keyword ("好暗喔",
+"有點悶"), and it returns probabilities that the Router can threshold.
+
+- Features: character n-grams of the lowercased text with ^/$ boundaries,
+  hashed with crc32 into `n_buckets` (power of two), so there is no
+  vocabulary to store.
+- Model: multinomial Naive Bayes with Laplace smoothing. The file is one
+  compressed .npz: labels, log priors and a (n_buckets, n_classes) float32
+  log-likelihood table (~100 KB at 4096 buckets).
+- Prediction: n-gram -> bucket lookups (memoized crc32), one row gather and
+  one sum; a spoken command takes a few tens of microseconds on a desktop.
+
+Training data is the built-in SEED_EXAMPLES plus weakly labelled turns from
+long_term.jsonl / history.jsonl / the learned-command table (see
+`weak_label`). Retrain and print a held-out accuracy/latency report with:
+
+    python -m src.core.intent_model train
+    python -m src.core.intent_model report
+    python -m src.core.intent_model predict "客廳燈有開嗎"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Allow direct execution: python src/core/intent_model.py
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import src.utils.config as config
+from src.core.router import Intent, is_system_reset_command
+
+_SPACE_RE = re.compile(r"\s+")
+MAX_CACHED_NGRAMS = 50_000
+DEVICE_REPLY_RE = re.compile(r"已為您|已為你|幫您開|幫您關|開啟|關閉|調整至|調到|設定為|turned (?:on|off)|set (?:it )?to", re.IGNORECASE)
+ERROR_REPLY_RE = re.compile(r"無法連線|無法理解|再說一次|gemini_error", re.IGNORECASE)
+
+# Hand-labelled seeds so a fresh install (empty logs) still gets a usable model.
+SEED_EXAMPLES: Dict[Intent, Tuple[str, ...]] = {
+    Intent.DEVICE_CONTROL: (
+        "開客廳燈", "關掉廚房燈", "打開風扇", "風扇關掉", "幫我把燈都關掉", "全部關掉", "開燈", "關燈",
+        "把溫度調到26度", "冷氣調高一度", "溫度降兩度", "設定二十五度", "好熱", "好冷", "有點悶", "好暗喔",
+        "客房燈打開", "開風扇跟客廳燈", "晚安幫我全部關掉", "調低一點", "太冷了調高一點", "把冷氣關小一點",
+        "turn on the kitchen light", "turn off the fan", "set the temperature to 24", "lights off",
+        "switch on the living room lamp", "turn it up", "it's too hot", "make it cooler",
+        "turn on the fan", "turn the fan on", "fan on", "lights on", "turn the lights on", "switch off the fan",
+    ),
+    Intent.QUERY: (
+        "客廳燈有開嗎", "現在幾度", "冷氣設定幾度", "濕度多少", "風扇有開嗎", "哪些設備開著",
+        "目前狀態", "室溫多少", "今天天氣如何", "明天會下雨嗎", "現在幾點", "今天星期幾",
+        "外面氣溫幾度", "廚房燈是開的嗎", "為什麼風扇會開著", "冷氣要開幾度比較好",
+        "is the kitchen light on", "what's on", "what is the temperature", "how humid is it",
+        "what time is it", "will it rain tomorrow", "what's the weather like",
+        "is the fan on", "is the fan running", "are the lights on", "is the living room light on",
+        "which lights are on", "is anything on", "what's the ac set to", "what temperature is it set to",
+        "is the guest room light off", "are all the lights off",
+    ),
+    Intent.CHAT: (
+        "你好", "哈囉", "謝謝", "謝謝你", "講個笑話", "陪我聊天", "早安", "你是誰", "你會做什麼",
+        "我今天好累", "好無聊", "講個故事", "你真棒", "我愛你", "嗨",
+        "hello", "hi there", "thank you", "tell me a joke", "who are you", "good morning", "i'm bored",
+    ),
+    Intent.SYSTEM: (
+        "清除記憶", "重置", "重設記憶", "清空記憶", "reset", "clear memory", "reset memory",
+    ),
+}
+
+
+# -------------------------
+# Features
+# -------------------------
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3)) -> List[str]:
+    text = _SPACE_RE.sub(" ", (text or "").strip().lower())
+    if not text:
+        return []
+    padded = f"^{text}$"
+    size = len(padded)
+    lo, hi = ngram_range
+    return [padded[i:i + n] for n in range(lo, hi + 1) for i in range(size - n + 1)]
+
+
+def hash_ngrams(text: str, n_buckets: int, ngram_range: Tuple[int, int] = (1, 3)) -> np.ndarray:
+    mask = n_buckets - 1
+    return np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) & mask for g in char_ngrams(text, ngram_range)),
+        dtype=np.int64,
+    )
+
+
+# -------------------------
+# Model
+# -------------------------
+class NGramIntentModel:
+    """Multinomial Naive Bayes over hashed character n-grams."""
+
+    def __init__(
+        self,
+        labels: Sequence[Intent],
+        log_prior: np.ndarray,
+        log_prob: np.ndarray,
+        ngram_range: Tuple[int, int] = (1, 3),
+    ) -> None:
+        self.labels = [Intent(l) for l in labels]
+        self.log_prior = np.asarray(log_prior, dtype=np.float32)
+        self.log_prob = np.ascontiguousarray(log_prob, dtype=np.float32)  # (n_buckets, n_classes)
+        self.n_buckets = int(self.log_prob.shape[0])
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        # n-gram -> bucket 的快取；常用指令的 n-gram 很快就全部命中，不用每次算 crc32
+        self._buckets: Dict[str, int] = {}
+
+    @classmethod
+    def fit(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[Intent],
+        n_buckets: int = 4096,
+        ngram_range: Tuple[int, int] = (1, 3),
+        alpha: float = 0.5,
+    ) -> "NGramIntentModel":
+        if n_buckets & (n_buckets - 1):
+            raise ValueError("n_buckets 必須是 2 的次方")
+        classes = sorted({Intent(l) for l in labels}, key=lambda i: i.value)
+        index = {c: k for k, c in enumerate(classes)}
+        counts = np.zeros((n_buckets, len(classes)), dtype=np.float64)
+        docs = np.zeros(len(classes), dtype=np.float64)
+        for text, label in zip(texts, labels):
+            k = index[Intent(label)]
+            np.add.at(counts[:, k], hash_ngrams(text, n_buckets, ngram_range), 1.0)
+            docs[k] += 1
+        smoothed = counts + alpha
+        log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=0, keepdims=True))
+        log_prior = np.log(docs / docs.sum())
+        return cls(classes, log_prior, log_prob, ngram_range)
+
+    # ---------- prediction ----------
+    def _indices(self, text: str) -> List[int]:
+        buckets = self._buckets
+        grams = char_ngrams(text, self.ngram_range)
+        idx = [buckets.get(g, -1) for g in grams]
+        if -1 in idx:
+            if len(buckets) >= MAX_CACHED_NGRAMS:
+                buckets.clear()
+            mask = self.n_buckets - 1
+            for k, g in enumerate(grams):
+                if idx[k] < 0:
+                    idx[k] = buckets[g] = zlib.crc32(g.encode("utf-8")) & mask
+        return idx
+
+    def scores(self, text: str) -> np.ndarray:
+        idx = self._indices(text)
+        if not idx:
+            return self.log_prior.copy()
+        return self.log_prior + self.log_prob.take(idx, axis=0).sum(axis=0)
+
+    def predict_proba(self, text: str) -> Dict[Intent, float]:
+        s = self.scores(text)
+        p = np.exp(s - s.max())
+        p /= p.sum()
+        return {label: float(v) for label, v in zip(self.labels, p)}
+
+    def predict(self, text: str) -> Tuple[Intent, float]:
+        s = self.scores(text)
+        p = np.exp(s - s.max())
+        k = int(p.argmax())
+        return self.labels[k], float(p[k] / p.sum())
+
+    # ---------- persistence ----------
+    def save(self, path) -> None:
+        path = str(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            labels=np.array([l.value for l in self.labels]),
+            log_prior=self.log_prior,
+            log_prob=self.log_prob,
+            ngram_range=np.array(self.ngram_range),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> "NGramIntentModel":
+        with np.load(str(path), allow_pickle=False) as data:
+            return cls(
+                [str(l) for l in data["labels"]],
+                data["log_prior"],
+                data["log_prob"],
+                tuple(int(v) for v in data["ngram_range"]),
+            )
+
+
+# -------------------------
+# Training data
+# -------------------------
+_LABEL_FASTPATH = None
+
+
+def weak_label(user_text: str, assistant_text: str = "") -> Optional[Intent]:
+    """用規則幫對話紀錄標記 intent；判斷不出來回傳 None（不拿來訓練）。"""
+    from src.core.parser.fastpath_parser import FastPathParser  # 避免循環 import
+    from src.core.query_engine import DEFAULT_QUERY_ENGINE
+    from src.core.router import IntentClassifier
+
+    global _LABEL_FASTPATH
+    if _LABEL_FASTPATH is None:
+        # 不套學習指令表，避免模型拿自己的輸出當標籤
+        _LABEL_FASTPATH = FastPathParser(use_learned=False)
+
+    text = (user_text or "").strip()
+    if not text:
+        return None
+    if is_system_reset_command(text):
+        return Intent.SYSTEM
+    if DEFAULT_QUERY_ENGINE.classify(text) is not None:
+        return Intent.QUERY
+    if _LABEL_FASTPATH.analyze(text, current_temp=25).actions:
+        return Intent.DEVICE_CONTROL
+    keyword_intent = IntentClassifier(use_model=False).classify(text)
+    if keyword_intent in (Intent.QUERY, Intent.CHAT):
+        return keyword_intent
+    if assistant_text and not ERROR_REPLY_RE.search(assistant_text) and DEVICE_REPLY_RE.search(assistant_text):
+        return Intent.DEVICE_CONTROL
+    return None
+
+
+def _read_jsonl(path) -> Iterable[dict]:
+    if not os.path.exists(str(path)):
+        return
+    with open(str(path), "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
+
+
+def load_training_data(
+    long_term_path=config.LONG_TERM,
+    history_path=config.HISTORY_FILE,
+    include_seeds: bool = True,
+    include_learned: bool = True,
+) -> Tuple[List[str], List[Intent]]:
+    """回傳去重後的 (texts, labels)；同一句話以最後一次的標記為準。"""
+    samples: Dict[str, Intent] = {}
+    if include_seeds:
+        for intent, texts in SEED_EXAMPLES.items():
+            for t in texts:
+                samples[t] = intent
+    for rec in _read_jsonl(long_term_path):
+        label = weak_label(rec.get("user", ""), rec.get("assistant", ""))
+        if label is not None:
+            samples[rec["user"].strip()] = label
+    for rec in _read_jsonl(history_path):
+        result = rec.get("result")
+        user = (rec.get("user") or "").strip()
+        if user and isinstance(result, dict) and result.get("actions"):
+            samples[user] = Intent.DEVICE_CONTROL
+    if include_learned:
+        from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS, STATUS_ACTIVE  # 避免循環 import
+        for key in DEFAULT_LEARNED_COMMANDS.entries(STATUS_ACTIVE):
+            samples[key] = Intent.DEVICE_CONTROL
+    return list(samples), list(samples.values())
+
+
+def split_holdout(texts: Sequence[str], labels: Sequence[Intent], holdout: float = 0.2):
+    """依文字的 crc32 固定切分，重新訓練時同一句話永遠落在同一邊。"""
+    train, test = ([], []), ([], [])
+    cut = int(holdout * 1000)
+    for t, l in zip(texts, labels):
+        side = test if zlib.crc32(t.encode("utf-8")) % 1000 < cut else train
+        side[0].append(t)
+        side[1].append(l)
+    return train, test
+
+
+def evaluate(model: NGramIntentModel, texts: Sequence[str], labels: Sequence[Intent], repeat: int = 20) -> Dict[str, object]:
+    per_class: Dict[str, List[int]] = {}
+    correct = 0
+    for t, l in zip(texts, labels):
+        pred, _ = model.predict(t)
+        ok = int(pred == l)
+        correct += ok
+        per_class.setdefault(Intent(l).value, []).append(ok)
+    timings: List[float] = []
+    for _ in range(repeat):
+        for t in texts:
+            start = time.perf_counter()
+            model.predict(t)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+
+    def pct(p: float) -> float:
+        return round(timings[min(len(timings) - 1, int(p * len(timings)))], 1) if timings else 0.0
+
+    return {
+        "samples": len(texts),
+        "accuracy": round(correct / len(texts), 3) if texts else None,
+        "per_class": {k: round(sum(v) / len(v), 3) for k, v in sorted(per_class.items())},
+        "latency_us": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+    }
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src.core.intent_model", description="Train / evaluate the local intent model.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train", help="retrain from seeds + logs and write the model file")
+    tr.add_argument("--out", default=str(config.INTENT_MODEL_FILE))
+    tr.add_argument("--holdout", type=float, default=0.2)
+    tr.add_argument("--buckets", type=int, default=4096)
+    tr.add_argument("--alpha", type=float, default=0.5)
+    tr.add_argument("--no-seeds", action="store_true")
+    rp = sub.add_parser("report", help="held-out accuracy / latency of the saved model")
+    rp.add_argument("--model", default=str(config.INTENT_MODEL_FILE))
+    rp.add_argument("--holdout", type=float, default=0.2)
+    pr = sub.add_parser("predict", help="print probabilities for one utterance")
+    pr.add_argument("text")
+    pr.add_argument("--model", default=str(config.INTENT_MODEL_FILE))
+    args = ap.parse_args(argv)
+
+    if args.cmd == "predict":
+        model = NGramIntentModel.load(args.model)
+        for intent, p in sorted(model.predict_proba(args.text).items(), key=lambda kv: -kv[1]):
+            print(f"{intent.value:15} {p:.3f}")
+        return 0
+
+    texts, labels = load_training_data(include_seeds=not getattr(args, "no_seeds", False))
+    (train_x, train_y), (test_x, test_y) = split_holdout(texts, labels, args.holdout)
+    if args.cmd == "train":
+        print(f"訓練資料 {len(train_x)} 句，保留測試 {len(test_x)} 句")
+        held = NGramIntentModel.fit(train_x, train_y, n_buckets=args.buckets, alpha=args.alpha)
+        report = evaluate(held, test_x, test_y)
+        # 報告用切分後的模型，實際存檔的模型用全部資料訓練
+        model = NGramIntentModel.fit(texts, labels, n_buckets=args.buckets, alpha=args.alpha)
+        model.save(args.out)
+        print(f"模型已寫入 {args.out}")
+    else:
+        model = NGramIntentModel.load(args.model)
+        report = evaluate(model, test_x, test_y)
+        print("注意：存檔的模型包含保留測試資料，這裡的 accuracy 會偏高。")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
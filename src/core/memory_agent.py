@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import atexit
 import json
 import os
 import sys
+import threading
 import time
+from collections import deque
 from pathlib import Path
 from typing import Any
 
@@ -11,18 +14,26 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from src.utils.config import LONG_TERM, SHORT_TERM
+from src.utils.config import LONG_TERM, MEMORY_FLUSH_SEC, SHORT_TERM
+from src.utils.file_io import atomic_write_text
+from src.utils.write_behind import WriteBehind
 
 
 class ConversationMemory:
-    """Short-term memory: keep recent interactions in short_term.json."""
+    """Short-term memory: recent interactions live in a deque, short_term.json is a write-behind copy."""
 
-    def __init__(self, short_term_path: Path = SHORT_TERM, keep: int = 10) -> None:
+    def __init__(self, short_term_path: Path = SHORT_TERM, keep: int = 10, flush_delay: float = MEMORY_FLUSH_SEC) -> None:
         self.short_term_path = Path(short_term_path)
         self.keep = keep
         self.short_term_path.parent.mkdir(parents=True, exist_ok=True)
+        # 啟動時讀一次檔案，之後 deque 才是唯一的資料來源
+        self._interactions: deque[dict[str, Any]] = deque(
+            self._read().get("interactions", [])[-self.keep :],
+            maxlen=self.keep,
+        )
+        self._persister = WriteBehind(self._flush_to_disk, delay=flush_delay)
         if not self.short_term_path.exists():
-            self._write({"interactions": [], "updated_at": int(time.time())})
+            self._flush_to_disk()
 
     # helper methods to read/write the short-term memory file
     def _read(self) -> dict[str, Any]:
@@ -38,48 +49,60 @@ class ConversationMemory:
             return {"interactions": [], "updated_at": int(time.time())}
 
     def _write(self, data: dict[str, Any]) -> None:
-        self.short_term_path.write_text(
+        atomic_write_text(
+            str(self.short_term_path),
             json.dumps(data, ensure_ascii=False, indent=2),
-            encoding="utf-8",
         )
 
+    def _flush_to_disk(self) -> None:
+        self._write({"interactions": list(self._interactions), "updated_at": int(time.time())})
+
     # 主要功能區
     def add(self, user_input: str, response: str) -> None:
-        data = self._read()
-        interactions = data.get("interactions", [])
-        interactions.append(
+        self._interactions.append(
             {
                 "ts": int(time.time()),
                 "user": (user_input or "").strip(),
                 "assistant": (response or "").strip(),
             }
         )
-        data["interactions"] = interactions[-self.keep :]
-        data["updated_at"] = int(time.time())
-        self._write(data)
+        self._persister.mark_dirty()
 
     def get_recent(self, limit: int = 5) -> list[dict[str, Any]]:
-        data = self._read()
-        interactions = data.get("interactions", [])
-        return interactions[-max(1, limit) :]
+        return list(self._interactions)[-max(1, limit) :]
 
     def get_all(self) -> list[dict[str, Any]]:
-        return self._read().get("interactions", [])
+        return list(self._interactions)
 
     def clear(self) -> None:
         """清空短期記憶，但保留長期記憶。"""
-        self._write({"interactions": [], "updated_at": int(time.time())}) # "interactions": [] 清空對話
+        self._interactions.clear()
+        self._persister.mark_dirty()
+
+    def flush(self) -> None:
+        """把尚未寫出的短期記憶立即寫入 short_term.json。"""
+        self._persister.flush()
 
 
 class MemoryAgent:
     """Facade for short-term and long-term memory operations."""
 
-    def __init__(self, short_keep: int = 10, long_term_path: Path = LONG_TERM) -> None:
-        self.conversation = ConversationMemory(keep=short_keep)
+    def __init__(
+        self,
+        short_keep: int = 10,
+        long_term_path: Path = LONG_TERM,
+        short_term_path: Path = SHORT_TERM,
+        flush_delay: float = MEMORY_FLUSH_SEC,
+    ) -> None:
+        self.conversation = ConversationMemory(short_term_path=short_term_path, keep=short_keep, flush_delay=flush_delay)
         self.long_term_path = Path(long_term_path)
         self.long_term_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.long_term_path.exists():
-            self.long_term_path.write_text("", encoding="utf-8")
+        # 長期記憶維持一個 buffered append handle，由 write-behind 定時 flush
+        # 寫入在呼叫端執行緒、flush 在 timer 執行緒：write / flush / close 都要拿同一把鎖
+        self._long_term_lock = threading.Lock()
+        self._long_term_fh = self.long_term_path.open("a", encoding="utf-8")
+        self._long_term_persister = WriteBehind(self._flush_long_term, delay=flush_delay)
+        atexit.register(self.close)
 
     def save_interaction(self, user_input: str, response: str) -> None:
         """保存一輪對話:短期記憶 + 長期記憶"""
@@ -89,8 +112,32 @@ class MemoryAgent:
             "user": (user_input or "").strip(),
             "assistant": (response or "").strip(),
         }
-        with self.long_term_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._long_term_lock:
+            if self._long_term_fh.closed:
+                # 已經 close()（例如 atexit 之後還有人存）：直接 append，不再經過 write-behind
+                with self.long_term_path.open("a", encoding="utf-8") as f:
+                    f.write(line)
+                return
+            self._long_term_fh.write(line)
+        self._long_term_persister.mark_dirty()
+
+    def _flush_long_term(self) -> None:
+        """write-behind 的 timer callback；close() 之後才觸發時什麼都不做。"""
+        with self._long_term_lock:
+            if not self._long_term_fh.closed:
+                self._long_term_fh.flush()
+
+    def flush(self) -> None:
+        """立即寫出短期記憶與長期記憶的緩衝內容（關機前呼叫）。"""
+        self.conversation.flush()
+        self._long_term_persister.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._long_term_lock:
+            if not self._long_term_fh.closed:
+                self._long_term_fh.close()
 
     def get_recent_memory(self, limit: int = 5) -> list[dict[str, Any]]:
         """取得近期對話記憶，預設5條。"""
@@ -136,11 +183,11 @@ if __name__ == "__main__":
 
 """
 程式運作原理
-1.ConversationMemory 負責「短期記憶」檔案（通常 short_term.json）。
+1.ConversationMemory 負責「短期記憶」，資料放在記憶體 deque，short_term.json 由背景定時寫入（或 flush() 時寫入）。
 2.MemoryAgent 是對外入口，呼叫 ConversationMemory，並可同時寫長期記憶（long_term.jsonl）。
 3.每輪對話 save_interaction(user, response)：
 - 寫到 short-term（保留最近 N 筆）
-- append 一行到 long-term（累積歷史）
+- append 一行到 long-term（累積歷史，buffered handle，定時 flush）
 4.get_recent_memory(limit) 取最近幾筆給 LLM。
 5.get_context(limit) 把最近幾筆整理成 prompt 字串。
 6.clear_memory() 清空短期記憶（通常長期不清）。
@@ -10,21 +10,35 @@ from dataclasses import dataclass
 from typing import Optional
 
 from .fastpath_parser import (
+	ClauseSegmenter,
 	DeviceCommandParser,
+	DeviceHits,
 	FastPathParser,
+	FastPathResult,
 	HistoryRecorder,
+	RelativeTemperatureParser,
 	RuleApplier,
 	RuleLearner,
+	RuleRewriter,
 	TemperatureParser,
 	apply_memory_rules,
 	extract_explicit_temp,
+	find_rule_conflicts,
 	parse_fastpath,
 	try_learn_rule,
 )
+from .keyword_index import KeywordAutomaton, KeywordHit
+from .learned_commands import LearnedCommandTable
+from .numerals import NumberToken, scan_numbers
+from .phonetic_index import PhoneticIndex, PhoneticMatch
 from .gemini_parser import GeminiParser, PromptBuilder, ResponseParser, parse_with_gemini
 import random
 import re
 
+# fastpath 成功時隨機挑一句回覆（固定句，src/audio/reply_cache.py 會預先合成語音）
+FAST_REPLIES_EN = ("Got it.", "Right away.", "Done.")
+FAST_REPLIES_ZH = ("好的，馬上為您處理。", "沒問題，幫您執行。", "收到。")
+
 @dataclass(slots=True)
 class ParserFacade: 
 	"""Unified parser entrypoint for application use.
@@ -55,13 +69,13 @@ class ParserFacade:
 				return [], "好的，我已經記住這條規則。"
 			return []
 
-		fast_actions = self.fastpath.parse(user_text)
+		fast_actions = self.fastpath.parse(user_text, current_temp=current_temp)
 		if fast_actions:
 			if return_reply:
 				if re.search(r'[A-Za-z]', user_text):
-					reply_text = random.choice(["Got it.", "Right away.", "Done."])
+					reply_text = random.choice(FAST_REPLIES_EN)
 				else:
-					reply_text = random.choice(["好的，馬上為您處理。", "沒問題，幫您執行。", "收到。"])
+					reply_text = random.choice(FAST_REPLIES_ZH)
 					
 				return fast_actions, reply_text, "command"
 		
@@ -87,21 +101,36 @@ DEFAULT_PARSER = init_parser_facade()
 
 
 __all__ = [
+	"ClauseSegmenter",
 	"DeviceCommandParser",
+	"DeviceHits",
 	"FastPathParser",
+	"FastPathResult",
 	"GeminiParser",
 	"HistoryRecorder",
+	"KeywordAutomaton",
+	"KeywordHit",
+	"LearnedCommandTable",
+	"NumberToken",
 	"ParserFacade",
+	"PhoneticIndex",
+	"PhoneticMatch",
 	"PromptBuilder",
+	"RelativeTemperatureParser",
 	"ResponseParser",
 	"RuleApplier",
 	"RuleLearner",
+	"RuleRewriter",
 	"TemperatureParser",
 	"DEFAULT_PARSER",
+	"FAST_REPLIES_EN",
+	"FAST_REPLIES_ZH",
 	"apply_memory_rules",
 	"extract_explicit_temp",
+	"find_rule_conflicts",
 	"init_parser_facade",
 	"parse_fastpath",
+	"scan_numbers",
 	"parse_with_gemini",
 	"try_learn_rule",
 ]
@@ -12,8 +12,9 @@ from __future__ import annotations
 import re
 import math
 import sys
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Hashable, Set
 
 # Allow direct execution: python src/core/parser/fastpath_parser.py
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
@@ -23,7 +24,12 @@ if str(PROJECT_ROOT) not in sys.path:
 try:
     import src.utils.config as config
     from src.core.actions_schema import ActionDict
-    from src.utils.file_io import push_history, load_rules, append_line_unique
+    from src.core.parser.keyword_index import KeywordAutomaton
+    from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS, LearnedCommandTable
+    from src.core.parser.numerals import NumberToken, has_temperature_cue, scan_numbers
+    from src.core.parser.phonetic_index import PhoneticIndex
+    from src.utils.file_io import push_history, append_line_unique
+    from src.utils.rule_store import DEFAULT_RULE_STORE, RuleStore
 except ModuleNotFoundError:
     # Fallback for direct file runs when src package optional deps are missing.
     SRC_ROOT = PROJECT_ROOT / "src"
@@ -31,7 +37,12 @@ except ModuleNotFoundError:
         sys.path.insert(0, str(SRC_ROOT))
     import src.utils.config as config
     from src.core.actions_schema import ActionDict
-    from src.utils.file_io import push_history, load_rules, append_line_unique
+    from src.core.parser.keyword_index import KeywordAutomaton
+    from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS, LearnedCommandTable
+    from src.core.parser.numerals import NumberToken, has_temperature_cue, scan_numbers
+    from src.core.parser.phonetic_index import PhoneticIndex
+    from src.utils.file_io import push_history, append_line_unique
+    from src.utils.rule_store import DEFAULT_RULE_STORE, RuleStore
 
 # -------------------------
 # Math helpers
@@ -54,11 +65,70 @@ LEARN_PATTERNS = [
 # -------------------------
 # Fast local extraction
 # -------------------------
-NUM_RE = re.compile(r"(-?\d+(?:\.\d+)?)\s*(?:度|°|c|℃)?", re.IGNORECASE)
+# Numbers (Arabic / 二十六 / twenty six) are scanned by src.core.parser.numerals
+
+# Relative temperature adjustments ("溫度調高一度", "冷氣降兩度", "turn it up")
+REL_UP_RE = re.compile(
+    r"調高|升高|提高|拉高|調暖|升溫|加溫|往上|弱一?[點些]|高一?[點些]|升|加|"
+    r"warmer|higher|raise|increase|turn (?:[a-z]+ ){0,3}up|bump (?:[a-z]+ ){0,3}up",
+    re.IGNORECASE,
+)
+REL_DOWN_RE = re.compile(
+    r"調低|降低|拉低|調涼|降溫|往下|強一?[點些]|低一?[點些]|降|減|"
+    r"cooler|colder|lower|decrease|turn (?:[a-z]+ ){0,3}down",
+    re.IGNORECASE,
+)
+REL_ABSOLUTE_RE = re.compile(r"(?:到|成|為|至|\bto)\s*$", re.IGNORECASE)
+REL_CONTEXT_RE = re.compile(r"溫度|冷氣|空調|temperature|temp|thermostat|aircon|\bac\b|\bheat", re.IGNORECASE)
+REL_OTHER_DEVICE_RE = re.compile(r"風扇|燈|fan|light|lamp", re.IGNORECASE)
+# 不在控制範圍內、但也會「調高/調低」的東西：「音量調高」「turn up the music」不是調溫
+REL_OTHER_OBJECT_RE = re.compile(
+    r"音量|音樂|聲音|電視|亮度|volume|music|sound|tv|television|radio|songs?|speakers?|brightness|bass",
+    re.IGNORECASE,
+)
+# 「turn X up」「turn up X」的受詞：只允許代名詞 / 程度詞，其他名詞（the music）就不是調溫
+REL_TURN_PHRASE_RE = re.compile(r"\b(?:turn|bump)\s+((?:[a-z']+\s+){0,3}?)(?:up|down)\b((?:\s+[a-z']+){0,3})", re.IGNORECASE)
+REL_TURN_FILLER = frozenset(
+    "it the a an bit little lot more some please just now again one two three notch degree degrees "
+    "then and".split()
+)
+# 體感句：「好熱」→ 調低，「好冷」→ 調高；太/超/死/爆/too 視為強烈，調 2 度
+# 「熱鬧」「熱情」「熱門」「冷靜」「冷門」「冷淡」不是體感
+COMFORT_HOT_RE = re.compile(r"(好|太|很|有點|超|真)熱(?!鬧|情|門)|熱死|熱爆|too hot|so hot|i'?m hot|it'?s hot", re.IGNORECASE)
+COMFORT_COLD_RE = re.compile(r"(好|太|很|有點|超|真)冷(?!靜|門|淡)|冷死|冷爆|too cold|so cold|i'?m cold|it'?s cold|freezing", re.IGNORECASE)
+COMFORT_STRONG_RE = re.compile(r"太|超|死|爆|too|freezing", re.IGNORECASE)
+# 體感句只在講「現在、這個房間」時才調溫：「這杯咖啡好熱」「外面好冷」講的是別的東西，
+# 「昨天好冷」「剛剛好熱」講的是過去，都不動冷氣
+COMFORT_OTHER_SUBJECT_RE = re.compile(
+    r"咖啡|茶|湯|水|飯|麵|菜|食物|飲料|牛奶|杯|碗|鍋|爐|烤箱|外面|戶外|"
+    r"coffee|tea|soup|water|food|drink|milk|cup|bowl|pan|pot|stove|oven|outside|outdoors",
+    re.IGNORECASE,
+)
+COMFORT_PAST_RE = re.compile(
+    r"昨天|昨晚|前天|剛剛|剛才|那時|那天|之前|以前|上次|上週|去年|"
+    r"yesterday|last (?:night|week|time|year)|earlier|\bwas\b|\bwere\b",
+    re.IGNORECASE,
+)
+
+# Compound commands: "開客廳燈然後把溫度調到26度", "turn on the fan and the kitchen light"
+CLAUSE_SPLIT_RE = re.compile(
+    r"然後|接著|再來|之後|並且|而且|同時|還有|順便|以及|跟|和|與|"
+    r"\band then\b|\bthen\b|\band\b|\balso\b|[，,。；;！!、\n]",
+    re.IGNORECASE,
+)
 
 # Chinese/English keyword sets
 KW_ON  = ("開", "打開", "開啟", "on", "turn on", "open")
 KW_OFF = ("關", "關掉", "關閉", "off", "turn off", "close")
+KW_ALL = ("全部", "all")
+KW_FAN = ("風扇", "fan")
+KW_LIGHT = ("燈", "light", "lamp")
+
+# 地點/裝置詞與動詞、裝置之間允許出現的字（「開 客廳 的 燈」「turn on the kitchen light」）
+SLOT_GAP_RE = re.compile(r"(?:\s|的|\bthe\b|\ba\b|\bmy\b)*", re.IGNORECASE)
+
+# Tags emitted by DeviceCommandParser's keyword automaton
+TAG_ON, TAG_OFF, TAG_ALL, TAG_FAN, TAG_LIGHT, TAG_LOC = "on", "off", "all", "fan", "light", "loc"
 
 class RuleLearner:
     """責任：處理 LEARN_PATTERNS、try_learn_rule"""
@@ -71,11 +141,13 @@ class RuleLearner:
         rules_file: str = config.RULES_FILE,
         append_unique_fn=append_line_unique,
         push_history_fn=push_history,
+        rule_store: Optional[RuleStore] = None,
     ) -> None:
         self.patterns = patterns or LEARN_PATTERNS
         self.rules_file = rules_file
         self.append_unique_fn = append_unique_fn
         self.push_history_fn = push_history_fn
+        self.rule_store = rule_store or DEFAULT_RULE_STORE
 
     def _normalize_phrase(self, text: str) -> str:
         return (text or "").strip().strip("「」\"'")
@@ -98,54 +170,103 @@ class RuleLearner:
             return None
 
         trigger, meaning = extracted
+        existing = [t for t, _ in self.rule_store.get_rules() if t != trigger]
+        conflicts = find_rule_conflicts(existing + [trigger])
+        conflicts = [pair for pair in conflicts if trigger in pair]
         rule_line = f"RULE: When user says '{trigger}', it means '{meaning}'."
         self.append_unique_fn(self.rules_file, rule_line)
-        out = {"intent": "learn_rule", "saved_rule": {"trigger": trigger, "meaning": meaning}}
+        self.rule_store.invalidate()
+        out: Dict[str, Any] = {"intent": "learn_rule", "saved_rule": {"trigger": trigger, "meaning": meaning}}
+        if conflicts:
+            # 較長的 trigger 會優先匹配（leftmost-longest），這裡只提醒使用者
+            print(f"⚠️ 規則 '{trigger}' 與既有規則互為前綴: {conflicts}")
+            out["conflicts"] = [list(pair) for pair in conflicts]
         self.push_history_fn(user_text, out)
         return out
 
+def find_rule_conflicts(triggers: List[str]) -> List[Tuple[str, str]]:
+    """找出互為前綴的 trigger，回傳 (較短, 較長) 配對。"""
+    conflicts: List[Tuple[str, str]] = []
+    stack: List[str] = []
+    for trig in sorted(set(t for t in triggers if t)):
+        while stack and not trig.startswith(stack[-1]):
+            stack.pop()
+        conflicts.extend((prefix, trig) for prefix in stack)
+        stack.append(trig)
+    return conflicts
+
+class RuleRewriter:
+    """責任：把整組規則編譯成一個 automaton，一次掃描完成替換"""
+    """採 leftmost-longest、不重疊替換，替換後的文字不會再被其他規則改寫"""
+
+    def __init__(self, rules: Tuple[Tuple[str, str], ...] = ()) -> None:
+        # 同一個 trigger 學了兩次時，以最後學到的意思為準
+        self.meanings: Dict[str, str] = {t: m for t, m in rules if t}
+        self.index = KeywordAutomaton(((t, t) for t in self.meanings), case_sensitive=True)
+
+    @property
+    def conflicts(self) -> List[Tuple[str, str]]:
+        return find_rule_conflicts(list(self.meanings))
+
+    def rewrite(self, text: str) -> str:
+        if not text or not self.meanings:
+            return text
+        hits = sorted(self.index.scan(text), key=lambda h: (h.start, -len(h.keyword)))
+        out: List[str] = []
+        pos = 0
+        for hit in hits:
+            if hit.start < pos:
+                continue
+            out.append(text[pos:hit.start])
+            out.append(self.meanings[hit.keyword])
+            pos = hit.end
+        if pos == 0:
+            return text
+        out.append(text[pos:])
+        return "".join(out)
+
 class RuleApplier:
     """責任：apply_memory_rules"""
     """只做規則套用，不做裝置解析"""
+    """規則由 RuleStore 快取，編譯好的 RuleRewriter 只在規則變動時重建"""
 
-    def __init__(self, load_rules_fn=load_rules) -> None:
-        self.load_rules_fn = load_rules_fn
+    def __init__(self, load_rules_fn=None) -> None:
+        self.load_rules_fn = load_rules_fn or DEFAULT_RULE_STORE.get_rules
+        self._compiled_from: Any = None
+        self._rewriter = RuleRewriter()
 
-    def _apply_one(self, text: str, trigger: str, meaning: str) -> str:
-        if not trigger:
-            return text
-        return text.replace(trigger, meaning)
+    def rewriter(self) -> RuleRewriter:
+        rules = self.load_rules_fn()
+        # RuleStore 在規則沒變時回傳同一個 tuple，用 identity 判斷即可
+        if rules is not self._compiled_from:
+            self._rewriter = RuleRewriter(tuple(rules))
+            self._compiled_from = rules
+        return self._rewriter
 
     def apply(self, user_text: str) -> str:
-        text = user_text or ""
-        for trigger, meaning in self.load_rules_fn():
-            text = self._apply_one(text, trigger, meaning)
-        return text
+        return self.rewriter().rewrite(user_text or "")
 
 class TemperatureParser:
-    """責任：NUM_RE、extract_explicit_temp、round/clamp 到 SET_TEMP action"""
+    """責任：數字掃描（阿拉伯/中文/英文數字）、extract_explicit_temp、round/clamp 到 SET_TEMP action"""
 
     def __init__(
         self,
         min_temp: float = config.MIN_TEMP,
         max_temp: float = config.MAX_TEMP,
-        num_re: re.Pattern[str] = NUM_RE,
+        scan_fn=scan_numbers,
     ) -> None:
         self.min_temp = min_temp
         self.max_temp = max_temp
-        self.num_re = num_re
+        self.scan_fn = scan_fn
 
     def extract_explicit_temp(self, user_text: str) -> Optional[float]:
-        matches = self.num_re.findall(user_text or "")
-        if not matches:
-            return None
-        for s in matches:
-            try:
-                v = float(s)
-            except Exception:
+        text = user_text or ""
+        for token in self.scan_fn(text):
+            # 中文/英文數字太常見（一點、一下），要有「度」或「調到」之類的線索才算溫度
+            if token.kind != "arabic" and not has_temperature_cue(text, token):
                 continue
-            if 0.0 <= v <= 60.0:
-                return v
+            if 0.0 <= token.value <= 60.0:
+                return token.value
         return None
 
     def parse(self, text: str) -> Optional[List[ActionDict]]:
@@ -158,15 +279,144 @@ class TemperatureParser:
         temp_i = int(clamp(temp_i, int(self.min_temp), int(self.max_temp)))
         return [{"type": "SET_TEMP", "value": temp_i}]
 
+class RelativeTemperatureParser:
+    """責任：相對調溫（調高/降 N 度、一點、好熱/好冷）→ 以目前設定溫度換算成 SET_TEMP"""
+
+    def __init__(
+        self,
+        min_temp: float = config.MIN_TEMP,
+        max_temp: float = config.MAX_TEMP,
+        default_step: float = 1.0,
+        strong_comfort_step: float = 2.0,
+    ) -> None:
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+        self.default_step = default_step
+        self.strong_comfort_step = strong_comfort_step
+
+    def extract_delta(self, text: str) -> Optional[float]:
+        """回傳帶正負號的調整量（度）；不是相對調溫句時回傳 None。"""
+        text = text or ""
+        tokens = scan_numbers(text)
+        if any(REL_ABSOLUTE_RE.search(text[max(0, t.start - 4):t.start]) for t in tokens):
+            return None  # 「調高到 28 度」是絕對溫度，交給 TemperatureParser
+        # 第一個帶「度/degree」單位的數字就是調整量
+        m: Optional[NumberToken] = next((t for t in tokens if t.unit), None)
+
+        up = REL_UP_RE.search(text)
+        down = REL_DOWN_RE.search(text)
+        if up and down:
+            # 兩個方向都有時取先出現的那個
+            if up.start() <= down.start():
+                down = None
+            else:
+                up = None
+
+        direction = up or down
+        if direction:
+            has_temp_word = REL_CONTEXT_RE.search(text) is not None
+            if not has_temp_word and (REL_OTHER_DEVICE_RE.search(text) or REL_OTHER_OBJECT_RE.search(text)):
+                return None  # 「燈調亮一點」「風扇調強」「音量調高」不是調溫
+            if not has_temp_word and self._turn_phrase_has_object(text):
+                return None  # 「turn up the music」「turn the stove down」
+            # 單字方向詞（升/降/加/減）太常見，要有溫度字眼或「N 度」才算
+            if not (has_temp_word or m or len(direction.group()) >= 2):
+                return None
+            step = self.default_step
+            if m is not None:
+                if m.value <= 0:
+                    return None
+                step = m.value
+            return step if up else -step
+
+        if REL_OTHER_DEVICE_RE.search(text):
+            return None  # 「好熱，開風扇」交給 DeviceCommandParser
+        if COMFORT_OTHER_SUBJECT_RE.search(text) or COMFORT_PAST_RE.search(text):
+            return None  # 「這杯咖啡好熱」「昨天好冷」不是要調溫
+        step = self.strong_comfort_step if COMFORT_STRONG_RE.search(text) else self.default_step
+        if COMFORT_HOT_RE.search(text):
+            return -step
+        if COMFORT_COLD_RE.search(text):
+            return step
+        return None
+
+    @staticmethod
+    def _turn_phrase_has_object(text: str) -> bool:
+        for m in REL_TURN_PHRASE_RE.finditer(text):
+            words = (m.group(1) + " " + m.group(2)).lower().split()
+            if any(w not in REL_TURN_FILLER for w in words):
+                return True
+        return False
+
+    def is_comfort_only(self, text: str) -> bool:
+        """只有「好熱/好冷」體感、沒有調整方向詞。"""
+        text = text or ""
+        if REL_UP_RE.search(text) or REL_DOWN_RE.search(text):
+            return False
+        if COMFORT_OTHER_SUBJECT_RE.search(text) or COMFORT_PAST_RE.search(text):
+            return False
+        return bool(COMFORT_HOT_RE.search(text) or COMFORT_COLD_RE.search(text))
+
+    def parse(self, text: str, current_temp: Optional[float]) -> Optional[List[ActionDict]]:
+        if current_temp is None:
+            return None
+        delta = self.extract_delta(text)
+        if delta is None:
+            return None
+        try:
+            base = float(current_temp)
+        except (TypeError, ValueError):
+            return None
+        temp_i = round_half_up(clamp(base + delta, self.min_temp, self.max_temp))
+        temp_i = int(clamp(temp_i, int(self.min_temp), int(self.max_temp)))
+        return [{"type": "SET_TEMP", "value": temp_i}]
+
+class DeviceHits:
+    """一次掃描得到的關鍵字命中結果，子解析器只看這份結果做判斷。"""
+
+    __slots__ = ("tags", "locations", "default_state")
+
+    def __init__(self, tags: Set[Hashable], locations: List[str], default_state: Optional[str] = None) -> None:
+        self.tags = tags
+        self.locations = locations
+        # 沒有動詞的子句（「…跟廚房燈」）沿用前後子句的開/關
+        self.default_state = default_state
+
+    def has(self, tag: Hashable) -> bool:
+        return tag in self.tags
+
+    def has_device(self) -> bool:
+        return TAG_FAN in self.tags or TAG_LIGHT in self.tags or bool(self.locations)
+
+    def explicit_state(self) -> Optional[str]:
+        """開/關只出現其中一種時回傳 "on"/"off"，互相衝突或都沒有則回傳 None。"""
+        on, off = TAG_ON in self.tags, TAG_OFF in self.tags
+        if on and not off:
+            return "on"
+        if off and not on:
+            return "off"
+        return None
+
+    def state(self) -> Optional[str]:
+        """子句本身的開/關；沒有動詞時才用 default_state。"""
+        if TAG_ON in self.tags or TAG_OFF in self.tags:
+            return self.explicit_state()
+        return self.default_state
+
 class DeviceCommandParser:
     """責任：風扇、燈、全部關閉等裝置語句解析"""
-    """可再拆成 FanParser、LightParser（你規則再多時很有用）"""
+    """所有關鍵字在建構時編譯成一個 Aho-Corasick automaton，每次 parse 只掃描一次"""
 
     def __init__(
         self,
         loc_map: Optional[Dict[str, Tuple[str, ...]]] = None,
         kw_on: Tuple[str, ...] = KW_ON,
         kw_off: Tuple[str, ...] = KW_OFF,
+        kw_all: Tuple[str, ...] = KW_ALL,
+        kw_fan: Tuple[str, ...] = KW_FAN,
+        kw_light: Tuple[str, ...] = KW_LIGHT,
+        phonetic_index: Optional[PhoneticIndex] = None,
+        use_phonetic: bool = config.PHONETIC_MATCH_ENABLED,
     ) -> None:
         self.loc_map = loc_map or {
             config.LOC_KITCHEN: ("廚房", "kitchen"),
@@ -175,98 +425,146 @@ class DeviceCommandParser:
         }
         self.kw_on = kw_on
         self.kw_off = kw_off
+        self.kw_all = kw_all
+        self.kw_fan = kw_fan
+        self.kw_light = kw_light
+        self.index = self._build_index()
+        self.phonetic_index = (phonetic_index or self._build_phonetic_index()) if use_phonetic else None
+
+    def _build_phonetic_index(self) -> PhoneticIndex:
+        """同音 / 近音錯字索引：地點、裝置與多字動詞；單字詞（燈/開/關）只做緊鄰替換。"""
+        vocab: List[str] = []
+        anchored: List[str] = []
+        for keywords in (self.kw_on, self.kw_off, self.kw_all, self.kw_fan, self.kw_light, *self.loc_map.values()):
+            for k in keywords:
+                (anchored if len(k) == 1 else vocab).append(k)
+        return PhoneticIndex(
+            vocab,
+            min_confidence=config.PHONETIC_MIN_CONFIDENCE,
+            max_distance=config.PHONETIC_MAX_DISTANCE,
+            anchored_words=anchored,
+        )
+
+    def _build_index(self) -> KeywordAutomaton:
+        entries: List[Tuple[str, Hashable]] = []
+        for tag, keywords in (
+            (TAG_ON, self.kw_on),
+            (TAG_OFF, self.kw_off),
+            (TAG_ALL, self.kw_all),
+            (TAG_FAN, self.kw_fan),
+            (TAG_LIGHT, self.kw_light),
+        ):
+            entries.extend((k, tag) for k in keywords)
+        for loc, keys in self.loc_map.items():
+            entries.extend((k, (TAG_LOC, loc)) for k in keys)
+        return KeywordAutomaton(entries)
 
-    def _contains_any(self, text: str, keywords: Tuple[str, ...]) -> bool:
-        t = (text or "").lower()
-        return any(k.lower() in t for k in keywords)
+    def scan(self, text: str) -> DeviceHits:
+        """單次掃描 text，回傳所有命中的 tag 與位置（依 loc_map 順序）。"""
+        tags = self.index.tags(text)
+        locations = [loc for loc in self.loc_map if (TAG_LOC, loc) in tags]
+        return DeviceHits(tags, locations)
 
-    def _parse_all_off(self, t: str) -> Optional[List[ActionDict]]:
-        if not (("全部" in t or "all" in t) and self._contains_any(t, self.kw_off)):
-            return None
-        return [
-            {"type": "LED", "location": config.LOC_KITCHEN, "state": "off"},
-            {"type": "LED", "location": config.LOC_LIVING, "state": "off"},
-            {"type": "LED", "location": config.LOC_GUEST, "state": "off"},
-            {"type": "FAN", "state": "off"},
-        ]
-
-    def _parse_fan(self, t: str) -> Optional[List[ActionDict]]:
-        if ("風扇" not in t) and ("fan" not in t):
+    def _all_leds(self, state: str) -> List[ActionDict]:
+        return [{"type": "LED", "location": loc, "state": state} for loc in self.loc_map]
+
+    def _parse_all_off(self, hits: DeviceHits) -> Optional[List[ActionDict]]:
+        if not (hits.has(TAG_ALL) and (hits.has(TAG_OFF) or hits.state() == "off")):
             return None
-        if self._contains_any(t, self.kw_on) and not self._contains_any(t, self.kw_off):
-            return [{"type": "FAN", "state": "on"}]
-        if self._contains_any(t, self.kw_off) and not self._contains_any(t, self.kw_on):
-            return [{"type": "FAN", "state": "off"}]
-        return None
+        return self._all_leds("off") + [{"type": "FAN", "state": "off"}]
 
-    def _parse_lights_by_location(self, t: str) -> Optional[List[ActionDict]]:
-        if not any(k in t for keys in self.loc_map.values() for k in keys):
+    def _parse_fan(self, hits: DeviceHits) -> Optional[List[ActionDict]]:
+        if not hits.has(TAG_FAN):
             return None
-        if self._contains_any(t, self.kw_on) and not self._contains_any(t, self.kw_off):
-            state = "on"
-        elif self._contains_any(t, self.kw_off) and not self._contains_any(t, self.kw_on):
-            state = "off"
-        else:
+        state = hits.state()
+        if state is None:
             return None
+        return [{"type": "FAN", "state": state}]
 
-        actions_loc: List[ActionDict] = []
-        for loc, keys in self.loc_map.items():
-            if any(k in t for k in keys):
-                actions_loc.append({"type": "LED", "location": loc, "state": state})
-        return actions_loc or None
-
-    def _parse_lights_with_explicit_word(self, t: str) -> Optional[List[ActionDict]]:
-        found_any = False
-        actions_out: List[ActionDict] = []
-        for loc, keys in self.loc_map.items():
-            if any(k in t for k in keys) and ("燈" in t or "light" in t or "lamp" in t):
-                found_any = True
-                if self._contains_any(t, self.kw_on) and not self._contains_any(t, self.kw_off):
-                    actions_out.append({"type": "LED", "location": loc, "state": "on"})
-                elif self._contains_any(t, self.kw_off) and not self._contains_any(t, self.kw_on):
-                    actions_out.append({"type": "LED", "location": loc, "state": "off"})
-                else:
-                    return None
-        if found_any and actions_out:
-            return actions_out
-        return None
-
-    def _parse_lights_global(self, t: str) -> Optional[List[ActionDict]]:
-        if not ("燈" in t or "light" in t or "lamp" in t):
+    def _parse_lights_by_location(self, hits: DeviceHits) -> Optional[List[ActionDict]]:
+        if not hits.locations:
             return None
-        if self._contains_any(t, self.kw_on) and not self._contains_any(t, self.kw_off):
-            return [
-                {"type": "LED", "location": config.LOC_KITCHEN, "state": "on"},
-                {"type": "LED", "location": config.LOC_LIVING, "state": "on"},
-                {"type": "LED", "location": config.LOC_GUEST, "state": "on"},
-            ]
-        if self._contains_any(t, self.kw_off) and not self._contains_any(t, self.kw_on):
-            return [
-                {"type": "LED", "location": config.LOC_KITCHEN, "state": "off"},
-                {"type": "LED", "location": config.LOC_LIVING, "state": "off"},
-                {"type": "LED", "location": config.LOC_GUEST, "state": "off"},
-            ]
-        return None
+        state = hits.state()
+        if state is None:
+            return None
+        return [{"type": "LED", "location": loc, "state": state} for loc in hits.locations]
 
-    def parse(self, text: str) -> Optional[List[ActionDict]]:
-        t = (text or "").lower()
+    def _parse_lights_global(self, hits: DeviceHits) -> Optional[List[ActionDict]]:
+        if not hits.has(TAG_LIGHT):
+            return None
+        state = hits.state()
+        if state is None:
+            return None
+        return self._all_leds(state)
+
+    def parse(self, text: str, default_state: Optional[str] = None) -> Optional[List[ActionDict]]:
+        return self.parse_with_confidence(text, default_state)[0]
+
+    def parse_with_confidence(self, text: str, default_state: Optional[str] = None) -> Tuple[Optional[List[ActionDict]], float]:
+        """回傳 (actions, confidence)。
+        完全命中關鍵字為 1.0；靠同音/近音修正才解析出來的，信心度是修正中最低的那個。
+        修正候選低於門檻時回傳 (None, 候選信心度)，交給 Gemini。"""
+        hits = self.scan(text)
+        hits.default_state = default_state
+        actions = self.parse_hits(hits)
+        if self.phonetic_index is None:
+            return actions, (1.0 if actions else 0.0)
+
+        match = self.phonetic_index.correct(text)
+        if match.corrections:
+            corrected = self.scan(match.text)
+            corrected.default_state = default_state
+            corrected_actions = self.parse_hits(corrected)
+            if corrected_actions:
+                return corrected_actions, match.confidence
+        # 「開客天燈」：地點/裝置的位置上有一個像卻不夠像的詞，寧可交給 Gemini 也不要開全部的燈
+        unsure = [c for c in match.rejected if self.scan(c.word).has_device() and self._in_device_slot(text, c)]
+        if actions and not unsure:
+            return actions, 1.0
+        return None, max((c.confidence for c in unsure), default=match.best_rejected)
+
+    def _in_device_slot(self, text: str, cand) -> bool:
+        """候選詞是否落在地點/裝置的位置：緊接在開/關/全部之後，或緊接在燈/風扇之前。
+        「just turn on the fan」的 just 在句首，不算。"""
+        for hit in self.index.scan(text):
+            if hit.tag in (TAG_LIGHT, TAG_FAN) and hit.start >= cand.end and SLOT_GAP_RE.fullmatch(text[cand.end:hit.start]):
+                return True
+            if hit.tag in (TAG_ON, TAG_OFF, TAG_ALL) and hit.end <= cand.start and SLOT_GAP_RE.fullmatch(text[hit.end:cand.start]):
+                return True
+        return False
 
-        actions = self._parse_all_off(t)
+    def parse_hits(self, hits: DeviceHits) -> Optional[List[ActionDict]]:
+        actions = self._parse_all_off(hits)
         if actions:
             return actions
 
-        if ("風扇" in t) or ("fan" in t):
-            return self._parse_fan(t)
+        if hits.has(TAG_FAN):
+            return self._parse_fan(hits)
 
-        actions = self._parse_lights_by_location(t)
+        actions = self._parse_lights_by_location(hits)
         if actions:
             return actions
 
-        actions = self._parse_lights_with_explicit_word(t)
-        if actions:
-            return actions
+        return self._parse_lights_global(hits)
+
+class ClauseSegmenter:
+    """責任：把複合指令切成子句（然後/並且/跟/和/and/then/標點），並合併去重各子句的 actions"""
+
+    def __init__(self, split_re: re.Pattern[str] = CLAUSE_SPLIT_RE) -> None:
+        self.split_re = split_re
 
-        return self._parse_lights_global(t)
+    def split(self, text: str) -> List[str]:
+        return [c.strip() for c in self.split_re.split(text or "") if c and c.strip()]
+
+    @staticmethod
+    def merge(action_lists: List[List[ActionDict]]) -> List[ActionDict]:
+        """同一個設備（type + location）只留最後一個子句的指令，順序依第一次出現。"""
+        merged: Dict[Tuple[Any, Any], ActionDict] = {}
+        for actions in action_lists:
+            for action in actions:
+                # dict 重新賦值不會改變順序
+                merged[(action.get("type"), action.get("location"))] = action
+        return list(merged.values())
 
 class HistoryRecorder:
     """責任：push_history 的包裝"""
@@ -278,6 +576,42 @@ class HistoryRecorder:
     def record_fastpath(self, user_text: str, actions: List[ActionDict]) -> None:
         self.push_history_fn(user_text, {"fastpath": True, "actions": actions})
 
+# Coverage / ambiguity signals for FastPathResult
+FILLER_RE = re.compile(
+    r"幫我|幫忙|請|麻煩|可以|能不能|一下|給我|把|的|了|吧|喔|哦|啦|呀|嘛|耶|嗎|好嗎|都|就|我要|我想|"
+    r"\bplease\b|\bthe\b|\ba\b|\bto\b|\bcan you\b|\bcould you\b|\bi want\b",
+    re.IGNORECASE,
+)
+TEMP_SET_RE = re.compile(r"調到|調成|調整|設定|設成|設為|設在|改成|調|\bset\b|\bto\b", re.IGNORECASE)
+QUESTION_FORM_RE = re.compile(r"為什麼|為何|怎麼|是不是|有沒有|了沒有|了沒|沒有|嗎|呢|\?|？|\bwhy\b|\bwhat\b|\bhow\b|\bis it\b", re.IGNORECASE)
+POLITE_REQUEST_RE = re.compile(r"可以|能不能|能否|幫我|幫忙|請|麻煩|\bcan you\b|\bcould you\b|\bplease\b", re.IGNORECASE)
+UNKNOWN_LOCATION_RE = re.compile(r"臥室|臥房|主臥|房間|書房|浴室|廁所|陽台|走廊|玄關|bedroom|bathroom|balcony|hallway|study room", re.IGNORECASE)
+
+AMBIGUITY_CONFLICTING_STATE = "conflicting_state"  # 同一子句同時有開和關
+AMBIGUITY_MISSING_STATE = "missing_state"          # 講了裝置但沒說開或關
+AMBIGUITY_UNKNOWN_LOCATION = "unknown_location"    # 不支援的房間
+AMBIGUITY_PHONETIC_UNSURE = "phonetic_unsure"      # 近音修正信心不足
+AMBIGUITY_QUESTION_FORM = "question_form"          # 疑問句（不是禮貌型指令）
+
+@dataclass(slots=True)
+class FastPathResult:
+    """一次 fastpath 分析的完整結果，讓呼叫端（EscalationPolicy）決定要執行、反問還是交給 LLM。"""
+
+    actions: List[ActionDict] = field(default_factory=list)
+    score: float = 0.0                  # 0~1，綜合信心度 / 覆蓋率 / 歧義
+    confidence: float = 0.0             # 關鍵字層級的信心度（近音修正會低於 1）
+    coverage: float = 0.0               # 輸入中被關鍵字、數字、填充詞解釋掉的比例
+    keywords: List[str] = field(default_factory=list)
+    ambiguities: List[str] = field(default_factory=list)
+    targets: List[str] = field(default_factory=list)  # 提到的裝置（反問時用）
+    source: str = "none"                # relative_temp / temperature / device / compound / learned / none
+    text: str = ""                      # 套用記憶規則後的文字
+    learned_key: Optional[str] = None   # source == "learned" 時的學習指令 key
+
+    @property
+    def matched(self) -> bool:
+        return bool(self.actions)
+
 class FastPathParser:
     """規則基礎的快速解析器，嘗試從使用者輸入中直接提取明確指令，避免不必要的 LLM 呼叫。"""
 
@@ -288,37 +622,242 @@ class FastPathParser:
         temperature_parser: Optional[TemperatureParser] = None,
         device_parser: Optional[DeviceCommandParser] = None,
         history_recorder: Optional[HistoryRecorder] = None,
+        relative_temperature_parser: Optional[RelativeTemperatureParser] = None,
+        clause_segmenter: Optional[ClauseSegmenter] = None,
+        ambiguity_penalty: float = config.FASTPATH_AMBIGUITY_PENALTY,
+        learned_commands: Optional[LearnedCommandTable] = None,
+        use_learned: bool = config.LEARNED_COMMANDS_ENABLED,
     ) -> None:
         """初始化 FastPathParser，目前無需額外參數。"""
         self.history_recorder = history_recorder or HistoryRecorder()
         self.rule_learner = rule_learner or RuleLearner(push_history_fn=self.history_recorder.push_history_fn)
         self.rule_applier = rule_applier or RuleApplier()
         self.temperature_parser = temperature_parser or TemperatureParser()
+        self.relative_temperature_parser = relative_temperature_parser or RelativeTemperatureParser()
+        self.clause_segmenter = clause_segmenter or ClauseSegmenter()
         self.device_parser = device_parser or DeviceCommandParser()
+        self.ambiguity_penalty = ambiguity_penalty
+        # LLM 反覆解出同樣結果的句子（learned_commands.py），整句比對
+        self.learned_commands = (learned_commands if learned_commands is not None else DEFAULT_LEARNED_COMMANDS) if use_learned else None
 
     def learn_rule(self, user_text: str) -> Optional[Dict[str, Any]]:
         """處理教學句規則學習，成功時回傳 learning 結果。"""
         return self.rule_learner.learn(user_text)
 
-    def parse(self, user_text: str) -> Optional[List[ActionDict]]:
-        """嘗試從 user_text 中提取明確指令，返回 ActionDict 列表或 None。"""
+    def record(self, user_text: str, actions: List[ActionDict], result: Optional[FastPathResult] = None) -> None:
+        """fastpath 指令實際執行後寫入 history；result 來自學習指令表時順便記一次命中。"""
+        self.history_recorder.record_fastpath(user_text, actions)
+        if self.learned_commands is None:
+            return
+        if result is not None and result.source == "learned":
+            self.learned_commands.mark_hit(result.learned_key, actions)
+        else:
+            self.learned_commands.check_override(actions)
+
+    def feedback(self, user_text: str) -> bool:
+        """每輪開頭呼叫：剛執行的學習指令被使用者說「不對 / 取消」時降級。"""
+        if self.learned_commands is None:
+            return False
+        return self.learned_commands.check_correction(user_text)
+
+    def is_explicit_command(self, user_text: str) -> bool:
+        """有明確的開/關動詞或調溫說法（不是只靠「好熱」「好暗喔」這類體感句或學習句推出來的）。"""
+        text = user_text or ""
+        hits = self.device_parser.scan(text)
+        if hits.has(TAG_ON) or hits.has(TAG_OFF):
+            return True
+        return bool(REL_UP_RE.search(text) or REL_DOWN_RE.search(text) or TEMP_SET_RE.search(text))
+
+    def parse(self, user_text: str, current_temp: Optional[float] = None) -> Optional[List[ActionDict]]:
+        """嘗試從 user_text 中提取明確指令，返回 ActionDict 列表或 None。
+        current_temp 是目前的冷氣設定溫度，相對調溫（調高一度、好熱）需要它。"""
+        result = self.analyze(user_text, current_temp=current_temp)
+        if result.actions:
+            self.record(user_text, result.actions, result)
+            return result.actions
+        return None
+
+    def analyze(
+        self,
+        user_text: str,
+        current_temp: Optional[float] = None,
+        fan_state: Optional[str] = None,
+        led_states: Optional[Dict[str, str]] = None,
+    ) -> FastPathResult:
+        """和 parse 相同的解析，另外回傳分數、命中的關鍵字、歧義與覆蓋率（不寫 history）。
+        fan_state / led_states 只給學習指令表檢查「是不是在相同狀態下學到的」。"""
         if not user_text or not user_text.strip():
-            return None
+            return FastPathResult(text=user_text or "")
 
         text = self.rule_applier.apply(user_text)
 
-        actions = self.temperature_parser.parse(text)
+        learned = self.learned_commands.lookup(text, current_temp, fan_state, led_states) if self.learned_commands else None
+        if learned is not None:
+            return FastPathResult(
+                actions=learned.actions,
+                score=learned.confidence,
+                confidence=learned.confidence,
+                coverage=1.0,
+                keywords=[learned.key],
+                targets=self._targets(text),
+                source="learned",
+                text=text,
+                learned_key=learned.key,
+            )
+        clauses = self.clause_segmenter.split(text) or [text]
+
+        if len(clauses) == 1:
+            actions, confidence, source = self._parse_clause(text, current_temp)
+        else:
+            actions, confidence = self._parse_clauses(clauses, current_temp)
+            source = "compound" if actions else "none"
+
+        phonetic = self.device_parser.phonetic_index.correct(text) if self.device_parser.phonetic_index else None
+        keywords, spans = self._keyword_spans(text, phonetic)
+        coverage = self._coverage(text, spans)
+        ambiguities = self._ambiguities(text, clauses, actions, confidence)
+        score = 0.0
         if actions:
-            self.history_recorder.record_fastpath(user_text, actions)
-            return actions
+            score = confidence * (0.6 + 0.4 * coverage) - self.ambiguity_penalty * len(ambiguities)
+            score = clamp(score, 0.0, 1.0)
+        return FastPathResult(
+            actions=list(actions or []),
+            score=score,
+            confidence=confidence,
+            coverage=coverage,
+            keywords=keywords,
+            ambiguities=ambiguities,
+            targets=self._targets(phonetic.text if phonetic else text),
+            source=source,
+            text=text,
+        )
+
+    def _parse_clause(
+        self, text: str, current_temp: Optional[float], default_state: Optional[str] = None
+    ) -> Tuple[Optional[List[ActionDict]], float, str]:
+        """單一子句：相對調溫 → 絕對溫度 → 裝置。回傳 (actions, confidence, source)。"""
+        # 相對調溫要先試：「調高 2 度」裡的 2 不是目標溫度
+        actions = self.relative_temperature_parser.parse(text, current_temp)
+        if actions:
+            return actions, 1.0, "relative_temp"
 
-        actions = self.device_parser.parse(text)
+        actions = self.temperature_parser.parse(text)
         if actions:
-            self.history_recorder.record_fastpath(user_text, actions)
-            return actions
+            return actions, 1.0, "temperature"
+
+        actions, confidence = self.device_parser.parse_with_confidence(text, default_state=default_state)
+        return actions, confidence, ("device" if actions else "none")
+
+    def _parse_clauses(self, clauses: List[str], current_temp: Optional[float]) -> Tuple[Optional[List[ActionDict]], float]:
+        """複合指令：每個子句各自解析，沒有動詞的子句沿用前一個（或後一個）子句的開/關。"""
+        hits = [self.device_parser.scan(c) for c in clauses]
+        states = [h.explicit_state() if (h.has(TAG_ON) or h.has(TAG_OFF)) else None for h in hits]
+        carried: List[Optional[str]] = []
+        last: Optional[str] = None
+        for st in states:
+            last = st or last
+            carried.append(last)
+        upcoming: Optional[str] = None
+        for i in range(len(states) - 1, -1, -1):
+            upcoming = states[i] or upcoming
+            if carried[i] is None:
+                carried[i] = upcoming
+
+        results: List[List[ActionDict]] = []
+        comfort: List[List[ActionDict]] = []
+        confidence = 1.0
+        best_miss = 0.0
+        running_temp = current_temp
+        for clause, st in zip(clauses, carried):
+            actions, conf, _ = self._parse_clause(clause, running_temp, default_state=st)
+            if not actions:
+                best_miss = max(best_miss, conf)
+                continue
+            confidence = min(confidence, conf)
+            for a in actions:
+                if a.get("type") == "SET_TEMP":
+                    running_temp = a.get("value")
+            if self.relative_temperature_parser.is_comfort_only(clause):
+                comfort.append(actions)
+            else:
+                results.append(actions)
+        # 「好熱，開風扇」：有明確指令時，體感句只是原因，不另外調冷氣
+        if not results:
+            results = comfort
+        merged = self.clause_segmenter.merge(results)
+        if not merged:
+            return None, best_miss
+        return merged, confidence
+
+    # ---------- scoring helpers ----------
+    def _keyword_spans(self, text: str, phonetic=None) -> Tuple[List[str], List[Tuple[int, int]]]:
+        keywords: List[str] = []
+        spans: List[Tuple[int, int]] = []
+        for hit in self.device_parser.index.scan(text):
+            keywords.append(hit.keyword)
+            spans.append((hit.start, hit.end))
+        if phonetic is not None:
+            for c in phonetic.corrections:
+                keywords.append(c.word)
+                spans.append((c.start, c.end))
+        for token in scan_numbers(text):
+            keywords.append(token.raw)
+            spans.append((token.start, token.end))
+        for rx in (REL_UP_RE, REL_DOWN_RE, REL_CONTEXT_RE, COMFORT_HOT_RE, COMFORT_COLD_RE, TEMP_SET_RE):
+            for m in rx.finditer(text):
+                keywords.append(m.group())
+                spans.append(m.span())
+        # 填充詞與連接詞不算關鍵字，但也不算「沒解釋到」的內容
+        for rx in (FILLER_RE, CLAUSE_SPLIT_RE):
+            for m in rx.finditer(text):
+                spans.append(m.span())
+        return list(dict.fromkeys(k.lower() for k in keywords)), spans
+
+    @staticmethod
+    def _coverage(text: str, spans: List[Tuple[int, int]]) -> float:
+        covered = [False] * len(text)
+        for start, end in spans:
+            for i in range(start, end):
+                covered[i] = True
+        content = [i for i, ch in enumerate(text) if ch.isalnum()]
+        if not content:
+            return 0.0
+        return sum(1 for i in content if covered[i]) / len(content)
+
+    def _ambiguities(self, text: str, clauses: List[str], actions, confidence: float) -> List[str]:
+        out: List[str] = []
+        any_state = False
+        for clause in clauses:
+            hits = self.device_parser.scan(clause)
+            has_on, has_off = hits.has(TAG_ON), hits.has(TAG_OFF)
+            any_state = any_state or has_on or has_off
+            if hits.has_device() and has_on and has_off and not hits.has(TAG_ALL):
+                out.append(AMBIGUITY_CONFLICTING_STATE)
+        if not actions and not any_state and self.device_parser.scan(text).has_device():
+            out.append(AMBIGUITY_MISSING_STATE)
+        if UNKNOWN_LOCATION_RE.search(text):
+            out.append(AMBIGUITY_UNKNOWN_LOCATION)
+        if not actions and 0.0 < confidence < 1.0:
+            out.append(AMBIGUITY_PHONETIC_UNSURE)
+        if QUESTION_FORM_RE.search(text) and not POLITE_REQUEST_RE.search(text):
+            out.append(AMBIGUITY_QUESTION_FORM)
+        return list(dict.fromkeys(out))
+
+    def _targets(self, text: str) -> List[str]:
+        hits = self.device_parser.scan(text)
+        dp = self.device_parser
+        if text.isascii():
+            targets = [f"{dp.loc_map[loc][-1]} light" for loc in hits.locations]
+            fan, light = dp.kw_fan[-1], dp.kw_light[-1]
+        else:
+            targets = [f"{dp.loc_map[loc][0]}燈" for loc in hits.locations]
+            fan, light = dp.kw_fan[0], dp.kw_light[0]
+        if hits.has(TAG_FAN):
+            targets.append(fan)
+        if not targets and hits.has(TAG_LIGHT):
+            targets.append(light)
+        return targets
 
-        return None
-    
     def match_action(self, user_text: str, action_type: str) -> bool:
         """判斷 user_text 是否明確包含特定類型的指令，例如 "SET_TEMP"、"FAN"、"LED"。"""
         actions = self.parse(user_text)
@@ -358,9 +897,9 @@ def extract_explicit_temp(user_text: str) -> Optional[float]:
     return _DEFAULT_FASTPATH_PARSER.temperature_parser.extract_explicit_temp(user_text)
 
 
-def parse_fastpath(user_text: str) -> Optional[List[ActionDict]]:
+def parse_fastpath(user_text: str, current_temp: Optional[float] = None) -> Optional[List[ActionDict]]:
     """Backward-compatible function wrapper."""
-    return _DEFAULT_FASTPATH_PARSER.parse(user_text)
+    return _DEFAULT_FASTPATH_PARSER.parse(user_text, current_temp=current_temp)
 
 
 if __name__ == "__main__":
@@ -382,6 +921,16 @@ if __name__ == "__main__":
         actions = parser.parse(text)
         print(f"input={text!r} -> actions={actions}")
 
+    print("\n[1b] Relative samples (current setpoint 25)")
+    for text in ["溫度調高一度", "冷氣降兩度", "turn it up", "好熱", "太冷了", "調高一點", "溫度調高到 28 度",
+                 "今天很熱鬧", "好熱鬧", "turn up the music", "音量調高",
+                 "這杯咖啡好熱", "昨天好冷", "it was so cold yesterday"]:
+        print(f"input={text!r} -> actions={parser.parse(text, current_temp=25)}")
+
+    print("\n[1c] Compound samples")
+    for text in ["開客廳燈然後把溫度調到26度", "打開風扇跟廚房燈", "客廳燈跟廚房燈關掉", "好熱，開風扇"]:
+        print(f"input={text!r} -> actions={parser.parse(text, current_temp=25)}")
+
     print("\n[2] Match helpers")
     print("match_action('開風扇', 'FAN'):", parser.match_action("開風扇", "FAN"))
     print("match_location('開客廳燈', 'LIVING'):", parser.match_location("開客廳燈", "LIVING"))
@@ -10,7 +10,6 @@ and recent history.jsonl into the prompt.
 from __future__ import annotations
 
 import json
-import os
 import re
 import sys
 from dataclasses import dataclass
@@ -25,24 +24,19 @@ if str(PROJECT_ROOT) not in sys.path:
 import src.utils.config as config
 from src.core.actions_schema import ActionDict
 from src.core.parser.fastpath_parser import apply_memory_rules
+from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS, LearnedCommandTable
 from src.utils.file_io import read_text, format_history_for_prompt
+from src.utils.rule_store import DEFAULT_RULE_STORE
 from src.core.validator import validate_actions
+from src.llm.gemini_client import DEFAULT_GEMINI_PROVIDER, GeminiClientProvider
+from src.llm.response_cache import DEFAULT_RESPONSE_CACHE, ResponseCache, depends_on_context, state_fingerprint
 
-# The client automatically reads GEMINI_API_KEY from environment variables.
-# client = genai.Client()  # 移到函式內初始化
+# The shared client (src.llm.gemini_client) reads GEMINI_API_KEY from the environment.
 
 _FENCE_RE_1 = re.compile(r"^```(?:json)?\s*", re.IGNORECASE)
 _FENCE_RE_2 = re.compile(r"\s*```$", re.IGNORECASE)
 
 
-def _try_load_dotenv() -> None:
-    """Best-effort .env loading so GEMINI_API_KEY can be read from project env file."""
-    try:
-        from dotenv import load_dotenv  # type: ignore
-    except Exception:
-        return
-    load_dotenv(override=False)
-
 def _strip_code_fences(s: str) -> str:
     s = (s or "").strip()
     s = _FENCE_RE_1.sub("", s)
@@ -50,27 +44,8 @@ def _strip_code_fences(s: str) -> str:
     return s.strip()
 
 def _get_gemini_client() -> Any:
-    """延遲初始化 Gemini client，避免在模塊載入時就檢查 API key"""
-    try:
-        _try_load_dotenv()
-        # Accept both names for compatibility with different SDK examples.
-        api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "缺少 API KEY 環境變數！\n"
-                "請設定環境變數：\n"
-                "export GEMINI_API_KEY='你的API金鑰'\n"
-                "或\n"
-                "export GOOGLE_API_KEY='你的API金鑰'\n"
-                "或在程式中設定：\n"
-                "import os\n"
-                "os.environ['GEMINI_API_KEY'] = '你的API金鑰'"
-            )
-        from google import genai
-
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        raise ValueError(f"初始化 Gemini client 失敗: {e}") from e
+    """回傳共用的 Gemini client（整個 process 只建立一次，連線可重複使用）"""
+    return DEFAULT_GEMINI_PROVIDER.get()
 
 
 @dataclass(slots=True)
@@ -92,7 +67,7 @@ class PromptBuilder:
     def __init__(
         self,
         memory_rule_applier: Callable[[str], str] = apply_memory_rules,
-        rules_reader: Callable[[str], str] = read_text,
+        rules_reader: Callable[[str], str] = DEFAULT_RULE_STORE.read_text,
         history_formatter: Callable[[], str] = format_history_for_prompt,
     ) -> None:
         self.memory_rule_applier = memory_rule_applier
@@ -181,10 +156,10 @@ SYSTEM RULES:
 
 === FEW-SHOT EXAMPLES ===
 User: "幫我開除防登"
-JSON: {"actions": [{"type": "LED", "location": "KITCHEN", "state": "on"}], "reply": "好的，已為您開啟廚房燈。", "intent": "command"}
+JSON: {{"actions": [{{"type": "LED", "location": "KITCHEN", "state": "on"}}], "reply": "好的，已為您開啟廚房燈。", "intent": "command"}}
 
 User: "克聽的燈幫我關掉"
-JSON: {"actions": [{"type": "LED", "location": "LIVING", "state": "off"}], "reply": "沒問題，已經關閉客廳的燈。", "intent": "command"}
+JSON: {{"actions": [{{"type": "LED", "location": "LIVING", "state": "off"}}], "reply": "沒問題，已經關閉客廳的燈。", "intent": "command"}}
 =========================
 
 TEMPERATURE INTERPRETATION:
@@ -254,22 +229,40 @@ class GeminiParser:
 
     def __init__(
         self,
-        client_factory: Callable[[], Any] = _get_gemini_client,
+        client_factory: Optional[Callable[[], Any]] = None,
         prompt_builder: Optional[PromptBuilder] = None,
         response_parser: Optional[ResponseParser] = None,
+        client_provider: Optional[GeminiClientProvider] = None,
+        response_cache: Optional[ResponseCache] = None,
+        use_cache: bool = config.RESPONSE_CACHE_ENABLED,
+        learned_commands: Optional[LearnedCommandTable] = None,
+        use_learned: bool = config.LEARNED_COMMANDS_ENABLED,
     ) -> None:
+        self.client_provider = client_provider or DEFAULT_GEMINI_PROVIDER
+        self.response_cache = (response_cache if response_cache is not None else DEFAULT_RESPONSE_CACHE) if use_cache else None
+        # 每次解析結果都交給學習指令表，重複夠多次的句子會升級成 fastpath
+        self.learned_commands = (learned_commands if learned_commands is not None else DEFAULT_LEARNED_COMMANDS) if use_learned else None
         self.client_factory = client_factory
         self.prompt_builder = prompt_builder or PromptBuilder()
         self.response_parser = response_parser or ResponseParser()
 
     def _call_gemini(self, prompt: str) -> str:
-        client = self.client_factory()
-        response = client.models.generate_content(
-            model=config.GEMINI_MODEL,
-            contents=prompt,
-        )
+        if self.client_factory is not None:
+            response = self.client_factory().models.generate_content(
+                model=config.GEMINI_MODEL,
+                contents=prompt,
+            )
+        else:
+            response = self.client_provider.generate_content(
+                model=config.GEMINI_MODEL,
+                contents=prompt,
+            )
         return response.text or ""
 
+    def _observe(self, text, actions, intent, current_temp, fan_state, led_states) -> None:
+        if self.learned_commands is not None:
+            self.learned_commands.observe(text, actions, intent, current_temp, fan_state, led_states)
+
     def parse(
         self,
         user_text: str,
@@ -284,6 +277,24 @@ class GeminiParser:
         if not user_text or not user_text.strip():
             return ([], None) if return_reply else []
 
+        # 快取命中（同一句話 + 相同設備狀態）就不用再打 Gemini
+        cache_text = self.prompt_builder.memory_rule_applier(user_text)
+        fingerprint = state_fingerprint(
+            current_temp if current_temp is not None else 25,
+            fan_state,
+            led_states or {"KITCHEN": "off", "LIVING": "off", "GUEST": "off"},
+            ambient_temp,
+            ambient_humidity,
+        )
+        # prompt 裡有對話歷史但 key 沒有：接著上一輪的省略句不查也不存
+        use_cache = self.response_cache is not None and not depends_on_context(user_text)
+        cached = self.response_cache.get(cache_text, fingerprint) if use_cache else None
+        if cached is not None:
+            # 快取重播不是新的 LLM 判斷，不算進學習表的一致次數
+            if return_reply:
+                return cached["actions"], cached["reply"], cached["intent"]
+            return cached["actions"]
+
         ctx = self.prompt_builder.build_context(user_text, current_temp, ambient_temp, ambient_humidity, fan_state=fan_state, led_states=led_states)
         prompt = self.prompt_builder.build_prompt(ctx)
 
@@ -295,6 +306,9 @@ class GeminiParser:
             return []
 
         actions, reply_text, intent = self.response_parser.parse(llm_text)
+        self._observe(cache_text, actions, intent, current_temp, fan_state, led_states)
+        if use_cache:
+            self.response_cache.put(cache_text, fingerprint, {"actions": actions, "reply": reply_text, "intent": intent})
         if return_reply:
             return actions, reply_text, intent
         return actions
@@ -0,0 +1,119 @@
+"""
+Aho-Corasick keyword automaton used by the fast-path parsers.
+
+The automaton is compiled once from every keyword the parser cares about
+(verbs, locations, devices, "all" words ...). `scan()` then reports every hit
+in a single left-to-right pass, so the cost per utterance depends on the text
+length instead of (number of keywords x number of passes).
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class KeywordHit:
+    """One keyword occurrence: text[start:end] == keyword."""
+
+    start: int
+    end: int
+    keyword: str
+    tag: Hashable
+
+
+class KeywordAutomaton:
+    """Multi-pattern substring matcher (Aho-Corasick).
+
+    Each keyword is registered with a tag; the same keyword may carry several
+    tags and several keywords may share a tag. Matching is case-insensitive by
+    default because every caller lowercases the user text anyway.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[Tuple[str, Hashable]] = (),
+        case_sensitive: bool = False,
+    ) -> None:
+        self.case_sensitive = case_sensitive
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._own: List[Tuple[Tuple[str, Hashable], ...]] = [()]
+        self._out: List[Tuple[Tuple[str, Hashable], ...]] = [()]
+        self._built = True
+        for keyword, tag in entries:
+            self.add(keyword, tag)
+        self.build()
+
+    def __len__(self) -> int:
+        return sum(len(own) for own in self._own)
+
+    def _fold(self, text: str) -> str:
+        return text if self.case_sensitive else text.lower()
+
+    def add(self, keyword: str, tag: Hashable) -> None:
+        """Register one keyword. Call `build()` (or scan) afterwards."""
+        keyword = self._fold(keyword or "")
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(())
+            node = nxt
+        if (keyword, tag) not in self._own[node]:
+            self._own[node] = self._own[node] + ((keyword, tag),)
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links (BFS) and merge suffix outputs."""
+        if self._built:
+            return
+        self._out = list(self._own)
+        queue: deque[int] = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+
+    def scan(self, text: str) -> List[KeywordHit]:
+        """Return all (possibly overlapping) keyword hits, ordered by end offset."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: List[KeywordHit] = []
+        node = 0
+        for i, ch in enumerate(self._fold(text or "")):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword, tag in out[node]:
+                hits.append(KeywordHit(i + 1 - len(keyword), i + 1, keyword, tag))
+        return hits
+
+    def tags(self, text: str) -> Set[Hashable]:
+        """Return only the set of tags that fired."""
+        return {hit.tag for hit in self.scan(text)}
+
+    def first(self, text: str) -> Optional[KeywordHit]:
+        """Return the leftmost hit (longest one when several start together)."""
+        best: Optional[KeywordHit] = None
+        for hit in self.scan(text):
+            if best is None or (hit.start, -len(hit.keyword)) < (best.start, -len(best.keyword)):
+                best = hit
+        return best
@@ -0,0 +1,402 @@
+"""
+Learned-command table: LLM resolutions that keep repeating become fastpath hits.
+
+"好暗喔" misses every keyword table, so it goes to Gemini every time, and
+Gemini answers "LIVING on" every time. LearnedCommandTable watches the
+validated command plans coming back from GeminiParser.parse /
+LLMEngine.generate_plan (fresh LLM calls only; response-cache replays of the
+same answer are not counted) and keeps, per normalized utterance:
+- the action template (SET_TEMP stored as a delta from the setpoint when the
+  observations are consistent with one, otherwise as an absolute value),
+- how many consecutive resolutions agreed with it, and under which states of
+  the touched devices ("LED:LIVING=off") they were seen,
+- how many times the user corrected it.
+
+After `promote_after` consistent resolutions the entry becomes active (or
+"proposed" when auto-promotion is off) and FastPathParser.analyze serves it
+with confidence count / (count + 1 + 2 * corrections). A correction cue
+("不對", "取消") or an opposite command on the same device shortly after a
+learned hit demotes the entry; repeated corrections drop it. The table is
+capped at `max_entries` and persisted with the same write-behind pattern as
+the response cache.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Allow direct execution: python src/core/parser/learned_commands.py
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import src.utils.config as config
+from src.core.actions_schema import ActionDict
+from src.llm.response_cache import normalize_cache_text
+from src.utils.file_io import atomic_write_text
+from src.utils.write_behind import WriteBehind
+
+STATUS_CANDIDATE = "candidate"
+STATUS_PROPOSED = "proposed"   # 次數夠了但關閉自動升級，等 approve()
+STATUS_ACTIVE = "active"
+
+CORRECTION_RE = re.compile(
+    r"不對|不是這個|不是啦|錯了|弄錯|搞錯|取消|復原|還原|不要開|不要關|"
+    r"\bwrong\b|\bundo\b|\bcancel\b|\bnot that\b|^no\b",
+    re.IGNORECASE,
+)
+
+
+def _device_key(action: ActionDict) -> Tuple[str, str]:
+    return str(action.get("type", "")), str(action.get("location", ""))
+
+
+@dataclass(slots=True)
+class LearnedEntry:
+    template: List[Dict[str, Any]]
+    count: int = 1
+    corrections: int = 0
+    status: str = STATUS_CANDIDATE
+    temp_mode: Optional[str] = None        # "delta" | "absolute" | None（還分不出來）
+    contexts: List[str] = field(default_factory=list)
+    last_seen: float = 0.0
+    hits: int = 0
+
+    @property
+    def confidence(self) -> float:
+        return self.count / (self.count + 1 + 2 * self.corrections)
+
+
+@dataclass(slots=True)
+class LearnedMatch:
+    actions: List[ActionDict]
+    confidence: float
+    key: str
+
+
+class LearnedCommandTable:
+    """Distills repeated LLM command resolutions into fastpath mappings."""
+
+    def __init__(
+        self,
+        path=config.LEARNED_COMMANDS_FILE,
+        promote_after: int = config.LEARNED_PROMOTE_AFTER,
+        auto_promote: bool = config.LEARNED_AUTO_PROMOTE,
+        max_entries: int = config.LEARNED_MAX_ENTRIES,
+        correction_window_sec: float = config.LEARNED_CORRECTION_WINDOW_SEC,
+        max_text_len: int = config.LEARNED_MAX_TEXT_LEN,
+        min_temp: float = config.MIN_TEMP,
+        max_temp: float = config.MAX_TEMP,
+        flush_delay: float = config.MEMORY_FLUSH_SEC,
+    ) -> None:
+        self.path = str(path)
+        self.promote_after = max(1, promote_after)
+        self.auto_promote = auto_promote
+        self.max_entries = max_entries
+        self.correction_window_sec = correction_window_sec
+        self.max_text_len = max_text_len
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+        self._entries: Dict[str, LearnedEntry] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # 最近一次由本表執行的指令：(key, actions, time)，用來判斷使用者是否在糾正
+        self._last_hit: Optional[Tuple[str, List[ActionDict], float]] = None
+        self._persister = WriteBehind(self._save, delay=flush_delay)
+
+    # ---------- persistence ----------
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, raw in data.get("entries", {}).items():
+                self._entries[key] = LearnedEntry(**raw)
+        except Exception as e:
+            print(f"讀取學習指令表失敗，改用空表: {e}")
+            self._entries.clear()
+
+    def _save(self) -> None:
+        with self._lock:
+            payload = {"entries": {k: asdict(e) for k, e in self._entries.items()}}
+        atomic_write_text(self.path, json.dumps(payload, ensure_ascii=False, indent=1))
+
+    def flush(self) -> None:
+        self._persister.flush()
+
+    # ---------- templates ----------
+    @staticmethod
+    def _context(actions: List[ActionDict], fan_state: Optional[str], led_states: Optional[Dict[str, str]]) -> str:
+        """被動到的設備在執行前的狀態，例如 "LED:LIVING=off"；SET_TEMP 不看狀態。"""
+        parts = []
+        leds = led_states or {}
+        for action in actions:
+            kind = action.get("type")
+            if kind == "LED":
+                loc = str(action.get("location", "")).upper()
+                parts.append(f"LED:{loc}={leds.get(loc, 'off')}")
+            elif kind == "FAN":
+                parts.append(f"FAN={fan_state or 'off'}")
+        return "|".join(sorted(parts))
+
+    @staticmethod
+    def _template(actions: List[ActionDict], current_temp: Optional[float]) -> List[Dict[str, Any]]:
+        out = []
+        for action in actions:
+            item = {k: v for k, v in action.items() if k in ("type", "location", "state", "value")}
+            if item.get("type") == "SET_TEMP" and current_temp is not None:
+                try:
+                    item["delta"] = float(item["value"]) - float(current_temp)
+                except (KeyError, TypeError, ValueError):
+                    pass
+            out.append(item)
+        return out
+
+    @staticmethod
+    def _agree(entry: LearnedEntry, template: List[Dict[str, Any]]) -> Optional[str]:
+        """新觀察和 entry 一致時回傳新的 temp_mode（可能仍是 None），不一致回傳 "conflict"。"""
+        if len(entry.template) != len(template):
+            return "conflict"
+        mode = entry.temp_mode
+        for old, new in zip(entry.template, template):
+            if {k: v for k, v in old.items() if k not in ("value", "delta")} != {
+                k: v for k, v in new.items() if k not in ("value", "delta")
+            }:
+                return "conflict"
+            if old.get("type") != "SET_TEMP":
+                continue
+            same_value = old.get("value") == new.get("value")
+            same_delta = "delta" in old and old.get("delta") == new.get("delta")
+            if mode == "absolute":
+                if not same_value:
+                    return "conflict"
+            elif mode == "delta":
+                if not same_delta:
+                    return "conflict"
+            elif same_delta and not same_value:
+                mode = "delta"
+            elif same_value and not same_delta:
+                mode = "absolute"
+            elif not (same_value or same_delta):
+                return "conflict"
+        return mode
+
+    def _key(self, text: str) -> Optional[str]:
+        key = normalize_cache_text(text)
+        if not key or len(key) > self.max_text_len:
+            return None
+        return key
+
+    # ---------- observation (LLM side) ----------
+    def observe(
+        self,
+        text: str,
+        actions: List[ActionDict],
+        intent: Optional[str] = "command",
+        current_temp: Optional[float] = None,
+        fan_state: Optional[str] = None,
+        led_states: Optional[Dict[str, str]] = None,
+    ) -> Optional[LearnedEntry]:
+        """記錄一次 LLM 的指令解析結果（text 應該是套用記憶規則後的文字）。"""
+        self.check_override(actions)
+        key = self._key(text)
+        if key is None or not actions or (intent or "command") != "command" or CORRECTION_RE.search(text):
+            return None
+        template = self._template(actions, current_temp)
+        context = self._context(actions, fan_state, led_states)
+        now = time.time()
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            mode = self._agree(entry, template) if entry is not None else "conflict"
+            if entry is None or mode == "conflict":
+                if entry is not None and entry.status == STATUS_ACTIVE:
+                    print(f"學習指令 '{key}' 的 LLM 結果改變了，先降回候選。")
+                entry = LearnedEntry(template=template, last_seen=now, contexts=[context])
+                self._entries[key] = entry
+            else:
+                entry.count += 1
+                entry.temp_mode = mode
+                entry.last_seen = now
+                if context not in entry.contexts:
+                    entry.contexts.append(context)
+                    del entry.contexts[:-8]
+                if entry.status == STATUS_CANDIDATE and entry.count >= self.promote_after:
+                    entry.status = STATUS_ACTIVE if self.auto_promote else STATUS_PROPOSED
+                    label = "升級為 fastpath 指令" if self.auto_promote else "建議加入 fastpath（待確認）"
+                    print(f"學習指令 '{key}' {label}：{entry.template}")
+            self._evict()
+        self._persister.mark_dirty()
+        return entry
+
+    def _evict(self) -> None:
+        over = len(self._entries) - self.max_entries
+        if over <= 0:
+            return
+        # 先丟候選、再丟信心度低且最久沒用的
+        rank = {STATUS_CANDIDATE: 0, STATUS_PROPOSED: 1, STATUS_ACTIVE: 2}
+        victims = sorted(
+            self._entries.items(),
+            key=lambda kv: (rank.get(kv[1].status, 0), kv[1].confidence, kv[1].last_seen),
+        )[:over]
+        for key, _ in victims:
+            del self._entries[key]
+
+    # ---------- lookup (fastpath side) ----------
+    def _render(self, entry: LearnedEntry, current_temp: Optional[float]) -> Optional[List[ActionDict]]:
+        actions: List[ActionDict] = []
+        for item in entry.template:
+            action = {k: v for k, v in item.items() if k != "delta"}
+            if item.get("type") == "SET_TEMP" and entry.temp_mode != "absolute" and "delta" in item:
+                if current_temp is None:
+                    return None
+                value = max(self.min_temp, min(self.max_temp, float(current_temp) + float(item["delta"])))
+                action["value"] = int(value + 0.5)
+            actions.append(action)
+        return actions
+
+    def lookup(
+        self,
+        text: str,
+        current_temp: Optional[float] = None,
+        fan_state: Optional[str] = None,
+        led_states: Optional[Dict[str, str]] = None,
+    ) -> Optional[LearnedMatch]:
+        """整句比對；沒給 led_states 時不檢查設備狀態。"""
+        key = self._key(text)
+        if key is None:
+            return None
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None or entry.status != STATUS_ACTIVE:
+                return None
+            actions = self._render(entry, current_temp)
+            if not actions:
+                return None
+            if led_states is not None and self._context(actions, fan_state, led_states) not in entry.contexts:
+                return None
+            return LearnedMatch(actions=actions, confidence=entry.confidence, key=key)
+
+    # ---------- feedback ----------
+    def mark_hit(self, key: str, actions: List[ActionDict]) -> None:
+        """fastpath 實際執行了學習指令。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.hits += 1
+                entry.last_seen = time.time()
+            self._last_hit = (key, [dict(a) for a in actions], time.monotonic())
+        self._persister.mark_dirty()
+
+    def _recent_hit(self) -> Optional[Tuple[str, List[ActionDict]]]:
+        if self._last_hit is None:
+            return None
+        key, actions, at = self._last_hit
+        if time.monotonic() - at > self.correction_window_sec:
+            self._last_hit = None
+            return None
+        return key, actions
+
+    def check_correction(self, text: str) -> bool:
+        """使用者在學習指令執行後馬上說「不對 / 取消」→ 降級。"""
+        recent = self._recent_hit()
+        if recent is None or not CORRECTION_RE.search(text or ""):
+            return False
+        return self.demote(recent[0])
+
+    def check_override(self, actions: Optional[List[ActionDict]]) -> bool:
+        """學習指令執行後馬上對同一個設備下了不同的指令 → 視為糾正。"""
+        recent = self._recent_hit()
+        if recent is None or not actions:
+            return False
+        key, hit_actions = recent
+        previous = {_device_key(a): a for a in hit_actions}
+        for action in actions:
+            old = previous.get(_device_key(action))
+            if old is not None and (old.get("state"), old.get("value")) != (action.get("state"), action.get("value")):
+                return self.demote(key)
+        return False
+
+    def demote(self, key: str) -> bool:
+        with self._lock:
+            self._last_hit = None
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.corrections += 1
+            entry.count = max(0, entry.count - self.promote_after)
+            if entry.corrections >= 3:
+                del self._entries[key]
+                print(f"學習指令 '{key}' 被糾正，已移除。")
+            elif entry.count < self.promote_after:
+                entry.status = STATUS_CANDIDATE
+                print(f"學習指令 '{key}' 被糾正，降回候選。")
+        self._persister.mark_dirty()
+        return True
+
+    # ---------- management ----------
+    def approve(self, text: str) -> bool:
+        """auto_promote 關閉時，手動把 proposed 的項目升級。"""
+        key = self._key(text)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key) if key else None
+            if entry is None or entry.status != STATUS_PROPOSED:
+                return False
+            entry.status = STATUS_ACTIVE
+        self._persister.mark_dirty()
+        return True
+
+    def entries(self, status: Optional[str] = None) -> Dict[str, LearnedEntry]:
+        with self._lock:
+            self._load()
+            return {k: e for k, e in self._entries.items() if status is None or e.status == status}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded = True
+            self._entries.clear()
+            self._last_hit = None
+        self._persister.mark_dirty()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+
+DEFAULT_LEARNED_COMMANDS = LearnedCommandTable()
+
+
+if __name__ == "__main__":
+    # 測試區域：用暫存檔模擬 LLM 連續三次把「好暗喔」解成開客廳燈。
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table = LearnedCommandTable(path=os.path.join(tmp, "learned.json"), flush_delay=0)
+        leds = {"KITCHEN": "off", "LIVING": "off", "GUEST": "off"}
+        for _ in range(3):
+            table.observe("好暗喔", [{"type": "LED", "location": "LIVING", "state": "on"}], led_states=leds)
+        print("好暗喔 ->", table.lookup("好暗喔！", led_states=leds))
+        print("好暗喔 (LIVING on) ->", table.lookup("好暗喔", led_states=dict(leds, LIVING="on")))
+
+        for sp in (25, 27, 24):
+            table.observe("有點悶", [{"type": "SET_TEMP", "value": sp - 1}], current_temp=sp)
+        print("有點悶 @28 ->", table.lookup("有點悶", current_temp=28))
+
+        match = table.lookup("好暗喔", led_states=leds)
+        table.mark_hit(match.key, match.actions)
+        table.check_correction("不對，我是說廚房")
+        print("after correction ->", table.lookup("好暗喔", led_states=leds), table.entries())
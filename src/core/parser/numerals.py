@@ -0,0 +1,176 @@
+"""
+Numeral scanner for Arabic, Chinese and English numbers.
+
+faster-whisper transcribes the same setpoint as "26度", "二十六度", "二六度",
+"二十五點五度" or "twenty six degrees". All of these are recognised by one
+compiled regex; each hit is converted to a float and reported together with
+its unit suffix, so callers can tell "二十六度" (a temperature) from the "一" in
+"一點" (a bit).
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+ZH_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+ZH_UNITS = {"十": 10, "百": 100}
+
+EN_UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+EN_TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+
+_ZH_DIGIT_CLASS = "零〇一二兩三四五六七八九"
+_EN_WORD = "(?:" + "|".join(sorted(list(EN_UNITS) + list(EN_TENS) + ["hundred"], key=len, reverse=True)) + ")"
+
+ARABIC_PATTERN = r"-?\d+(?:\.\d+)?"
+ZH_PATTERN = rf"[{_ZH_DIGIT_CLASS}十百]+(?:點[{_ZH_DIGIT_CLASS}]+)?|半(?=\s*度)"
+EN_PATTERN = (
+    rf"\b{_EN_WORD}(?:[\s-]+{_EN_WORD})*"
+    rf"(?:\s+point(?:\s+{_EN_WORD})+)?"
+    rf"(?:\s+and\s+a\s+half)?\b"
+)
+UNIT_PATTERN = r"度半|度|°c?|℃|degrees?(?:\s+and\s+a\s+half)?|c\b"
+
+NUMERAL_RE = re.compile(
+    rf"(?:(?P<ar>{ARABIC_PATTERN})|(?P<zh>{ZH_PATTERN})|(?P<en>{EN_PATTERN}))\s*(?P<unit>{UNIT_PATTERN})?",
+    re.IGNORECASE,
+)
+
+# 非阿拉伯數字要有溫度線索：後面接「度」或前面是「調到/設成/to」之類
+TARGET_PREFIX_RE = re.compile(r"(?:到|成|為|至|設定|設在|\bto|\bat)\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True, slots=True)
+class NumberToken:
+    """One number found in text: text[start:end] == raw (unit included)."""
+
+    start: int
+    end: int
+    value: float
+    kind: str           # "arabic" | "zh" | "en"
+    unit: Optional[str]
+    raw: str
+
+
+def _zh_integer(s: str) -> Optional[int]:
+    if not s:
+        return None
+    if not any(ch in ZH_UNITS for ch in s):
+        # 「二六」「二五」：逐位念的數字
+        try:
+            return int("".join(str(ZH_DIGITS[ch]) for ch in s))
+        except KeyError:
+            return None
+    total, num = 0, 0
+    for ch in s:
+        if ch in ZH_DIGITS:
+            num = ZH_DIGITS[ch]
+        elif ch in ZH_UNITS:
+            total += (num or 1) * ZH_UNITS[ch]
+            num = 0
+        else:
+            return None
+    return total + num
+
+
+def parse_zh_number(s: str) -> Optional[float]:
+    """「二十六」→26、「二六」→26、「二十五點五」→25.5、「兩」→2、「半」→0.5。"""
+    s = (s or "").strip()
+    if s == "半":
+        return 0.5
+    whole, _, frac = s.partition("點")
+    value = _zh_integer(whole)
+    if value is None:
+        return None
+    if frac:
+        try:
+            return float(f"{value}.{''.join(str(ZH_DIGITS[ch]) for ch in frac)}")
+        except KeyError:
+            return None
+    return float(value)
+
+
+def _en_integer(words: List[str]) -> Optional[int]:
+    if not words:
+        return None
+    if len(words) > 1 and all(w in EN_UNITS and EN_UNITS[w] < 10 for w in words):
+        # "two six" → 26
+        return int("".join(str(EN_UNITS[w]) for w in words))
+    total, current = 0, 0
+    for w in words:
+        if w in EN_UNITS:
+            current += EN_UNITS[w]
+        elif w in EN_TENS:
+            current += EN_TENS[w]
+        elif w == "hundred":
+            current = (current or 1) * 100
+        else:
+            return None
+    return total + current
+
+
+def parse_en_number(s: str) -> Optional[float]:
+    """"twenty six" → 26, "twenty five point five" → 25.5, "twenty and a half" → 20.5。"""
+    text = re.sub(r"[\s-]+", " ", (s or "").strip().lower())
+    half = 0.0
+    if text.endswith("and a half"):
+        half = 0.5
+        text = text[: -len("and a half")].strip()
+    whole, _, frac = text.partition(" point ")
+    value = _en_integer(whole.split())
+    if value is None:
+        return None
+    if frac:
+        digits = [EN_UNITS.get(w) for w in frac.split()]
+        if any(d is None or d > 9 for d in digits):
+            return None
+        return float(f"{value}.{''.join(str(d) for d in digits)}")
+    return value + half
+
+
+def scan_numbers(text: str) -> List[NumberToken]:
+    """Left-to-right scan of every number in text."""
+    out: List[NumberToken] = []
+    for m in NUMERAL_RE.finditer(text or ""):
+        unit = m.group("unit")
+        if m.group("ar") is not None:
+            kind, value = "arabic", float(m.group("ar"))
+        elif m.group("zh") is not None:
+            kind, value = "zh", parse_zh_number(m.group("zh"))
+        else:
+            kind, value = "en", parse_en_number(m.group("en"))
+        if value is None:
+            continue
+        if unit:
+            lowered = unit.lower()
+            if lowered == "度半" or lowered.endswith("and a half"):
+                value += 0.5
+        out.append(NumberToken(m.start(), m.end(), value, kind, unit, m.group(0)))
+    return out
+
+
+def has_temperature_cue(text: str, token: NumberToken) -> bool:
+    """數字後面有溫度單位，或前面是「調到 / 設成 / to」這類目標詞。"""
+    if token.unit:
+        return True
+    return TARGET_PREFIX_RE.search(text[max(0, token.start - 4):token.start]) is not None
+
+
+if __name__ == "__main__":
+    # 測試區域：常見的 whisper 轉寫結果。
+    for sample in [
+        "把溫度調到 26 度",
+        "溫度調到二十六度",
+        "二六度",
+        "冷氣設定二十五點五度",
+        "二十五度半",
+        "set it to twenty six degrees",
+        "twenty five point five degrees",
+        "調高一點",
+        "降兩度",
+    ]:
+        print(f"{sample!r}: {[(t.value, t.kind, t.unit) for t in scan_numbers(sample)]}")
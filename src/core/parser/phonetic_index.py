@@ -0,0 +1,342 @@
+"""
+Phonetic / typo-tolerant lookup for the fastpath vocabulary.
+
+ASR homophone errors ("除防登" for 廚房燈, "克聽" for 客廳, "封扇" for 風扇)
+used to need Gemini's typo correction. Here every multi-character vocabulary
+word is keyed by its toneless pinyin ("chu fang"), and windows of the user text
+are looked up by the same key:
+- same pinyin (homophone)                 -> confidence 1.0
+- small edit distance on the joined pinyin -> confidence 1 - dist / len
+  (catches 前後鼻音 mix-ups such as ting/tin, feng/fen)
+English words get the same treatment on their spelling ("kichen" -> kitchen),
+except tokens that are ordinary English words ("guess" is not a typo of guest):
+those are only reported as rejected candidates. Common Chinese words that sit
+close to the vocabulary (大概 ~ 打開) are skipped the same way.
+
+The pinyin table is embedded and limited to syllables close to the vocabulary;
+windows containing other characters are simply not candidates. The C
+`python-Levenshtein` package is used when installed, with a pure-Python bounded
+fallback otherwise.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from Levenshtein import distance as _c_levenshtein  # python-Levenshtein (optional)
+except ImportError:
+    _c_levenshtein = None
+
+# Toneless pinyin -> Traditional characters. Polyphonic characters whose
+# reading is ambiguous in commands (調 diao/tiao, 著 zhe/zhu) are left out.
+PINYIN_TABLE: Dict[str, str] = {
+    "chu": "出初除處廚楚觸儲礎畜鋤雛齣",
+    "cu": "粗醋促簇猝",
+    "zhu": "主住注豬竹朱珠助柱祝築逐",
+    "fang": "方房放防訪芳仿妨坊紡肪",
+    "fan": "反飯番翻凡煩範販犯帆泛繁返",
+    "huang": "黃皇慌荒晃謊煌簧",
+    "ke": "可客課科克刻渴殼顆柯咳苛棵磕",
+    "ge": "個歌哥格割隔閣鴿革葛",
+    "ting": "聽停挺廳庭亭婷廷艇霆蜓",
+    "tian": "天田甜填添恬",
+    "ding": "定頂丁訂釘鼎盯叮",
+    "feng": "風封峰豐瘋鋒蜂縫逢鳳奉楓諷",
+    "fen": "分份粉紛芬墳奮憤焚糞",
+    "shan": "山扇善閃衫杉珊刪擅膳陝汕",
+    "shang": "上商傷賞尚裳晌",
+    "san": "三散傘",
+    "deng": "燈等登鄧瞪凳蹬噔",
+    "teng": "疼騰藤謄",
+    "dong": "東冬動洞懂凍棟董",
+    "quan": "全權泉勸圈拳犬券痊詮",
+    "juan": "卷捐絹倦娟",
+    "bu": "不部布步補捕簿埠哺",
+    "pu": "普鋪撲譜葡樸浦",
+    "da": "大打達答搭",
+    "ta": "他她它塔踏塌",
+    "kai": "開凱慨楷鎧",
+    "gai": "該改蓋概鈣丐",
+    "guan": "關管官觀館冠慣貫灌罐",
+    "kuan": "寬款",
+    "gan": "乾感趕敢甘肝竿幹桿",
+    "diao": "掉吊釣雕刁",
+    "tiao": "條跳挑眺",
+    "bi": "閉比筆必畢幣鼻避壁臂逼碧彼",
+    "pi": "皮批匹啤疲脾劈",
+    "qi": "氣起期其七汽騎奇棋旗齊啟器企妻",
+    "ji": "機幾及急級吉極即集記計技季紀",
+    "xi": "西洗系喜戲細吸希息溪",
+}
+
+# 常見英文字：本身就是正確拼字，不當成詞彙的拼錯（guess≠guest、just≠guest、alright≠light）。
+# 以跟詞彙編輯距離 ≤ 2 的字為主，另加上指令裡常出現的功能字。
+COMMON_ENGLISH_WORDS = frozenset(
+    """
+    about actually again alight alright also best bright camp chicken chose clamp clone closet
+    clothes could damp diving eight even evening fight flight gets ghost giving guess gust
+    have having height here just kitten lamb lame land last leaving life like liking limp lime
+    line lining list lost loose loving lump lying make maybe might more most moving much must
+    need night often okay only oven over please post quest ramp really rest right room
+    saving should sight slight some still switch test than thank thanks that them then there
+    their they think this those tight turn upon very want west what when where which whose will
+    with would weight
+    """.split()
+)
+
+# 常見中文詞：拼音跟詞彙很近但本身是正確用詞（大概≠打開、住房≠廚房），整個詞不拿來比對。
+COMMON_CHINESE_WORDS = frozenset(
+    """
+    大概 大開 大方 住房 分房 開放 出動 處分 觸動 散步 客氣 機器 封山
+    """.split()
+)
+
+CHAR_TO_PINYIN: Dict[str, str] = {ch: py for py, chars in PINYIN_TABLE.items() for ch in chars}
+
+_CJK_RE = re.compile(r"[一-鿿]")
+_ASCII_WORD_RE = re.compile(r"[a-z]+", re.IGNORECASE)
+
+
+def bounded_edit_distance(a: str, b: str, max_dist: int) -> int:
+    """Levenshtein distance, or max_dist + 1 as soon as it is known to exceed max_dist."""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if _c_levenshtein is not None:
+        return min(_c_levenshtein(a, b), max_dist + 1)
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            row_min = min(row_min, cur[j])
+        if row_min > max_dist:
+            return max_dist + 1
+        prev = cur
+    return prev[-1]
+
+
+def to_pinyin(text: str) -> Optional[Tuple[str, ...]]:
+    """Toneless pinyin per character; None if any character is not in the table."""
+    out = []
+    for ch in text:
+        py = CHAR_TO_PINYIN.get(ch)
+        if py is None:
+            return None
+        out.append(py)
+    return tuple(out)
+
+
+@dataclass(slots=True)
+class Correction:
+    start: int
+    end: int
+    heard: str
+    word: str
+    confidence: float
+
+
+@dataclass(slots=True)
+class PhoneticMatch:
+    """Result of PhoneticIndex.correct()."""
+
+    text: str
+    corrections: List[Correction] = field(default_factory=list)
+    rejected: List[Correction] = field(default_factory=list)
+
+    @property
+    def confidence(self) -> float:
+        """Lowest confidence among applied corrections (1.0 when nothing was changed)."""
+        return min((c.confidence for c in self.corrections), default=1.0)
+
+    @property
+    def best_rejected(self) -> float:
+        return max((c.confidence for c in self.rejected), default=0.0)
+
+
+class PhoneticIndex:
+    """Toneless-pinyin + bounded edit-distance index over the fastpath vocabulary."""
+
+    def __init__(
+        self,
+        words: Iterable[str],
+        min_confidence: float = 0.75,
+        max_distance: int = 2,
+        anchored_words: Iterable[str] = (),
+        known_english: Iterable[str] = COMMON_ENGLISH_WORDS,
+        known_chinese: Iterable[str] = COMMON_CHINESE_WORDS,
+    ) -> None:
+        self.min_confidence = min_confidence
+        self.max_distance = max_distance
+        self.words: List[str] = []
+        self.by_key: Dict[Tuple[str, ...], str] = {}
+        # (length, position, syllable) -> words；模糊比對前先要求至少一個音節位置相同
+        self.by_syllable: Dict[Tuple[int, int, str], List[Tuple[str, str]]] = {}
+        self.english: List[str] = []
+        self.known_english: Set[str] = {w.lower() for w in known_english}
+        self.known_chinese: List[str] = [w for w in known_chinese if w]
+        # 單字詞（燈/開/關）太容易誤判，只在緊鄰一個已確認的多字詞時才做同音替換
+        self.anchored: Dict[str, str] = {}
+        for w in words:
+            self.add(w)
+        for w in anchored_words:
+            py = to_pinyin(w)
+            if py is not None and len(py) == 1:
+                self.anchored[py[0]] = w
+
+    def add(self, word: str) -> None:
+        if not word or word in self.words:
+            return
+        if word.isascii():
+            if len(word) >= 4 and " " not in word:
+                self.english.append(word.lower())
+                self.words.append(word)
+            return
+        key = to_pinyin(word)
+        if key is None or len(key) < 2:
+            return
+        self.words.append(word)
+        self.by_key.setdefault(key, word)
+        joined = "".join(key)
+        for pos, syl in enumerate(key):
+            self.by_syllable.setdefault((len(key), pos, syl), []).append((word, joined))
+
+    @property
+    def lengths(self) -> List[int]:
+        return sorted({len(k) for k in self.by_key}, reverse=True)
+
+    # ---------- lookup ----------
+    def _lookup(self, window: str) -> Optional[Correction]:
+        key = to_pinyin(window)
+        if key is None:
+            return None
+        word = self.by_key.get(key)
+        if word is not None:
+            return Correction(0, 0, window, word, 1.0)
+        joined = "".join(key)
+        best: Optional[Correction] = None
+        seen: Set[str] = set()
+        for pos, syl in enumerate(key):
+            for cand, cand_joined in self.by_syllable.get((len(key), pos, syl), ()):
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                dist = bounded_edit_distance(joined, cand_joined, self.max_distance)
+                if dist > self.max_distance:
+                    continue
+                conf = 1.0 - dist / max(len(joined), len(cand_joined))
+                if best is None or conf > best.confidence:
+                    best = Correction(0, 0, window, cand, conf)
+        return best
+
+    def _lookup_english(self, token: str) -> Optional[Correction]:
+        lowered = token.lower()
+        if len(lowered) < 4 or lowered in self.english:
+            return None
+        best: Optional[Correction] = None
+        for word in self.english:
+            dist = bounded_edit_distance(lowered, word, self.max_distance)
+            if dist > self.max_distance:
+                continue
+            conf = 1.0 - dist / max(len(lowered), len(word))
+            if best is None or conf > best.confidence:
+                best = Correction(0, 0, token, word, conf)
+        return best
+
+    def correct(self, text: str) -> PhoneticMatch:
+        """Replace near-miss vocabulary tokens; low-confidence candidates go to `rejected`."""
+        text = text or ""
+        match = PhoneticMatch(text=text)
+        if not text:
+            return match
+        n = len(text)
+        covered = [False] * n
+        # 詞彙本身與常見詞都不當成候選（常見詞也不算 anchor）
+        for w in self.known_chinese:
+            start = text.find(w)
+            while start != -1:
+                for i in range(start, start + len(w)):
+                    covered[i] = True
+                start = text.find(w, start + 1)
+        for w in self.words:
+            if w.isascii():
+                continue
+            start = text.find(w)
+            while start != -1:
+                for i in range(start, start + len(w)):
+                    covered[i] = True
+                start = text.find(w, start + 1)
+
+        found: List[Correction] = []
+        if _CJK_RE.search(text):
+            for length in self.lengths:
+                for i in range(n - length + 1):
+                    if any(covered[i:i + length]):
+                        continue
+                    cand = self._lookup(text[i:i + length])
+                    if cand is None:
+                        continue
+                    cand.start, cand.end = i, i + length
+                    if cand.confidence >= self.min_confidence:
+                        for k in range(i, i + length):
+                            covered[k] = True
+                        found.append(cand)
+                    else:
+                        match.rejected.append(cand)
+
+            # 單字詞：緊鄰已確認的多字詞（例如「廚房」後面的「登」）
+            anchors = {c.end for c in found} | {c.start for c in found}
+            for w in self.words:
+                if w.isascii():
+                    continue
+                start = text.find(w)
+                while start != -1:
+                    anchors.update((start, start + len(w)))
+                    start = text.find(w, start + 1)
+            for i, ch in enumerate(text):
+                if covered[i] or not (i in anchors or i + 1 in anchors):
+                    continue
+                word = self.anchored.get(CHAR_TO_PINYIN.get(ch, ""))
+                if word is not None and word != ch:
+                    covered[i] = True
+                    found.append(Correction(i, i + 1, ch, word, 1.0))
+
+        for m in _ASCII_WORD_RE.finditer(text):
+            cand = self._lookup_english(m.group())
+            if cand is None:
+                continue
+            cand.start, cand.end = m.start(), m.end()
+            # 一般英文字不自動改；只留在 rejected，由呼叫端看它是不是落在地點/裝置的位置
+            if cand.confidence >= self.min_confidence and m.group().lower() not in self.known_english:
+                found.append(cand)
+            else:
+                match.rejected.append(cand)
+
+        if found:
+            found.sort(key=lambda c: c.start)
+            parts, last = [], 0
+            for c in found:
+                parts.append(text[last:c.start])
+                parts.append(c.word)
+                last = c.end
+            parts.append(text[last:])
+            match.text = "".join(parts)
+            match.corrections = found
+        return match
+
+
+if __name__ == "__main__":
+    # 測試區域：常見的 ASR 同音 / 近音錯字。
+    import time
+
+    index = PhoneticIndex(
+        ["廚房", "客廳", "客房", "風扇", "全部", "打開", "開啟", "關掉", "關閉", "kitchen", "living", "guest", "light", "lamp"],
+        anchored_words=["燈", "開", "關"],
+    )
+    for sample in ["幫我開除防登", "克聽的燈幫我關掉", "打開封扇", "開客停燈", "分扇關掉", "turn on the kichen light", "I guess turn on the light", "大概風扇沒電了", "今天天氣很好"]:
+        start = time.perf_counter()
+        out = index.correct(sample)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"{sample!r} -> {out.text!r} conf={out.confidence:.2f} rejected={out.best_rejected:.2f} [{ms:.3f} ms]")
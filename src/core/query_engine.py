@@ -0,0 +1,323 @@
+# src/core/query_engine.py
+"""
+Local answers for device-status questions.
+
+"客廳燈有開嗎" / "現在幾度" / "what is on?" only need what StateManager
+already holds, so they are answered here with zh-TW / English templates
+instead of a Gemini round trip. Anything that is not a plain status question
+(open questions such as "為什麼…", polite commands such as "可以幫我開燈嗎")
+returns None and keeps going to the LLM.
+
+Topics are detected with the same Aho-Corasick KeywordAutomaton the fastpath
+uses, so one pass over the text is enough.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Allow direct execution: python src/core/query_engine.py
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import src.utils.config as config
+from src.core.parser.keyword_index import KeywordAutomaton
+
+# -------------------------
+# Topics / tags
+# -------------------------
+TOPIC_SETPOINT = "setpoint"
+TOPIC_AMBIENT = "ambient"
+TOPIC_TEMP = "temp"          # 「溫度」「幾度」：沒講是冷氣還是室溫，兩個都回答
+TOPIC_HUMIDITY = "humidity"
+TOPIC_FAN = "fan"
+TOPIC_LIGHT = "light"
+TOPIC_ON_LIST = "on_list"    # 「哪些開著」「what is on」
+TOPIC_OVERVIEW = "overview"  # 「狀態」「status」
+
+TAG_CUE = "cue"        # 疑問語氣
+TAG_BLOCK = "block"    # 開放式問題 / 禮貌型指令 → 交給 LLM
+TAG_LOC = "loc"
+TAG_WEAK_ON_LIST = "weak_on_list"  # 「有什麼」「which」：要搭配設備名詞才算
+TAG_WEAK_AMBIENT = "weak_ambient"  # 「多熱」「how hot」：要搭配室內名詞才算
+TAG_DEVICE_NOUN = "device_noun"
+TAG_ROOM_NOUN = "room_noun"
+
+KW_SETPOINT = ("冷氣", "空調", "設定溫度", "設定幾度", "setpoint", "thermostat", "aircon", "air conditioner", "a/c")
+KW_AMBIENT = ("室溫", "室內溫度", "室內幾度", "現在幾度", "氣溫", "room temperature")
+KW_WEAK_AMBIENT = ("多熱", "多冷", "how hot", "how warm", "how cold")
+KW_TEMP = ("溫度", "幾度", "temperature", "temp")
+KW_HUMIDITY = ("濕度", "潮濕", "humidity", "humid")
+KW_FAN = ("風扇", "fan")
+KW_LIGHT = ("燈", "light", "lamp")
+KW_ON_LIST = ("什麼開著", "什麼設備", "what is on", "what's on", "whats on", "anything on")
+KW_WEAK_ON_LIST = ("哪些", "哪幾", "有什麼", "which")
+KW_DEVICE_NOUN = ("設備", "裝置", "電器", "開著", "開的", "device", "appliance", "turned on", "switched on", "is on", "are on")
+KW_ROOM_NOUN = ("室內", "屋內", "房間", "家裡", "裡面", "這裡", "room", "inside", "indoors", "in here", "at home")
+KW_OVERVIEW = ("狀態", "狀況", "status")
+
+KW_QUESTION_CUE = (
+    "嗎", "呢", "?", "？", "多少", "幾", "有沒有", "是不是", "了沒", "有開", "有關", "狀態", "狀況",
+    "what", "which", "how", "status", "is the", "are the", "is it", "are any", "anything",
+)
+KW_BLOCK = (
+    "為什麼", "為何", "怎麼", "如何", "建議", "應該", "要不要", "會不會", "天氣", "外面", "室外", "明天",
+    "幫我", "幫忙", "請", "可以", "能不能", "能否", "麻煩", "把", "調", "設成", "設為", "設定成", "改成",
+    "打開", "開啟", "關掉", "關閉",
+    "why", "should", "recommend", "weather", "outside", "tomorrow", "please", "can you", "could you", "would you", "set ", "turn ", "switch ",
+)
+# 「開風扇好嗎」「關全部燈」「冷氣開26度」：開/關 後面直接接設備或溫度是指令，不是狀態查詢
+# （「有開冷氣嗎」「沒關燈嗎」的 開/關 前面有 有/沒，仍算查詢）
+ZH_IMPERATIVE_RE = re.compile(
+    r"(?<![有沒])[開關]\s*(?:一下)?\s*(?:全部|所有|客廳|廚房|客房)?\s*的?\s*(?:燈|風扇|電扇|冷氣|空調)"
+    r"|[開關]\s*[0-9０-９一二兩三四五六七八九十]+(?:\.[0-9]+)?\s*度"
+)
+
+LOC_NAMES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    config.LOC_LIVING: {"zh": ("客廳",), "en": ("living room", "living")},
+    config.LOC_KITCHEN: {"zh": ("廚房",), "en": ("kitchen",)},
+    config.LOC_GUEST: {"zh": ("客房",), "en": ("guest room", "guest")},
+}
+
+
+@dataclass(slots=True)
+class QueryAnswer:
+    """Templated answer for one status question."""
+
+    reply: str
+    topics: Tuple[str, ...]
+    lang: str = "zh"
+
+
+def _fmt_num(value: Any) -> str:
+    try:
+        num = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return str(int(num)) if num.is_integer() else f"{num:.1f}"
+
+
+def _is_english(text: str) -> bool:
+    return not any("一" <= ch <= "鿿" for ch in text)
+
+
+class LocalQueryEngine:
+    """Answer setpoint / ambient / humidity / fan / light status questions from state."""
+
+    def __init__(self, loc_names: Optional[Dict[str, Dict[str, Tuple[str, ...]]]] = None) -> None:
+        self.loc_names = loc_names or LOC_NAMES
+        entries: List[Tuple[str, Any]] = []
+        for tag, words in (
+            (TOPIC_SETPOINT, KW_SETPOINT),
+            (TOPIC_AMBIENT, KW_AMBIENT),
+            (TOPIC_TEMP, KW_TEMP),
+            (TOPIC_HUMIDITY, KW_HUMIDITY),
+            (TOPIC_FAN, KW_FAN),
+            (TOPIC_LIGHT, KW_LIGHT),
+            (TOPIC_ON_LIST, KW_ON_LIST),
+            (TOPIC_OVERVIEW, KW_OVERVIEW),
+            (TAG_CUE, KW_QUESTION_CUE),
+            (TAG_BLOCK, KW_BLOCK),
+            (TAG_WEAK_ON_LIST, KW_WEAK_ON_LIST),
+            (TAG_WEAK_AMBIENT, KW_WEAK_AMBIENT),
+            (TAG_DEVICE_NOUN, KW_DEVICE_NOUN),
+            (TAG_ROOM_NOUN, KW_ROOM_NOUN),
+        ):
+            entries.extend((w, tag) for w in words)
+        for loc, names in self.loc_names.items():
+            for lang_names in names.values():
+                entries.extend((w, (TAG_LOC, loc)) for w in lang_names)
+        self.index = KeywordAutomaton(entries)
+
+    # ---------- classification ----------
+    def classify(self, text: str) -> Optional[Tuple[Tuple[str, ...], List[str]]]:
+        """回傳 (topics, locations)；不是狀態查詢時回傳 None。"""
+        text = text or ""
+        tags = self.index.tags(text)
+        if TAG_CUE not in tags or TAG_BLOCK in tags or ZH_IMPERATIVE_RE.search(text):
+            return None
+        locations = [loc for loc in self.loc_names if (TAG_LOC, loc) in tags]
+        if locations:
+            tags.add(TOPIC_LIGHT)
+        # 泛用疑問詞本身不代表設備查詢（「今天有什麼新聞」「how hot is the sun」）
+        if TAG_WEAK_ON_LIST in tags and TAG_DEVICE_NOUN in tags:
+            tags.add(TOPIC_ON_LIST)
+        if TAG_WEAK_AMBIENT in tags and TAG_ROOM_NOUN in tags:
+            tags.add(TOPIC_AMBIENT)
+
+        topics: List[str] = []
+        if TOPIC_SETPOINT in tags:
+            topics.append(TOPIC_SETPOINT)
+        elif TOPIC_AMBIENT in tags:
+            topics.append(TOPIC_AMBIENT)
+        elif TOPIC_TEMP in tags:
+            topics.append(TOPIC_TEMP)
+        for topic in (TOPIC_HUMIDITY, TOPIC_FAN, TOPIC_LIGHT):
+            if topic in tags:
+                topics.append(topic)
+        if not topics:
+            if TOPIC_ON_LIST in tags:
+                topics.append(TOPIC_ON_LIST)
+            elif TOPIC_OVERVIEW in tags:
+                topics.append(TOPIC_OVERVIEW)
+        if not topics:
+            return None
+        return tuple(topics), locations
+
+    # ---------- state access ----------
+    @staticmethod
+    def _read(state: Any, key: str, default: Any = None) -> Any:
+        if isinstance(state, dict):
+            return state.get(key, default)
+        return getattr(state, key, default)
+
+    def _loc_label(self, loc: str, lang: str) -> str:
+        names = self.loc_names.get(loc, {}).get(lang) or (loc.lower(),)
+        return names[0]
+
+    # ---------- templates ----------
+    def _setpoint(self, state: Any, lang: str) -> str:
+        sp = self._read(state, "setpoint_temp")
+        if lang == "en":
+            return f"The air conditioner is set to {_fmt_num(sp)}°C."
+        return f"冷氣目前設定 {_fmt_num(sp)} 度。"
+
+    def _ambient(self, state: Any, lang: str) -> str:
+        t = self._read(state, "ambient_temp")
+        if t is None:
+            return "I don't have a room temperature reading yet." if lang == "en" else "目前還沒有室溫感測資料。"
+        if lang == "en":
+            return f"It's {_fmt_num(t)}°C in the room."
+        return f"目前室內溫度 {_fmt_num(t)} 度。"
+
+    def _humidity(self, state: Any, lang: str) -> str:
+        h = self._read(state, "ambient_humidity")
+        if h is None:
+            return "I don't have a humidity reading yet." if lang == "en" else "目前還沒有濕度資料。"
+        if lang == "en":
+            return f"Humidity is {_fmt_num(h)}%."
+        return f"目前室內濕度 {_fmt_num(h)}%。"
+
+    def _fan(self, state: Any, lang: str) -> str:
+        on = str(self._read(state, "fan_state", "off")).lower() == "on"
+        if lang == "en":
+            return f"The fan is {'on' if on else 'off'}."
+        return f"風扇目前{'開著' if on else '關著'}。"
+
+    def _lights(self, state: Any, locations: List[str], lang: str) -> str:
+        leds = self._read(state, "led_states") or {}
+        locs = locations or list(self.loc_names)
+        parts = []
+        for loc in locs:
+            on = str(leds.get(loc, "off")).lower() == "on"
+            label = self._loc_label(loc, lang)
+            if lang == "en":
+                parts.append(f"the {label} light is {'on' if on else 'off'}")
+            else:
+                parts.append(f"{label}燈{'開著' if on else '關著'}")
+        if lang == "en":
+            text = ", ".join(parts)
+            return text[0].upper() + text[1:] + "."
+        return "，".join(parts) + "。"
+
+    def _on_list(self, state: Any, lang: str) -> str:
+        leds = self._read(state, "led_states") or {}
+        on_items = [
+            (f"the {self._loc_label(loc, lang)} light" if lang == "en" else f"{self._loc_label(loc, lang)}燈")
+            for loc in self.loc_names
+            if str(leds.get(loc, "off")).lower() == "on"
+        ]
+        if str(self._read(state, "fan_state", "off")).lower() == "on":
+            on_items.append("the fan" if lang == "en" else "風扇")
+        if lang == "en":
+            return f"Currently on: {', '.join(on_items)}." if on_items else "Everything is off right now."
+        return f"目前開著的有：{'、'.join(on_items)}。" if on_items else "目前所有設備都關著。"
+
+    def render(self, topics: Tuple[str, ...], locations: List[str], state: Any, lang: str = "zh") -> str:
+        parts: List[str] = []
+        for topic in topics:
+            if topic == TOPIC_SETPOINT:
+                parts.append(self._setpoint(state, lang))
+            elif topic == TOPIC_AMBIENT:
+                parts.append(self._ambient(state, lang))
+            elif topic == TOPIC_TEMP:
+                if self._read(state, "ambient_temp") is not None:
+                    parts.append(self._ambient(state, lang))
+                parts.append(self._setpoint(state, lang))
+            elif topic == TOPIC_HUMIDITY:
+                parts.append(self._humidity(state, lang))
+            elif topic == TOPIC_FAN:
+                parts.append(self._fan(state, lang))
+            elif topic == TOPIC_LIGHT:
+                parts.append(self._lights(state, locations, lang))
+            elif topic == TOPIC_ON_LIST:
+                parts.append(self._on_list(state, lang))
+            elif topic == TOPIC_OVERVIEW:
+                parts.append(self._on_list(state, lang))
+                parts.append(self._setpoint(state, lang))
+                if self._read(state, "ambient_temp") is not None:
+                    parts.append(self._ambient(state, lang))
+        return (" " if lang == "en" else "").join(parts)
+
+    def answer(self, text: str, state: Any) -> Optional[QueryAnswer]:
+        """state 可以是 StateManager 或 get_state() 的 dict；無法本地回答時回傳 None。"""
+        found = self.classify(text)
+        if found is None:
+            return None
+        topics, locations = found
+        lang = "en" if _is_english(text) else "zh"
+        return QueryAnswer(reply=self.render(topics, locations, state, lang), topics=topics, lang=lang)
+
+
+DEFAULT_QUERY_ENGINE = LocalQueryEngine()
+
+
+if __name__ == "__main__":
+    # 測試區域：用假的狀態快照檢查模板回覆與 LLM fallback。
+    import time
+
+    fake_state = {
+        "setpoint_temp": 25,
+        "ambient_temp": 27.5,
+        "ambient_humidity": 62,
+        "fan_state": "on",
+        "led_states": {"KITCHEN": "off", "LIVING": "on", "GUEST": "off"},
+    }
+    tests = [
+        "客廳燈有開嗎",
+        "現在幾度",
+        "冷氣設定幾度？",
+        "濕度多少",
+        "風扇有開嗎",
+        "哪些設備開著？",
+        "目前狀態",
+        "is the kitchen light on?",
+        "what's on?",
+        "可以幫我開燈嗎",
+        "為什麼風扇會開著？",
+        # 以下都應該是 None（指令或跟設備無關的問題）
+        "打開風扇好嗎",
+        "關掉全部燈好嗎",
+        "冷氣開26度好嗎",
+        "開風扇好嗎",
+        "今天有什麼新聞嗎",
+        "which is better, tea or coffee?",
+        "how hot is the sun?",
+        # 泛用疑問詞搭配設備 / 室內名詞仍是查詢
+        "有什麼設備開著？",
+        "which devices are on?",
+        "how hot is it in the room?",
+        "有開冷氣嗎",
+        "風扇開了沒",
+        "客廳燈關了沒有",
+    ]
+    engine = LocalQueryEngine()
+    for t in tests:
+        start = time.perf_counter()
+        out = engine.answer(t, fake_state)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"{t!r:28} -> {out.reply if out else 'None (LLM)'}  [{ms:.3f} ms]")
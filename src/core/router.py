@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import StrEnum
+from typing import Any
+
+import src.utils.config as config
 
 
 SYSTEM_RESET_KEYWORDS: tuple[str, ...] = (
@@ -34,6 +37,7 @@ class Intent(StrEnum):
 class RouteType(StrEnum):
     """定義路由類型，決定系統後續流程。"""
     FAST_COMMAND = "FAST_COMMAND"
+    LOCAL_QUERY = "LOCAL_QUERY"    # 設備狀態問題，先給 LocalQueryEngine 用模板回答
     LLM = "LLM"
 
 
@@ -41,13 +45,26 @@ class RouteType(StrEnum):
 class RouteDecision:
     route_type: RouteType
     intent: Intent
+    confidence: float = 1.0
 
 
 class IntentClassifier:
     """判斷使用者意圖，不負責流程分流。"""
 
-    def __init__(self) -> None:
-        """初始化意圖關鍵字(未來可擴充更多意圖和關鍵字以及補英文的Intent)。"""
+    def __init__(
+        self,
+        model: Any = None,
+        model_path=config.INTENT_MODEL_FILE,
+        min_prob: float = config.INTENT_MODEL_MIN_PROB,
+        use_model: bool = config.INTENT_MODEL_ENABLED,
+    ) -> None:
+        """初始化意圖關鍵字(未來可擴充更多意圖和關鍵字以及補英文的Intent)。
+        有訓練好的 n-gram 模型（intent_model.py）時優先用模型，機率太低才退回關鍵字。"""
+        self.model = model
+        self.model_path = model_path
+        self.min_prob = min_prob
+        self.use_model = use_model
+        self._model_checked = model is not None
         self.intent_keywords: dict[Intent, list[str]] = {
             Intent.SYSTEM: list(SYSTEM_RESET_KEYWORDS),
 
@@ -68,16 +85,43 @@ class IntentClassifier:
             ],
         }
 
-    def classify(self, user_input: str) -> Intent:
-        """根據關鍵字判斷使用者意圖，預設為 UNKNOWN。"""
+    def _get_model(self) -> Any:
+        """第一次用到時才載入模型檔；沒有 numpy 或還沒訓練就只用關鍵字。"""
+        if self._model_checked or not self.use_model:
+            return self.model
+        self._model_checked = True
+        try:
+            from src.core.intent_model import NGramIntentModel  # 避免循環 import
+            self.model = NGramIntentModel.load(self.model_path)
+        except FileNotFoundError:
+            print("尚未訓練意圖模型，改用關鍵字判斷（python -m src.core.intent_model train）")
+        except Exception as e:
+            print(f"載入意圖模型失敗，改用關鍵字判斷: {e}")
+        return self.model
+
+    def classify_with_confidence(self, user_input: str) -> tuple[Intent, float]:
+        """回傳 (intent, 機率)；關鍵字判斷的機率固定為 1.0 / 0.0。"""
         text = (user_input or "").strip().lower()
         if not text:
-            return Intent.UNKNOWN
+            return Intent.UNKNOWN, 0.0
+        # 清除記憶這種不可逆的指令只認關鍵字，不交給模型猜
+        if self.match_keyword(text, self.intent_keywords[Intent.SYSTEM]):
+            return Intent.SYSTEM, 1.0
+
+        model = self._get_model()
+        if model is not None:
+            intent, prob = model.predict(text)
+            if intent != Intent.SYSTEM and prob >= self.min_prob:
+                return intent, prob
 
         for intent, keywords in self.intent_keywords.items():
             if self.match_keyword(text, keywords):
-                return intent
-        return Intent.UNKNOWN
+                return intent, 1.0
+        return Intent.UNKNOWN, 0.0
+
+    def classify(self, user_input: str) -> Intent:
+        """判斷使用者意圖，預設為 UNKNOWN。"""
+        return self.classify_with_confidence(user_input)[0]
 
     def match_keyword(self, user_input: str, keywords: list[str]) -> bool:
         """判斷 user_input 是否包含 keywords 中的任一關鍵字，忽略大小寫。"""
@@ -94,19 +138,22 @@ class Router:
 
     def route(self, user_input: str) -> RouteDecision:
         """根據 user_input 判斷 intent 和 route_type，回傳 RouteDecision。"""
-        intent = self.classifier.classify(user_input)
+        intent, confidence = self.classifier.classify_with_confidence(user_input)
         route_type = self.get_route_type(user_input=user_input, intent=intent)
-        return RouteDecision(route_type=route_type, intent=intent)
+        return RouteDecision(route_type=route_type, intent=intent, confidence=confidence)
 
     def is_fast_command(self, user_input: str, intent: Intent | None = None) -> bool:
-        """判斷是否為快速指令，目前僅保留系統控制指令。"""
+        """判斷是否為快速指令：系統控制指令與設備控制。"""
         active_intent = intent or self.classifier.classify(user_input)
-        return active_intent == Intent.SYSTEM
+        return active_intent in (Intent.SYSTEM, Intent.DEVICE_CONTROL)
 
     def get_route_type(self, user_input: str, intent: Intent | None = None) -> RouteType:
-        """根據 intent 判斷 route_type，目前僅 SYSTEM 類型視為 FAST_COMMAND。"""
-        if self.is_fast_command(user_input=user_input, intent=intent):
+        """SYSTEM / DEVICE_CONTROL -> FAST_COMMAND，QUERY -> LOCAL_QUERY，其餘 -> LLM。"""
+        active_intent = intent or self.classifier.classify(user_input)
+        if self.is_fast_command(user_input=user_input, intent=active_intent):
             return RouteType.FAST_COMMAND
+        if active_intent == Intent.QUERY:
+            return RouteType.LOCAL_QUERY
         return RouteType.LLM
 
 #------------- 測試區域：直接執行此檔案可快速檢查分流結果。------------
@@ -125,7 +172,7 @@ if __name__ == "__main__":
     for text in test_inputs:
         decision = router.route(text)
         print(
-            f"input={text!r} | intent={decision.intent.value} | route={decision.route_type.value}"
+            f"input={text!r} | intent={decision.intent.value} ({decision.confidence:.2f}) | route={decision.route_type.value}"
         )
 
 """
@@ -163,7 +210,7 @@ if intent == QUERY:
 class Router 說明:
 (1) route
 輸入text eg: "把溫度調高一點"
-輸出 : FAST_COMMAND, LLM, CHAT, QUERY
+輸出 : RouteDecision(route_type=FAST_COMMAND / LOCAL_QUERY / LLM, intent, confidence)
 用途 : 決定系統下一步要怎麼做
 (2) is_fast_command
 判斷是否可以直接執行(parse_fastpath直接拿來用)
@@ -180,7 +227,10 @@ class IntentClassifier 說明:
 輸入text eg: "把溫度調高一點"
 輸出 : intent label eg: DEVICE_CONTROL、SMART_QUERY、CHAT、SYSTEM
 用途 : 判斷使用者意圖，讓系統知道使用者想做什
-(2) match_keyword
+(2) classify_with_confidence
+有訓練好的 n-gram 模型 (data/models/intent_nb.npz) 時用模型預測並回傳機率，
+機率低於 INTENT_MODEL_MIN_PROB 或沒有模型時退回關鍵字；SYSTEM 永遠只認關鍵字
+(3) match_keyword
 用 keyword 判斷 intent
 eg : 開燈、關燈、溫度、時間、天氣。回傳 intent label
 """
@@ -1,12 +1,17 @@
 from __future__ import annotations
 from typing import Any
 from pathlib import Path
+import atexit
 import json
 import os
 
+from src.utils.config import DATA_DIR, STATE_SAVE_DEBOUNCE_SEC
+from src.utils.file_io import atomic_write_text
+from src.utils.write_behind import WriteBehind
+
 
 class StateManager:
-    def __init__(self) -> None:
+    def __init__(self, state_file: Path | None = None, save_delay: float = STATE_SAVE_DEBOUNCE_SEC) -> None:
         """初始化變數內容(變數未來可擴充)"""
         self.conversation_active: bool = False
         self.awaiting_confirmation: bool = False
@@ -32,11 +37,14 @@ class StateManager:
         self.ambient_humidity: int | None = None
 
         # 設定儲存設備狀態的檔案路徑
-        project_root = Path(__file__).resolve().parent.parent.parent
-        self._state_dir = project_root / "data" / "memory" 
-        self._state_file = self._state_dir / "device_state.json"
+        self._state_file = Path(state_file) if state_file is not None else DATA_DIR / "memory" / "device_state.json"
+        self._state_dir = self._state_file.parent
         self.load_state()
 
+        # 狀態變更先記在記憶體，debounce 視窗內的多次變更合併成一次寫檔
+        self._persister = WriteBehind(self.save_state, delay=save_delay)
+        atexit.register(self.flush)
+
     def load_state(self) -> None:
         """從檔案讀取上次關機前的設備與溫度狀態"""
         if os.path.exists(self._state_file):
@@ -50,18 +58,21 @@ class StateManager:
                 print(f"讀取狀態檔失敗: {e}")
 
     def save_state(self) -> None:
-        """將當前最新的狀態寫入檔案保存"""
-        os.makedirs(os.path.dirname(self._state_file), exist_ok=True)
+        """將當前最新的狀態立即寫入檔案保存（temp 檔 + fsync + rename，斷電不會寫壞）"""
+        snapshot = {
+            "setpoint_temp": self.setpoint_temp,
+            "fan_state": self.fan_state,
+            "led_states": dict(self.led_states),
+        }
         try:
-            with open(self._state_file, "w", encoding="utf-8") as f:
-                json.dump({
-                    "setpoint_temp": self.setpoint_temp,
-                    "fan_state": self.fan_state,
-                    "led_states": self.led_states
-                }, f, ensure_ascii=False, indent=2)
+            atomic_write_text(str(self._state_file), json.dumps(snapshot, ensure_ascii=False, indent=2))
         except Exception as e:
             print(f"寫入狀態檔失敗: {e}")
 
+    def flush(self) -> None:
+        """把尚未寫出的狀態變更立即寫檔（關機前呼叫）"""
+        self._persister.flush()
+
     def get_state(self) -> dict[str, Any]:
         # 回傳快照，避免外部直接修改內部狀態
         return {
@@ -102,7 +113,7 @@ class StateManager:
                 print(f"警告：StateManager 沒有屬性 '{key}'，無法設定。")
 
         if needs_save:
-            self.save_state()
+            self._persister.mark_dirty()
     
     def reset_conversation(self) -> None:
         self.conversation_active = False
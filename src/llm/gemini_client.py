@@ -0,0 +1,176 @@
+# src/llm/gemini_client.py
+"""
+Shared, long-lived Gemini client for GeminiParser and LLMEngine.
+
+Both callers used to run load_dotenv() and build a new genai.Client on every
+request, which meant a fresh TLS/HTTP connection per voice turn. The provider
+builds the client once; the SDK's HTTP session (and its keep-alive
+connections) is then reused by every request. `prewarm()` can be called at
+startup so the first user turn does not pay the handshake either.
+
+`stats` exposes client creation / connection / request timings.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+import src.utils.config as config
+
+
+def _try_load_dotenv() -> None:
+    """Best-effort .env loading so GEMINI_API_KEY can be read from project env file."""
+    try:
+        from dotenv import load_dotenv  # type: ignore
+    except Exception:
+        return
+    load_dotenv(override=False)
+
+
+@dataclass(slots=True)
+class ClientStats:
+    """Timing counters (milliseconds) for the shared client."""
+
+    create_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    requests: int = 0
+    total_request_ms: float = 0.0
+    last_request_ms: Optional[float] = None
+    first_request_ms: Optional[float] = None
+    last_first_chunk_ms: Optional[float] = None
+
+    @property
+    def avg_request_ms(self) -> Optional[float]:
+        if not self.requests:
+            return None
+        return self.total_request_ms / self.requests
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "create_ms": self.create_ms,
+            "connect_ms": self.connect_ms,
+            "requests": self.requests,
+            "first_request_ms": self.first_request_ms,
+            "last_request_ms": self.last_request_ms,
+            "avg_request_ms": self.avg_request_ms,
+            "last_first_chunk_ms": self.last_first_chunk_ms,
+        }
+
+
+class GeminiClientProvider:
+    """Create the genai.Client once and hand out the same instance."""
+
+    def __init__(self, timeout_ms: int = config.GEMINI_TIMEOUT_MS) -> None:
+        self.timeout_ms = timeout_ms
+        self.stats = ClientStats()
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    def _create_client(self) -> Any:
+        _try_load_dotenv()
+        # Accept both names for compatibility with different SDK examples.
+        api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError(
+                "缺少 API KEY 環境變數！\n"
+                "請設定環境變數：\n"
+                "export GEMINI_API_KEY='你的API金鑰'\n"
+                "或\n"
+                "export GOOGLE_API_KEY='你的API金鑰'"
+            )
+        from google import genai
+
+        try:
+            from google.genai import types
+
+            http_options = types.HttpOptions(timeout=self.timeout_ms)
+            return genai.Client(api_key=api_key, http_options=http_options)
+        except (ImportError, AttributeError, TypeError):
+            return genai.Client(api_key=api_key)
+
+    def get(self) -> Any:
+        """Return the shared client, creating it on first use."""
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                start = time.perf_counter()
+                try:
+                    self._client = self._create_client()
+                except Exception as e:
+                    raise ValueError(f"初始化 Gemini client 失敗: {e}") from e
+                self.stats.create_ms = (time.perf_counter() - start) * 1000
+        return self._client
+
+    def reset(self) -> None:
+        """Drop the cached client (e.g. after the API key changed)."""
+        with self._lock:
+            self._client = None
+
+    def _record_request(self, elapsed_ms: float) -> None:
+        self.stats.requests += 1
+        self.stats.total_request_ms += elapsed_ms
+        self.stats.last_request_ms = elapsed_ms
+        if self.stats.first_request_ms is None:
+            self.stats.first_request_ms = elapsed_ms
+
+    def generate_content(self, model: str, contents: Any) -> Any:
+        """Timed wrapper around client.models.generate_content."""
+        client = self.get()
+        start = time.perf_counter()
+        try:
+            return client.models.generate_content(model=model, contents=contents)
+        finally:
+            self._record_request((time.perf_counter() - start) * 1000)
+
+    def generate_content_stream(self, model: str, contents: Any) -> Iterator[str]:
+        """Yield response text chunks; records time-to-first-chunk and total time."""
+        client = self.get()
+        start = time.perf_counter()
+        first = True
+        try:
+            for chunk in client.models.generate_content_stream(model=model, contents=contents):
+                if first:
+                    self.stats.last_first_chunk_ms = (time.perf_counter() - start) * 1000
+                    first = False
+                text = getattr(chunk, "text", "") or ""
+                if text:
+                    yield text
+        finally:
+            self._record_request((time.perf_counter() - start) * 1000)
+
+    def connect(self, model: str = config.GEMINI_MODEL) -> float:
+        """Open the pooled HTTPS connection with a cheap metadata call; returns elapsed ms."""
+        client = self.get()
+        start = time.perf_counter()
+        client.models.get(model=model)
+        self.stats.connect_ms = (time.perf_counter() - start) * 1000
+        return self.stats.connect_ms
+
+    def prewarm(self, background: bool = True) -> Optional[threading.Thread]:
+        """Create the client and open its connection, by default on a daemon thread."""
+
+        def _run() -> None:
+            try:
+                elapsed = self.connect()
+                print(f"✅ Gemini 連線預熱完成 ({elapsed:.0f} ms)")
+            except Exception as e:
+                print(f"⚠️ Gemini 連線預熱失敗（第一次請求時會再試）: {e}")
+
+        if not background:
+            _run()
+            return None
+        thread = threading.Thread(target=_run, name="gemini-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+
+DEFAULT_GEMINI_PROVIDER = GeminiClientProvider()
+
+
+def get_gemini_client() -> Any:
+    """Module-level shortcut for the shared client."""
+    return DEFAULT_GEMINI_PROVIDER.get()
@@ -6,43 +6,59 @@ import re
 from typing import Dict, Any
 
 from src.core.validator import validate_actions
+import src.utils.config as config
+from src.llm.gemini_client import DEFAULT_GEMINI_PROVIDER
+from src.llm.response_cache import DEFAULT_RESPONSE_CACHE, depends_on_context, state_fingerprint
+from src.llm.stream_reader import IncrementalPlanReader
+
+# LLM 沒給 reply 時的預設回覆（固定句，會被 src/audio/reply_cache.py 預先合成）
+DEFAULT_REPLY = "好的，已為您處理。"
 
 class LLMEngine:
     """
     通訊官：負責與 Google Gemini API 連線並解析 JSON。
     """
     
-    def __init__(self, prompt_builder):
+    def __init__(self, prompt_builder, client_provider=None, response_cache=None, use_cache=config.RESPONSE_CACHE_ENABLED, text_rewriter=None, learned_commands=None, use_learned=config.LEARNED_COMMANDS_ENABLED):
         self.prompt_builder = prompt_builder
+        # 共用的 Gemini client provider：client 只建一次，HTTP 連線可重複使用
+        self.client_provider = client_provider or DEFAULT_GEMINI_PROVIDER
+        # 回應快取：同一句話 + 相同設備狀態直接回傳上次的結果
+        self.response_cache = (response_cache if response_cache is not None else DEFAULT_RESPONSE_CACHE) if use_cache else None
+        self.text_rewriter = text_rewriter
+        # 學習指令表：同一句話被 LLM 反覆解成同樣的動作，就升級成 fastpath（None 代表用預設表）
+        self.learned_commands = learned_commands
+        self.use_learned = use_learned
         self._fence_re_1 = re.compile(r"^`{3}(?:json)?\s*", re.IGNORECASE)
         self._fence_re_2 = re.compile(r"\s*`{3}$", re.IGNORECASE)
 
-    def _try_load_dotenv(self) -> None:
-        try:
-            from dotenv import load_dotenv  # type: ignore
-        except Exception:
-            return
-        load_dotenv(override=False)
-
-    def get_adapter_responder(self, state_manager, action_executor = None):
+    def get_adapter_responder(self, state_manager, action_executor = None, on_sentence = None):
         """
         適配器模式 (Adapter Pattern)：
         將複雜的 generate_plan 封裝成 Agent 想要的簡單格式 (str, str) -> str。
+        有傳 on_sentence 時改走串流：reply 每完成一句就先交給語音層播放，
+        actions 陣列一結束就先執行，不必等整個回應生成完。
         """
         def responder(user_input: str, memory_context: str) -> str:
             # 1. 從 state_manager 抓取實時環境數據
             state = state_manager.get_state()
-            
-            # 2. 呼叫大腦引擎進行推理
-            result = self.generate_plan(
+            plan_kwargs = dict(
                 user_text=user_input,
                 device_status=str(state.get("led_states")), 
                 current_temp=state.get("setpoint_temp"),
                 memory_context="", 
                 history_context=memory_context,
                 ambient_temp=state.get("ambient_temp"),
-                ambient_humidity=state.get("ambient_humidity")
+                ambient_humidity=state.get("ambient_humidity"),
+                fan_state=state.get("fan_state"),
+                led_states=state.get("led_states"),
             )
+
+            # 2. 呼叫大腦引擎進行推理
+            if on_sentence is not None:
+                result = self.generate_plan_stream(**plan_kwargs, on_sentence=on_sentence, on_actions=action_executor)
+            else:
+                result = self.generate_plan(**plan_kwargs)
             # =====================================================================
             #【解決問題：LLM 說了要改溫度，但硬體與面板卻沒反應】
             # 發生原因：原本程式只把 LLM 的「回覆台詞 (reply)」拿去播放，
@@ -51,7 +67,7 @@ class LLMEngine:
             #          就立刻命令硬體與面板進行更新！
             # =====================================================================
             actions = result.get("actions", [])
-            if actions and action_executor:
+            if actions and action_executor and not result.get("actions_dispatched"):
                 action_executor(actions)
             
             # 副作用處理：將 LLM 產生的動作回存至狀態機
@@ -59,19 +75,12 @@ class LLMEngine:
             
             # 回傳總控官需要的純文字內容
             # 同時預防當沒有拿到 LLM 的回覆的時候，以「好的，已為您處理。」作為回覆
-            return result.get("reply", "好的，已為您處理。")
+            return result.get("reply", DEFAULT_REPLY)
         
         return responder
 
     def _get_gemini_client(self):
-        self._try_load_dotenv()
-        api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("系統找不到 GEMINI_API_KEY / GOOGLE_API_KEY 環境變數！")
-
-        from google import genai
-
-        return genai.Client(api_key=api_key)
+        return self.client_provider.get()
 
     def _strip_code_fences(self, s: str) -> str:
         s = (s or "").strip()
@@ -93,12 +102,12 @@ class LLMEngine:
         actions = [dict(a) for a in raw_actions if isinstance(a, dict)] if isinstance(raw_actions, list) else []
         return {
             "actions": validate_actions(actions),
-            "reply": str(data.get("reply") or "好的，已為您處理。"),
+            "reply": str(data.get("reply") or DEFAULT_REPLY),
             "intent": str(data.get("intent") or "command"),
         }
 
-    def generate_plan(self, user_text, device_status, current_temp, memory_context, history_context, ambient_temp=None, ambient_humidity=None) -> Dict[str, Any]:
-        prompt = self.prompt_builder.build_prompt(
+    def _build_prompt(self, user_text, device_status, current_temp, memory_context, history_context, ambient_temp=None, ambient_humidity=None) -> str:
+        return self.prompt_builder.build_prompt(
             user_text=user_text,
             device_status=device_status,
             current_temp=current_temp,
@@ -108,17 +117,110 @@ class LLMEngine:
             ambient_humidity=ambient_humidity
         )
 
+    def _rewrite(self, user_text: str) -> str:
+        if self.text_rewriter is None:
+            from src.core.parser.fastpath_parser import apply_memory_rules  # 避免循環 import
+            self.text_rewriter = apply_memory_rules
+        return self.text_rewriter(user_text)
+
+    def _cache_lookup(self, user_text, device_status, current_temp, ambient_temp, ambient_humidity, fan_state, led_states):
+        """回傳 (cache_text, fingerprint, cached_plan)；沒有啟用快取或是省略句時全部為 None。"""
+        if self.response_cache is None:
+            return None, None, None
+        # key 不含 history_context：「那廚房呢」這種接著上一輪的話不查也不存
+        if depends_on_context(user_text):
+            return None, None, None
+        cache_text = self._rewrite(user_text)
+        fingerprint = state_fingerprint(
+            current_temp,
+            fan_state,
+            led_states if led_states is not None else {"status": str(device_status)},
+            ambient_temp,
+            ambient_humidity,
+        )
+        return cache_text, fingerprint, self.response_cache.get(cache_text, fingerprint)
+
+    def _observe(self, user_text, result: Dict[str, Any], current_temp, fan_state, led_states) -> None:
+        if not self.use_learned:
+            return
+        if self.learned_commands is None:
+            from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS  # 避免循環 import
+            self.learned_commands = DEFAULT_LEARNED_COMMANDS
+        self.learned_commands.observe(self._rewrite(user_text), result.get("actions", []), result.get("intent"), current_temp, fan_state, led_states)
+
+    def _cache_store(self, cache_text, fingerprint, result: Dict[str, Any]) -> None:
+        if self.response_cache is not None and fingerprint is not None:
+            self.response_cache.put(cache_text, fingerprint, result)
+
+    def generate_plan_stream(self, user_text, device_status, current_temp, memory_context, history_context, ambient_temp=None, ambient_humidity=None, on_sentence=None, on_actions=None, fan_state=None, led_states=None) -> Dict[str, Any]:
+        """串流版 generate_plan：回傳格式相同，另外附上 streamed_sentences / actions_dispatched。"""
+        cache_text, fingerprint, cached = self._cache_lookup(user_text, device_status, current_temp, ambient_temp, ambient_humidity, fan_state, led_states)
+        if cached is not None:
+            # 快取重播不是新的 LLM 判斷，不算進學習表的一致次數
+            if cached["actions"] and on_actions is not None:
+                on_actions(cached["actions"])
+            if on_sentence is not None:
+                on_sentence(cached["reply"])
+            cached["actions_dispatched"] = on_actions is not None and bool(cached["actions"])
+            cached["streamed_sentences"] = [cached["reply"]] if on_sentence is not None else []
+            return cached
+
+        prompt = self._build_prompt(user_text, device_status, current_temp, memory_context, history_context, ambient_temp, ambient_humidity)
+        dispatched: list = []
+
+        def _actions_ready(raw_actions) -> None:
+            validated = validate_actions(raw_actions)
+            dispatched.append(validated)
+            if validated and on_actions is not None:
+                on_actions(validated)
+
+        reader = IncrementalPlanReader(on_sentence=on_sentence, on_actions=_actions_ready)
+        try:
+            for text in self.client_provider.generate_content_stream(
+                model=os.environ.get("GEMINI_MODEL", "gemini-2.5-flash"),
+                contents=prompt,
+            ):
+                reader.feed(text)
+            result = self._parse_response(reader.finish())
+            self._cache_store(cache_text, fingerprint, result)
+            self._observe(user_text, result, current_temp, fan_state, led_states)
+        except Exception as e:
+            reader.finish()
+            result = {
+                "actions": [],
+                "reply": f"抱歉，我目前無法連線到語意服務：{e}",
+                "intent": "gemini_error",
+            }
+        if reader.sentences and result["intent"] in ("json_parse_failed", "payload_not_object", "gemini_error"):
+            # 已經唸出去的句子才是使用者實際聽到的回覆
+            result["reply"] = reader.reply
+        if dispatched:
+            result["actions"] = dispatched[0]
+        result["actions_dispatched"] = bool(dispatched)
+        result["streamed_sentences"] = list(reader.sentences)
+        return result
+
+    def generate_plan(self, user_text, device_status, current_temp, memory_context, history_context, ambient_temp=None, ambient_humidity=None, fan_state=None, led_states=None) -> Dict[str, Any]:
+        cache_text, fingerprint, cached = self._cache_lookup(user_text, device_status, current_temp, ambient_temp, ambient_humidity, fan_state, led_states)
+        if cached is not None:
+            # 快取重播不是新的 LLM 判斷，不算進學習表的一致次數
+            return cached
+
+        prompt = self._build_prompt(user_text, device_status, current_temp, memory_context, history_context, ambient_temp, ambient_humidity)
+
         try:
-            client = self._get_gemini_client()
-            response = client.models.generate_content(
+            response = self.client_provider.generate_content(
                 model=os.environ.get("GEMINI_MODEL", "gemini-2.5-flash"),
                 contents=prompt,
             )
             response_text = getattr(response, "text", "") or ""
-            return self._parse_response(response_text)
+            result = self._parse_response(response_text)
+            self._cache_store(cache_text, fingerprint, result)
+            self._observe(user_text, result, current_temp, fan_state, led_states)
+            return result
         except Exception as e:
             return {
                 "actions": [],
                 "reply": f"抱歉，我目前無法連線到語意服務：{e}",
                 "intent": "gemini_error",
-            }
\ No newline at end of file
+            }
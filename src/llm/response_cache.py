@@ -0,0 +1,213 @@
+# src/llm/response_cache.py
+"""
+Response cache in front of the LLM (GeminiParser.parse / LLMEngine.generate_plan).
+
+Many utterances that miss the fastpath repeat every day ("好熱喔", "有點暗").
+Entries are keyed by the rule-rewritten, normalized user text plus a compact
+fingerprint of the device state the answer depends on:
+- device part: setpoint, fan, LED states (commands and queries),
+- ambient part: bucketed ambient temperature / humidity (queries only).
+A "query" answer is served only when both parts match; a "command" answer
+only needs the device part to match.
+
+Entries expire after `ttl_sec`, the table is LRU-capped at `max_entries` and
+persisted (write-behind, atomic) so the cache survives restarts.
+
+What is safe to cache: both prompts also carry the recent conversation, but
+the key does not. That is fine for self-contained utterances, whose answer
+only depends on the text and the state. Elliptical follow-ups ("那廚房呢",
+"再一次", "剛剛那個", "same again") are answered from the previous turn, so
+callers must check `depends_on_context()` and bypass the cache (no lookup,
+no store) for them.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from src.utils.config import (
+    RESPONSE_CACHE_AMBIENT_BUCKET,
+    RESPONSE_CACHE_FILE,
+    RESPONSE_CACHE_HUMIDITY_BUCKET,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SEC,
+    MEMORY_FLUSH_SEC,
+)
+from src.utils.file_io import atomic_write_text
+from src.utils.write_behind import WriteBehind
+
+CACHEABLE_INTENTS = ("command", "query")
+
+# 省略句 / 指涉上一輪的說法：答案取決於對話歷史，不能只用文字 + 狀態當 key
+CONTEXT_DEPENDENT_RE = re.compile(
+    r"呢\s*[?？]?\s*$|再一次|再來一次|再一遍|一樣|同樣|照舊|剛剛|剛才|那個|這個|上一個|上次|繼續|還是|也要|也開|也關|"
+    r"\bagain\b|\bsame\b|\bthat one\b|\bthe other\b|\bwhat about\b|\bhow about\b|\binstead\b|\btoo\b|\bprevious\b",
+    re.IGNORECASE,
+)
+
+
+def depends_on_context(text: str) -> bool:
+    """這句話是否要靠前一輪才能理解（「那廚房呢」「再一次」）；是的話不要走回應快取。"""
+    return bool(CONTEXT_DEPENDENT_RE.search(text or ""))
+
+
+def normalize_cache_text(text: str) -> str:
+    """Lowercase and drop whitespace/punctuation so "好熱喔！" == "好熱喔"."""
+    out = []
+    for ch in unicodedata.normalize("NFKC", text or "").lower():
+        cat = unicodedata.category(ch)
+        if ch.isspace() or cat.startswith("P"):
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def _bucket(value: Optional[float], size: float) -> str:
+    if value is None:
+        return "-"
+    try:
+        return str(int(float(value) // size))
+    except (TypeError, ValueError):
+        return "-"
+
+
+@dataclass(frozen=True, slots=True)
+class StateFingerprint:
+    device: str
+    ambient: str
+
+
+def state_fingerprint(
+    setpoint_temp: Optional[int],
+    fan_state: Optional[str] = None,
+    led_states: Optional[Dict[str, str]] = None,
+    ambient_temp: Optional[float] = None,
+    ambient_humidity: Optional[float] = None,
+) -> StateFingerprint:
+    """Compact fingerprint of the state an LLM answer may depend on."""
+    leds = led_states or {}
+    led_part = ",".join(f"{k}={leds[k]}" for k in sorted(leds))
+    device = f"sp={setpoint_temp}|fan={fan_state or '-'}|{led_part}"
+    ambient = (
+        f"t={_bucket(ambient_temp, RESPONSE_CACHE_AMBIENT_BUCKET)}"
+        f"|h={_bucket(ambient_humidity, RESPONSE_CACHE_HUMIDITY_BUCKET)}"
+    )
+    return StateFingerprint(device=device, ambient=ambient)
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    value: Dict[str, Any]
+    intent: str
+    ambient: str
+    created_at: float
+    hits: int = 0
+
+
+class ResponseCache:
+    """TTL + LRU cache of LLM plans, persisted to JSON."""
+
+    def __init__(
+        self,
+        path=RESPONSE_CACHE_FILE,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_sec: float = RESPONSE_CACHE_TTL_SEC,
+        flush_delay: float = MEMORY_FLUSH_SEC,
+    ) -> None:
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._persister = WriteBehind(self._save, delay=flush_delay)
+
+    # ---------- persistence ----------
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, raw in data.get("entries", []):
+                self._entries[key] = CacheEntry(**raw)
+        except Exception as e:
+            print(f"讀取回應快取失敗，改用空快取: {e}")
+            self._entries.clear()
+
+    def _save(self) -> None:
+        with self._lock:
+            payload = {"entries": [[k, asdict(e)] for k, e in self._entries.items()]}
+        atomic_write_text(self.path, json.dumps(payload, ensure_ascii=False))
+
+    def flush(self) -> None:
+        self._persister.flush()
+
+    # ---------- cache API ----------
+    @staticmethod
+    def make_key(text: str, fingerprint: StateFingerprint) -> str:
+        return f"{normalize_cache_text(text)}\x1f{fingerprint.device}"
+
+    def get(self, text: str, fingerprint: StateFingerprint) -> Optional[Dict[str, Any]]:
+        key = self.make_key(text, fingerprint)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created_at > self.ttl_sec:
+                del self._entries[key]
+                entry = None
+            if entry is not None and entry.intent == "query" and entry.ambient != fingerprint.ambient:
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return dict(entry.value, actions=[dict(a) for a in entry.value.get("actions", [])])
+
+    def put(self, text: str, fingerprint: StateFingerprint, value: Dict[str, Any]) -> bool:
+        """Store a plan ({actions, reply, intent}); only successful command/query plans are cached."""
+        intent = str(value.get("intent") or "")
+        if intent not in CACHEABLE_INTENTS or not value.get("reply") or not normalize_cache_text(text):
+            return False
+        stored = {
+            "actions": [dict(a) for a in value.get("actions", [])],
+            "reply": value.get("reply"),
+            "intent": intent,
+        }
+        key = self.make_key(text, fingerprint)
+        with self._lock:
+            self._load()
+            self._entries[key] = CacheEntry(stored, intent, fingerprint.ambient, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._persister.mark_dirty()
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded = True
+            self._entries.clear()
+        self._persister.mark_dirty()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+
+DEFAULT_RESPONSE_CACHE = ResponseCache()
@@ -0,0 +1,188 @@
+# src/llm/stream_reader.py
+"""
+Incremental reader for the streamed LLM plan JSON.
+
+The LLM answers with {"actions": [...], "reply": "...", "intent": "..."}.
+With a streaming response we do not want to wait for the closing brace:
+- every complete sentence of "reply" (split on ，。！？) is handed to
+  `on_sentence` while the rest is still being generated,
+- the "actions" array is decoded and handed to `on_actions` as soon as its
+  closing bracket arrives.
+
+The reader only tracks what it needs (nesting, strings, top-level key), so it
+tolerates code fences or chatter before the opening brace.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, List, Optional
+
+SENTENCE_BREAKS = "，。！？!?"
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class IncrementalPlanReader:
+    """Feed raw text chunks; callbacks fire as soon as each piece is complete."""
+
+    def __init__(
+        self,
+        on_sentence: Optional[Callable[[str], None]] = None,
+        on_actions: Optional[Callable[[List[dict[str, Any]]], None]] = None,
+        breaks: str = SENTENCE_BREAKS,
+    ) -> None:
+        self.on_sentence = on_sentence
+        self.on_actions = on_actions
+        self.breaks = breaks
+        self.sentences: List[str] = []
+        self.actions: Optional[List[dict[str, Any]]] = None
+        self._buf: List[str] = []
+        self._length = 0
+        self._started = False
+        self._stack: List[str] = []
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._chars: List[str] = []
+        self._pending: List[str] = []
+        self._actions_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """All raw text received so far."""
+        return "".join(self._buf)
+
+    @property
+    def reply(self) -> str:
+        return "".join(self.sentences) + "".join(self._pending)
+
+    # ---------- string handling ----------
+    def _in_reply(self) -> bool:
+        return len(self._stack) == 1 and self._key == "reply" and not self._string_is_key
+
+    def _emit_char(self, ch: str) -> None:
+        self._chars.append(ch)
+        if not self._in_reply():
+            return
+        self._pending.append(ch)
+        if ch in self.breaks:
+            self._emit_sentence()
+
+    def _emit_sentence(self) -> None:
+        sentence = "".join(self._pending).strip()
+        self._pending = []
+        if not sentence:
+            return
+        self.sentences.append(sentence)
+        if self.on_sentence is not None:
+            self.on_sentence(sentence)
+
+    def _string_char(self, ch: str) -> None:
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                try:
+                    self._emit_char(chr(int(self._unicode, 16)))
+                except ValueError:
+                    pass
+                self._unicode = None
+            return
+        if self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+            else:
+                self._emit_char(_ESCAPES.get(ch, ch))
+            return
+        if ch == "\\":
+            self._escape = True
+            return
+        if ch == '"':
+            self._in_string = False
+            if self._string_is_key and len(self._stack) == 1:
+                self._key = "".join(self._chars)
+            elif self._in_reply():
+                self._emit_sentence()
+            return
+        self._emit_char(ch)
+
+    # ---------- structure handling ----------
+    def _close_actions(self, end: int) -> None:
+        raw = "".join(self._buf)[self._actions_start:end]
+        self._actions_start = None
+        try:
+            data = json.loads(raw)
+        except Exception:
+            return
+        self.actions = [dict(a) for a in data if isinstance(a, dict)] if isinstance(data, list) else []
+        if self.on_actions is not None:
+            self.on_actions(self.actions)
+
+    def _structural_char(self, ch: str, pos: int) -> None:
+        if ch == '"':
+            self._in_string = True
+            self._string_is_key = bool(self._stack) and self._stack[-1] == "{" and self._expect_key
+            self._chars = []
+        elif ch == ":":
+            self._expect_key = False
+        elif ch == ",":
+            self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+        elif ch in "{[":
+            if ch == "[" and len(self._stack) == 1 and self._key == "actions":
+                self._actions_start = pos
+            self._stack.append(ch)
+            self._expect_key = ch == "{"
+        elif ch in "}]":
+            if self._stack:
+                self._stack.pop()
+            if ch == "]" and len(self._stack) == 1 and self._actions_start is not None:
+                self._close_actions(pos + 1)
+
+    # ---------- public API ----------
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        offset = self._length
+        self._buf.append(chunk)
+        self._length += len(chunk)
+        for i, ch in enumerate(chunk):
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+            if self._in_string:
+                self._string_char(ch)
+            else:
+                self._structural_char(ch, offset + i)
+
+    def finish(self) -> str:
+        """Flush any trailing reply text; returns the full raw text."""
+        self._emit_sentence()
+        return self.text
+
+
+if __name__ == "__main__":
+    # 測試區域：用假的串流（固定大小切塊 + 延遲）模擬 Gemini streaming 回應。
+    import time
+
+    fake_response = (
+        '```json\n{"actions": [{"type": "LED", "location": "LIVING", "state": "on"}], '
+        '"reply": "好的，已經幫您打開客廳燈。需要的話，我也可以調整溫度！", "intent": "command"}\n```'
+    )
+    t0 = time.perf_counter()
+
+    def _stamp() -> str:
+        return f"{(time.perf_counter() - t0) * 1000:6.1f} ms"
+
+    reader = IncrementalPlanReader(
+        on_sentence=lambda s: print(f"[{_stamp()}] sentence -> {s}"),
+        on_actions=lambda a: print(f"[{_stamp()}] actions  -> {a}"),
+    )
+    for i in range(0, len(fake_response), 7):
+        reader.feed(fake_response[i:i + 7])
+        time.sleep(0.01)
+    reader.finish()
+    print(f"[{_stamp()}] done, reply={reader.reply!r}")
@@ -26,14 +26,38 @@ try:
 except Exception:
     SpeechProcessor = None  # type: ignore[assignment]
 
+try:
+    from src.audio.tts_worker import PiperWorker, get_default_worker as get_default_tts_worker
+    from src.audio.reply_cache import canned_replies, get_default_reply_cache
+except Exception:
+    PiperWorker = None  # type: ignore[assignment]
+
+try:
+    from src.utils.whisper_local import DEFAULT_WHISPER_MANAGER
+except Exception:
+    DEFAULT_WHISPER_MANAGER = None  # type: ignore[assignment]
+
 from src.core.agent import SmartHomeAgent
 from src.core.memory_agent import MemoryAgent
+from src.core.escalation_policy import DEFAULT_ESCALATION_POLICY
 from src.core.parser import DEFAULT_PARSER
+from src.core.parser.learned_commands import DEFAULT_LEARNED_COMMANDS
 from src.core.router import Router
 from src.core.state_manager import StateManager
 from src.devices.device_controller import DeviceController
+from src.llm.gemini_client import DEFAULT_GEMINI_PROVIDER
 from src.llm.llm_engine import LLMEngine
+from src.llm.response_cache import DEFAULT_RESPONSE_CACHE
 from src.llm.prompt_builder import PromptBuilder
+from src.utils.config import TTS_CACHE_ENABLED, TTS_WORKER_ENABLED, WHISPER_PRELOAD_ENABLED
+
+
+# 主迴圈的固定提示句（也會交給回覆語音快取預先合成）
+SAY_READY = "系統已經啟動，隨時可以叫我。"
+SAY_SHUTDOWN = "系統關閉中，再見。"
+SAY_WAKE_ACK = "我在，請說！"
+SAY_INTERRUPTED = "強制中斷，系統關閉中。"
+MAIN_LOOP_PHRASES = (SAY_READY, SAY_WAKE_ACK, SAY_SHUTDOWN, SAY_INTERRUPTED)
 
 
 def _env_flag(name: str, default: bool) -> bool:
@@ -53,10 +77,13 @@ class ConsoleSpeech:
         print(f"🔊 [文字語音模擬]: {text}")
 
 
-def say(speech: Any, text: str, tts_enabled: bool) -> None:
+def say(speech: Any, text: str, tts_enabled: bool, wait: bool = True) -> None:
     if tts_enabled and hasattr(speech, "text_to_speech"):
         try:
-            speech.text_to_speech(text)
+            if wait or not hasattr(speech, "wait_speech_done"):
+                speech.text_to_speech(text)
+            else:
+                speech.text_to_speech(text, wait=False)
             return
         except Exception as e:
             print(f"⚠️ TTS 播放失敗，改為文字輸出: {e}")
@@ -110,6 +137,11 @@ else:
     wait_for_wake_word = None  # type: ignore
     HAS_WAKEWORD_ENGINE = False
 
+try:
+    from src.audio.wake_front_end import WakeWordFrontEnd
+except Exception:
+    WakeWordFrontEnd = None  # type: ignore[assignment]
+
 
 def is_wake_word(text: str) -> bool:
     clean = (text or "").strip().lower()
@@ -117,10 +149,11 @@ def is_wake_word(text: str) -> bool:
     return any(word in clean for word in wake_words)
 
 
-def collect_text_input(speech: Any, is_standby: bool, use_speech: bool = True) -> str:
+def collect_text_input(speech: Any, is_standby: bool, use_speech: bool = True, start: Optional[int] = None) -> str:
     """
-    主要輸入來源：SpeechProcessor（arecord + whisper）。
+    主要輸入來源：SpeechProcessor（sounddevice ring buffer / arecord + whisper）。
     use_speech=False 時直接走鍵盤，不嘗試語音辨識。
+    start：喚醒詞前端回報的 ring 位置，指令從那裡開始轉錄。
     """
     if is_standby:
         if use_speech:
@@ -136,7 +169,7 @@ def collect_text_input(speech: Any, is_standby: bool, use_speech: bool = True) -
     if use_speech:
         print("\n[🟢 聆聽中] 🗣️ 請說指令...", flush=True)
         try:
-            text = speech.speech_to_text()
+            text = speech.speech_to_text() if start is None else speech.speech_to_text(start=start)
             if text:
                 return text
         except Exception as e:
@@ -186,7 +219,9 @@ def main() -> None:
     speech_enabled = _env_flag("SPEECH_ENABLED", runtime_mode != "desktop")
     wakeword_enabled = _env_flag("WAKEWORD_ENABLED", runtime_mode != "desktop")
     tts_enabled = _env_flag("TTS_ENABLED", runtime_mode != "desktop")
+    streaming_enabled = _env_flag("LLM_STREAMING_ENABLED", True)
     sensors_enabled = _env_flag("DHT11_ENABLED", runtime_mode != "desktop")
+    whisper_preload = WHISPER_PRELOAD_ENABLED
 
     print(f"🔧 正在初始化系統... mode={runtime_mode}")
 
@@ -213,10 +248,33 @@ def main() -> None:
         wakeword_enabled = False
         tts_enabled = False
 
+    # Whisper 模型在背景載入 + 暖機，和下面的硬體初始化同時進行
+    whisper_manager = DEFAULT_WHISPER_MANAGER if speech_enabled and whisper_preload else None
+    if whisper_manager is not None:
+        whisper_manager.set_standby(True)
+        whisper_manager.preload()
+        whisper_manager.start_idle_monitor()
+
+    # Piper 行程與語音模型先載起來，第一句「系統已經啟動」就不用等
+    if tts_enabled and TTS_WORKER_ENABLED and PiperWorker is not None and PiperWorker.available():
+        try:
+            tts_worker = get_default_tts_worker()
+            tts_worker.prewarm()
+            # 固定回覆先合成進快取（worker 的低優先序 lane，要播的句子會插隊），fastpath 的回覆就能立刻播
+            if TTS_CACHE_ENABLED:
+                queued = get_default_reply_cache().prefill(canned_replies(MAIN_LOOP_PHRASES), tts_worker)
+                if queued:
+                    print(f"🔊 預先合成 {queued} 句固定回覆")
+        except Exception as e:
+            print(f"⚠️ Piper 預熱失敗（第一次播放時會再試）: {e}")
+
     prompt_builder = PromptBuilder()
-    llm = LLMEngine(prompt_builder=prompt_builder)
+    llm = LLMEngine(prompt_builder=prompt_builder, client_provider=DEFAULT_GEMINI_PROVIDER)
+    # 背景建立 Gemini client 並先握手，第一句話就不用等 TLS 連線
+    DEFAULT_GEMINI_PROVIDER.prewarm()
 
     device: Optional[DeviceController] = None
+    wake_front: Optional[Any] = None
 
     try:
         device = DeviceController()
@@ -229,7 +287,20 @@ def main() -> None:
             device.set_led(loc, st)
 
         action_executor = build_action_executor(device, state)
-        llm_responder = llm.get_adapter_responder(state, action_executor=action_executor)
+
+        # 串流模式：LLM 每生成完一句就先唸出來，最後就不用再唸整段 reply
+        streamed_sentences: List[str] = []
+
+        def speak_streamed_sentence(sentence: str) -> None:
+            streamed_sentences.append(sentence)
+            # 常駐 TTS worker 有佇列：排進去就回來繼續讀 LLM 串流，下一輪聆聽前再等播完
+            say(speech, sentence, tts_enabled, wait=False)
+
+        llm_responder = llm.get_adapter_responder(
+            state,
+            action_executor=action_executor,
+            on_sentence=speak_streamed_sentence if streaming_enabled else None,
+        )
 
         agent = SmartHomeAgent(
             router=router,
@@ -241,11 +312,15 @@ def main() -> None:
         )
 
         print("✅ 系統準備就緒！")
-        say(speech, "系統已經啟動，隨時可以叫我。", tts_enabled)
+        say(speech, SAY_READY, tts_enabled)
         print_dashboard(state)
 
         is_standby = True
         has_wakeword_engine = HAS_WAKEWORD_ENGINE and wakeword_enabled and speech_enabled
+        # 有常駐錄音串流時，喚醒詞跟指令共用同一條串流（不重開麥克風、指令第一個字不會漏）
+        if has_wakeword_engine and WakeWordFrontEnd is not None and getattr(speech, "capture", None) is not None:
+            wake_front = WakeWordFrontEnd(speech.capture)
+        command_start: Optional[int] = None
         use_speech_input = speech_enabled
         error_count = 0
         max_errors = 3
@@ -259,8 +334,23 @@ def main() -> None:
                     if env_hum is not None:
                         state.ambient_humidity = env_hum
 
-                if is_standby and has_wakeword_engine and wait_for_wake_word is not None:
+                if is_standby and has_wakeword_engine and wake_front is not None:
+                    print("\n[🟡 待機中] 麥克風喚醒詞監聽中 (HI MY PI)... ", end="", flush=True)
+                    wake_pos = wake_front.wait()
+                    if wake_pos is not None:
+                        print("[已偵測到喚醒詞]")
+                        user_input = "hi my pi"
+                        # 喚醒詞後面緊接著說了指令 → 不播提示，直接從 ring 裡的位置轉錄
+                        if wake_front.speech_follows(wake_pos):
+                            command_start = wake_front.command_start(wake_pos)
+                    else:
+                        wake_front = None  # 退回每次重開的 wait_for_wake_word
+                        continue
+                elif is_standby and has_wakeword_engine and wait_for_wake_word is not None:
                     print("\n[🟡 待機中] 麥克風喚醒詞監聽中 (HI MY PI)... ", end="", flush=True)
+                    # 喚醒詞引擎會自己開麥克風，先把常駐錄音串流讓出來
+                    if hasattr(speech, "close"):
+                        speech.close()
                     detected = wait_for_wake_word()
                     if detected:
                         print("[已偵測到喚醒詞]")
@@ -271,23 +361,30 @@ def main() -> None:
                         print("\n⚠️ 喚醒詞引擎不可用，改用鍵盤輸入模式。")
                         user_input = collect_text_input(speech, is_standby=True, use_speech=False)
                 else:
-                    user_input = collect_text_input(speech, is_standby=is_standby, use_speech=use_speech_input)
+                    user_input = collect_text_input(speech, is_standby=is_standby, use_speech=use_speech_input, start=command_start)
+                    command_start = None
 
                 clean_input = (user_input or "").strip()
                 if not clean_input:
                     continue
 
                 if clean_input.lower() in ["exit", "quit"]:
-                    say(speech, "系統關閉中，再見。", tts_enabled)
+                    say(speech, SAY_SHUTDOWN, tts_enabled)
                     break
 
                 if is_standby:
                     if is_wake_word(clean_input):
                         is_standby = False
-                        say(speech, "我在，請說！", tts_enabled)
+                        if whisper_manager is not None:
+                            # 閒置卸載過的話，趁使用者開口前重新載入
+                            whisper_manager.set_standby(False)
+                            whisper_manager.preload()
+                        if command_start is None:
+                            say(speech, SAY_WAKE_ACK, tts_enabled)
                     continue
 
                 print("\n🧠 Agent 思考中...")
+                streamed_sentences.clear()
                 result = agent.handle(
                     clean_input,
                     current_temp=state.setpoint_temp,
@@ -300,7 +397,8 @@ def main() -> None:
                     say(speech, result.error, tts_enabled)
                 else:
                     print(f"🔊 [語音回覆]: {result.reply}")
-                    say(speech, result.reply, tts_enabled)
+                    if not streamed_sentences:
+                        say(speech, result.reply, tts_enabled)
 
                 should_standby = any(
                     isinstance(action, dict) and action.get("type") == "ENTER_STANDBY"
@@ -308,14 +406,18 @@ def main() -> None:
                 )
 
                 print_dashboard(state)
+                if hasattr(speech, "wait_speech_done"):
+                    speech.wait_speech_done()
                 if should_standby:
                     is_standby = True
+                    if whisper_manager is not None:
+                        whisper_manager.set_standby(True)
                     print("💤 === 系統進入待機模式 ===")
 
                 error_count = 0
 
             except KeyboardInterrupt:
-                say(speech, "強制中斷，系統關閉中。", tts_enabled)
+                say(speech, SAY_INTERRUPTED, tts_enabled)
                 break
             except Exception as e:
                 error_count += 1
@@ -326,6 +428,22 @@ def main() -> None:
                 time.sleep(1)
 
     finally:
+        state.flush()
+        memory.flush()
+        DEFAULT_RESPONSE_CACHE.flush()
+        DEFAULT_ESCALATION_POLICY.dump()
+        DEFAULT_LEARNED_COMMANDS.flush()
+        if hasattr(speech, "close"):
+            speech.close()
+        if tts_enabled and TTS_WORKER_ENABLED and PiperWorker is not None and PiperWorker.available():
+            worker = get_default_tts_worker()
+            worker.wait_idle(timeout=5)  # 讓「系統關閉中，再見。」唸完
+            worker.close()
+        if wake_front is not None:
+            print(f"📊 喚醒詞前端 CPU: {wake_front.stats.as_dict()}")
+            wake_front.close()
+        if whisper_manager is not None and whisper_manager.stats["loads"]:
+            print(f"📊 Whisper 模型統計: {whisper_manager.stats}")
         if device is not None:
             try:
                 device.cleanup()
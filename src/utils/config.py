@@ -22,7 +22,8 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]  # 調整層級到 project 
 # parents[2] → /home/pi/project
 
 # data part
-DATA_DIR = PROJECT_ROOT / "data"
+# SMART_HOME_DATA_DIR 可以把整個 data/ 換到別的目錄（benchmark / 測試用，不動到正式資料）
+DATA_DIR = Path(os.getenv("SMART_HOME_DATA_DIR") or PROJECT_ROOT / "data")
 INPUT_FILE = DATA_DIR / "input.txt"
 OUTPUT_FILE = DATA_DIR / "output.txt"
 ACTIONS_FILE = DATA_DIR / "actions.txt"
@@ -41,6 +42,13 @@ SOUND_GET = AUDIO_DIR / "dong_ding.wav"
 # --- TTS (Piper 語音引擎) 設定 ---
 PIPER_DIR = PROJECT_ROOT / "piper"  
 PIPER_EXE = PIPER_DIR / "piper"
+# Resident Piper worker (src/audio/tts_worker.py); 0 = old per-sentence shell pipeline
+TTS_WORKER_ENABLED = os.getenv("TTS_WORKER_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+TTS_SENTENCE_TIMEOUT_SEC = 30.0  # 單句合成上限，超過就重啟 Piper
+# Pre-synthesized reply audio (src/audio/reply_cache.py): raw PCM keyed by (voice hash, text)
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+TTS_CACHE_DIR = DATA_DIR / "cache" / "tts"
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "50"))  # 超過就刪最久沒播的
 
 # 語音模型統一下載到 models 資料夾
 MODELS_DIR = DATA_DIR / "models"
@@ -48,16 +56,90 @@ TTS_MODEL = MODELS_DIR / "voice.onnx"
 
 HISTORY_KEEP = 5
 
+# short_term.json / long_term.jsonl write-behind window (seconds)
+MEMORY_FLUSH_SEC = float(os.getenv("MEMORY_FLUSH_SEC", "2.0"))
+
+# device_state.json write-behind window (seconds); 0 = write synchronously
+STATE_SAVE_DEBOUNCE_SEC = float(os.getenv("STATE_SAVE_DEBOUNCE_SEC", "0.5"))
+# history.jsonl is append-only; compact it back to HISTORY_KEEP lines once it
+# grows past HISTORY_KEEP * HISTORY_COMPACT_FACTOR lines
+HISTORY_COMPACT_FACTOR = 20
+
+# rules.json is cached in memory; how often (seconds) to stat it for external edits
+RULES_CHECK_INTERVAL_SEC = float(os.getenv("RULES_CHECK_INTERVAL_SEC", "1.0"))
+
 # whisper model settings (faster-whisper)
 # Use Hugging Face repo names for CTranslate2 models
 FASTER_WHISPER_MODEL = "base" 
 WHISPER_MODEL_NAME = FASTER_WHISPER_MODEL
+# Background preload / idle unload (WhisperModelManager in src/utils/whisper_local.py)
+WHISPER_PRELOAD_ENABLED = os.getenv("WHISPER_PRELOAD_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+WHISPER_WARMUP_ENABLED = os.getenv("WHISPER_WARMUP_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")  # 預載後用 1 秒靜音跑一次推論
+WHISPER_IDLE_UNLOAD_SEC = float(os.getenv("WHISPER_IDLE_UNLOAD_SEC", "1800"))  # 待機閒置多久卸載模型；0 = 永不卸載
 
 # 錄音配置 
 DEVICE_PORT = "plughw:3,0"           # 樹莓派錄音接口 (在終端機 arecord -l)
 RECORDING_DURATION = 5               # 錄音秒數
 LANGUAGE = "auto"                    # whisper 語言代碼 (中英適用)
+
+# In-memory capture (src/audio/capture.py): sounddevice -> ring buffer -> faster-whisper, no wav on disk
+AUDIO_CAPTURE_BACKEND = os.getenv("AUDIO_CAPTURE_BACKEND", "sounddevice").strip().lower()  # "sounddevice" | "arecord"
+AUDIO_INPUT_DEVICE = os.getenv("AUDIO_INPUT_DEVICE") or None  # PortAudio 裝置名稱或編號；None = 沿用 DEVICE_PORT 的 ALSA 卡（例如 "hw:3,0"）
+AUDIO_SAMPLE_RATE = 16000            # faster-whisper 直接吃 16 kHz mono float32
+AUDIO_BLOCK_MS = 30                  # callback 每塊長度
+AUDIO_RING_SEC = float(os.getenv("AUDIO_RING_SEC", "30"))  # ring buffer 保留的秒數（預先配置）
+AUDIO_ARCHIVE_ENABLED = os.getenv("AUDIO_ARCHIVE_ENABLED", "0").strip() not in ("0", "false", "False", "OFF", "off")  # 1 = 另存 recordings/latest.wav 供除錯
+
+# Energy/ZCR endpointing (src/audio/endpointer.py): stop recording as soon as the speaker stops
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")  # 0 = 固定錄 RECORDING_DURATION 秒
+VAD_FRAME_MS = 30
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "600"))                      # 說完後靜音多久算結束
+VAD_MAX_UTTERANCE_SEC = float(os.getenv("VAD_MAX_UTTERANCE_SEC", "10"))        # 最長錄音上限
+VAD_NO_SPEECH_TIMEOUT_SEC = float(os.getenv("VAD_NO_SPEECH_TIMEOUT_SEC", "5"))  # 一直沒人說話就放棄
+VAD_ENERGY_RATIO = float(os.getenv("VAD_ENERGY_RATIO", "3.0"))                 # RMS 超過噪音底幾倍算說話
+VAD_MIN_RMS = float(os.getenv("VAD_MIN_RMS", "0.005"))                         # 絕對下限，避免安靜房間誤觸
+VAD_ZCR_THRESHOLD = 0.25                                                       # 氣音的過零率門檻
+
+# Resident wake-word front end (src/audio/wake_front_end.py), shares the capture stream
+WAKE_FOLLOW_WINDOW_MS = int(os.getenv("WAKE_FOLLOW_WINDOW_MS", "500"))  # 喚醒詞後多久內接著說話就不播提示
+WAKE_SENSITIVITY = float(os.getenv("WAKE_SENSITIVITY", "0.5"))         # Porcupine sensitivity 0~1
+
 GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_TIMEOUT_MS = int(os.getenv("GEMINI_TIMEOUT_MS", "30000"))  # shared client HTTP timeout
+
+# Phonetic / typo-tolerant fastpath matching (src/core/parser/phonetic_index.py)
+PHONETIC_MATCH_ENABLED = os.getenv("PHONETIC_MATCH_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+PHONETIC_MIN_CONFIDENCE = float(os.getenv("PHONETIC_MIN_CONFIDENCE", "0.75"))  # below this, defer to Gemini
+PHONETIC_MAX_DISTANCE = int(os.getenv("PHONETIC_MAX_DISTANCE", "2"))            # max edit distance on pinyin/spelling
+
+# Fastpath escalation policy (src/core/escalation_policy.py)
+# score >= EXECUTE -> run locally; clarifiable ambiguity with enough coverage -> ask back; else -> LLM
+FASTPATH_EXECUTE_THRESHOLD = float(os.getenv("FASTPATH_EXECUTE_THRESHOLD", "0.7"))
+FASTPATH_CLARIFY_MIN_COVERAGE = float(os.getenv("FASTPATH_CLARIFY_MIN_COVERAGE", "0.5"))
+FASTPATH_AMBIGUITY_PENALTY = float(os.getenv("FASTPATH_AMBIGUITY_PENALTY", "0.3"))
+FASTPATH_STATS_FILE = DATA_DIR / "metrics" / "fastpath_decisions.json"
+
+# Learned fastpath commands distilled from repeated LLM resolutions (src/core/parser/learned_commands.py)
+LEARNED_COMMANDS_FILE = DATA_DIR / "memory" / "learned_commands.json"
+LEARNED_COMMANDS_ENABLED = os.getenv("LEARNED_COMMANDS_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+LEARNED_PROMOTE_AFTER = int(os.getenv("LEARNED_PROMOTE_AFTER", "3"))         # consistent LLM resolutions before promotion
+LEARNED_AUTO_PROMOTE = os.getenv("LEARNED_AUTO_PROMOTE", "1").strip() not in ("0", "false", "False", "OFF", "off")  # 0 = only propose
+LEARNED_MAX_ENTRIES = int(os.getenv("LEARNED_MAX_ENTRIES", "200"))
+LEARNED_CORRECTION_WINDOW_SEC = float(os.getenv("LEARNED_CORRECTION_WINDOW_SEC", "30"))  # "不對" within this window demotes
+LEARNED_MAX_TEXT_LEN = 40  # longer utterances rarely repeat verbatim
+
+# Local n-gram intent model (src/core/intent_model.py); retrain with: python -m src.core.intent_model train
+INTENT_MODEL_FILE = MODELS_DIR / "intent_nb.npz"
+INTENT_MODEL_ENABLED = os.getenv("INTENT_MODEL_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+INTENT_MODEL_MIN_PROB = float(os.getenv("INTENT_MODEL_MIN_PROB", "0.6"))  # below this, fall back to keyword lists
+
+# LLM response cache (src/llm/response_cache.py)
+RESPONSE_CACHE_FILE = DATA_DIR / "memory" / "response_cache.json"
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1").strip() not in ("0", "false", "False", "OFF", "off")
+RESPONSE_CACHE_TTL_SEC = float(os.getenv("RESPONSE_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+RESPONSE_CACHE_AMBIENT_BUCKET = 1.0   # °C per ambient-temperature bucket
+RESPONSE_CACHE_HUMIDITY_BUCKET = 5.0  # % per humidity bucket
 
 # -------------------------
 # Runtime mode
@@ -1,11 +1,11 @@
 # src/utils/file_io.py
 import os
 import json
-import time
 import re
+import tempfile
 from typing import List, Dict, Any, Tuple
 
-from src.utils.config import HISTORY_FILE, RULES_FILE, HISTORY_KEEP
+from src.utils.config import RULES_FILE
 
 def ensure_file(path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -27,54 +27,50 @@ def append_line_unique(path: str, line: str) -> None:
             f.write("\n")
         f.write(line)
 
+def atomic_write_text(path: str, content: str) -> None:
+    """Crash-safe overwrite: write a temp file, fsync, then rename over path."""
+    directory = os.path.dirname(str(path)) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+# history.jsonl is served by an in-memory ring (src.utils.history_store);
+# the functions below keep the old call signatures.
 def load_history() -> List[Dict[str, Any]]:
-    if not os.path.exists(HISTORY_FILE):
-        return []
-    out: List[Dict[str, Any]] = []
-    with open(HISTORY_FILE, "r", encoding="utf-8", errors="ignore") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                out.append(json.loads(ln))
-            except Exception:
-                continue
-    return out
+    from src.utils.history_store import DEFAULT_HISTORY_STORE  # 避免循環 import
+    return DEFAULT_HISTORY_STORE.records()
 
 def save_history(records: List[Dict[str, Any]]) -> None:
-    records = records[-HISTORY_KEEP:]
-    ensure_file(HISTORY_FILE)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        for r in records:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    from src.utils.history_store import DEFAULT_HISTORY_STORE  # 避免循環 import
+    DEFAULT_HISTORY_STORE.replace(records)
 
 def push_history(user_text: str, result: Any) -> None:
-    records = load_history()
-    records.append({"ts": int(time.time()), "user": user_text, "result": result})
-    save_history(records)
+    from src.utils.history_store import DEFAULT_HISTORY_STORE  # 避免循環 import
+    DEFAULT_HISTORY_STORE.push(user_text, result)
 
 def format_history_for_prompt() -> str:
-    records = load_history()[-HISTORY_KEEP:]
-    if not records:
-        return "(no recent history)"
-    lines = []
-    for r in records:
-        u = (r.get("user") or "").strip()
-        res = r.get("result")
-        lines.append(f"- user: {u}\n  parsed: {json.dumps(res, ensure_ascii=False)}")
-    return "\n".join(lines)
+    from src.utils.history_store import DEFAULT_HISTORY_STORE  # 避免循環 import
+    return DEFAULT_HISTORY_STORE.format_for_prompt()
 
 RULE_LINE_RE = re.compile(r"^RULE:\s*When user says '(.+?)', it means '(.+?)'\.\s*$")
 
-def load_rules() -> List[Tuple[str, str]]:
+def parse_rules(txt: str) -> List[Tuple[str, str]]:
     """
-    Parse memory.txt rule lines.
+    Parse rule lines out of the rules file content.
     """
-    ensure_file(RULES_FILE)
-    txt = read_text(RULES_FILE)
     rules: List[Tuple[str, str]] = []
-    for ln in txt.splitlines():
+    for ln in (txt or "").splitlines():
         ln = ln.strip()
         if not ln:
             continue
@@ -84,6 +80,14 @@ def load_rules() -> List[Tuple[str, str]]:
         rules.append((m.group(1), m.group(2)))
     return rules
 
+def load_rules() -> List[Tuple[str, str]]:
+    """
+    Parse memory.txt rule lines.
+    Uncached: hot paths should use src.utils.rule_store instead.
+    """
+    ensure_file(RULES_FILE)
+    return parse_rules(read_text(RULES_FILE))
+
 def write_text_file(path: str, content: str):
     """寫入文字檔（覆蓋模式）"""
     try:
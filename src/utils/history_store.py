@@ -0,0 +1,128 @@
+# src/utils/history_store.py
+"""
+In-memory ring for history.jsonl.
+
+The old push_history() parsed the whole file, appended one record and
+rewrote everything on every fastpath hit. HistoryStore instead:
+- loads the file once and keeps the last `keep` records in a deque,
+- appends each new record as one line (O(1), no rewrite),
+- compacts the file back to `keep` lines only after it has grown to
+  `keep * compact_factor` lines, using an atomic temp-file + rename so a
+  power cut leaves either the old or the new file.
+Readers (format_for_prompt) are served from memory.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, TextIO
+
+from src.utils.config import HISTORY_COMPACT_FACTOR, HISTORY_FILE, HISTORY_KEEP
+from src.utils.file_io import atomic_write_text
+
+
+class HistoryStore:
+    """Bounded history ring backed by an append-only jsonl file."""
+
+    def __init__(
+        self,
+        path=HISTORY_FILE,
+        keep: int = HISTORY_KEEP,
+        compact_factor: int = HISTORY_COMPACT_FACTOR,
+    ) -> None:
+        self.path = str(path)
+        self.keep = max(1, keep)
+        self.compact_at = self.keep * max(2, compact_factor)
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=self.keep)
+        self._lines_on_disk = 0
+        self._fh: Optional[TextIO] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ---------- load / compact ----------
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        needs_compact = False
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8", errors="ignore") as f:
+                raw = f.read()
+            # 最後一行沒有換行代表上次寫到一半就斷電，直接重寫一次修掉
+            needs_compact = bool(raw) and not raw.endswith("\n")
+            for ln in raw.splitlines():
+                ln = ln.strip()
+                if not ln:
+                    continue
+                self._lines_on_disk += 1
+                try:
+                    self._records.append(json.loads(ln))
+                except Exception:
+                    needs_compact = True
+        self._loaded = True
+        if needs_compact or self._lines_on_disk >= self.compact_at:
+            self._compact()
+
+    def _compact(self) -> None:
+        self._close_handle()
+        content = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self._records)
+        atomic_write_text(self.path, content)
+        self._lines_on_disk = len(self._records)
+
+    def _close_handle(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            finally:
+                self._fh = None
+
+    def _append_line(self, line: str) -> None:
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write(line + "\n")
+        self._fh.flush()
+        self._lines_on_disk += 1
+
+    # ---------- public API ----------
+    def push(self, user_text: str, result: Any) -> None:
+        record = {"ts": int(time.time()), "user": user_text, "result": result}
+        with self._lock:
+            self._load()
+            self._records.append(record)
+            self._append_line(json.dumps(record, ensure_ascii=False))
+            if self._lines_on_disk >= self.compact_at:
+                self._compact()
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._load()
+            return list(self._records)
+
+    def replace(self, records: List[Dict[str, Any]]) -> None:
+        """Overwrite the whole history (keeps only the last `keep` records)."""
+        with self._lock:
+            self._loaded = True
+            self._records.clear()
+            self._records.extend(records[-self.keep:])
+            self._compact()
+
+    def format_for_prompt(self) -> str:
+        records = self.records()
+        if not records:
+            return "(no recent history)"
+        lines = []
+        for r in records:
+            u = (r.get("user") or "").strip()
+            res = r.get("result")
+            lines.append(f"- user: {u}\n  parsed: {json.dumps(res, ensure_ascii=False)}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_handle()
+
+
+DEFAULT_HISTORY_STORE = HistoryStore()
@@ -0,0 +1,97 @@
+# src/utils/rule_store.py
+"""
+Process-wide cache for the learned rules in rules.json.
+
+`file_io.load_rules()` reads the file and re-runs RULE_LINE_RE on every call,
+which used to happen on every utterance (fastpath + gemini prompt). RuleStore
+parses the file once and only reloads it when:
+- the file's mtime/size changed (checked at most every `check_interval` sec), or
+- a writer (RuleLearner.learn) called `invalidate()`.
+
+`version` increases whenever the parsed rule set changes, so consumers can
+cache anything they compile from the rules and rebuild only when it moves.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+from src.utils.config import RULES_FILE, RULES_CHECK_INTERVAL_SEC
+from src.utils.file_io import ensure_file, parse_rules, read_text
+
+Rule = Tuple[str, str]
+
+
+class RuleStore:
+    """Compiled, mtime-invalidated view of one rules file."""
+
+    def __init__(self, path=RULES_FILE, check_interval: float = RULES_CHECK_INTERVAL_SEC) -> None:
+        self.path = str(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._text = ""
+        self._rules: Tuple[Rule, ...] = ()
+        self._version = 0
+        self._loaded = False
+
+    @property
+    def version(self) -> int:
+        """Bumped every time the parsed rules change."""
+        self._refresh()
+        return self._version
+
+    def _stat_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            signature = self._stat_signature()
+            if not force and self._loaded and signature == self._signature:
+                return
+            if signature is None:
+                ensure_file(self.path)
+                signature = self._stat_signature()
+            text = read_text(self.path)
+            rules = tuple(parse_rules(text))
+            self._signature = signature
+            self._text = text
+            if rules != self._rules or not self._loaded:
+                self._rules = rules
+                self._version += 1
+            self._loaded = True
+
+    def invalidate(self) -> None:
+        """Force a reload on next access (call after writing the rules file)."""
+        self._refresh(force=True)
+
+    def get_rules(self) -> Tuple[Rule, ...]:
+        """Return (trigger, meaning) pairs; the tuple object is stable until rules change."""
+        self._refresh()
+        return self._rules
+
+    def read_text(self, path=None) -> str:
+        """Drop-in for file_io.read_text that serves the rules file from cache."""
+        if path is not None and str(path) != self.path:
+            return read_text(str(path))
+        self._refresh()
+        return self._text
+
+
+DEFAULT_RULE_STORE = RuleStore()
+
+
+def get_rules() -> Tuple[Rule, ...]:
+    """Module-level shortcut for the default store."""
+    return DEFAULT_RULE_STORE.get_rules()
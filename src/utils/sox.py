@@ -8,7 +8,16 @@ import threading
 import itertools
 from pathlib import Path
 from typing import Optional
-from src.utils.config import RECORDINGS_DIR, INPUT_FILE, DEVICE_PORT, WHISPER_MODEL_NAME
+from src.utils.config import (
+    RECORDINGS_DIR,
+    INPUT_FILE,
+    DEVICE_PORT,
+    WHISPER_MODEL_NAME,
+    RECORDING_DURATION,
+    AUDIO_CAPTURE_BACKEND,
+    AUDIO_ARCHIVE_ENABLED,
+    VAD_ENABLED,
+)
 
 RECORDINGS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -100,26 +109,48 @@ def stt_pipeline(
     silence_threshold: float = 5.0, # 靜音門檻 (如果發現太容易斷掉，可以調大到 10.0 或 20.0)
     device: str = DEVICE_PORT,
     model_name: Optional[str] = None,
-    language: str = "auto"
+    language: str = "auto",
+    write_input: bool = AUDIO_ARCHIVE_ENABLED,  # input.txt 只在需要留存時才寫
+    duration: float = RECORDING_DURATION        # 關 VAD 時記憶體錄音的錄音長度
 ) -> str:
     """
     完整語音轉文字流程：
-    1. 錄音 → latest.wav
-    2. faster-whisper 轉錄
-    3. 寫入 input.txt(覆蓋)
+    1. 錄音：sounddevice 可用時錄進記憶體 ring buffer（VAD 偵測到停頓 silence_duration 秒就結束）；
+       否則 SoX → latest.wav
+    2. faster-whisper 轉錄（陣列或檔案）
+    3. write_input=True 時寫入 input.txt(覆蓋)
     返回辨識文字
     """
-    print(f"\n 請開始說話... (停頓 {silence_duration} 秒自動結束)")
-
-    # 步驟1：錄音（會覆蓋 latest.wav）
-    wav_path = record_with_sox(
-        silence_duration=silence_duration,
-        silence_threshold=silence_threshold,
-        device=device
-    )
-    if not wav_path:
-        #print("錄音失敗，無法繼續轉錄")
-        return ""
+    from src.audio.capture import CaptureEngine, get_default_capture  # 避免循環 import
+    from src.audio.endpointer import Endpointer
+
+    pcm = None
+    if AUDIO_CAPTURE_BACKEND == "sounddevice" and CaptureEngine.available():
+        try:
+            if VAD_ENABLED:
+                print(f"\n 請開始說話... (停頓 {silence_duration} 秒自動結束)")
+                res = get_default_capture().record_utterance(Endpointer(hangover_ms=int(silence_duration * 1000)))
+                if not res.has_speech:
+                    return ""
+                pcm = res.audio
+            else:
+                print(f"\n 請開始說話... (錄音 {duration} 秒)")
+                pcm = get_default_capture().record(duration)
+        except Exception as e:
+            print(f"記憶體錄音失敗，改用 SoX：{e}")
+
+    if pcm is None:
+        print(f"\n 請開始說話... (停頓 {silence_duration} 秒自動結束)")
+
+        # 步驟1：錄音（會覆蓋 latest.wav）
+        wav_path = record_with_sox(
+            silence_duration=silence_duration,
+            silence_threshold=silence_threshold,
+            device=device
+        )
+        if not wav_path:
+            #print("錄音失敗，無法繼續轉錄")
+            return ""
 
     # --- 👇錄音一結束，馬上播放「咚」👇 ---
     play_notification(SOUND_GET)
@@ -131,13 +162,20 @@ def stt_pipeline(
     spinner_thread.start()
 
     try:
-        from src.utils.whisper_local import transcribe_latest_wav
+        from src.utils.whisper_local import transcribe_array, transcribe_latest_wav
         from src.utils.file_io import write_text_file
 
-        text = transcribe_latest_wav(
-            model_name=model_name or WHISPER_MODEL_NAME,
-            language=language,
-        )
+        if pcm is not None:
+            text = transcribe_array(
+                pcm,
+                model_name=model_name or WHISPER_MODEL_NAME,
+                language=language,
+            )
+        else:
+            text = transcribe_latest_wav(
+                model_name=model_name or WHISPER_MODEL_NAME,
+                language=language,
+            )
 
         stop_event.set()
         spinner_thread.join()
@@ -149,8 +187,9 @@ def stt_pipeline(
         # 印出漂亮的使用者輸入提示
         print(f"👤 [你說]: {text}")
 
-        # 步驟3：寫入 input.txt
-        write_text_file(INPUT_FILE, text)
+        # 步驟3：寫入 input.txt（選用）
+        if write_input:
+            write_text_file(INPUT_FILE, text)
     
         return text
 
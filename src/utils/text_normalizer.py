@@ -0,0 +1,151 @@
+# src/utils/text_normalizer.py
+"""
+Per-turn text normalization in front of router / fastpath / rule applier.
+
+Whisper often returns Simplified characters ("开客厅灯") and full-width
+digits/letters ("２６度", "ｆａｎ"), which never match the Traditional
+keyword tables. The pipeline is table-driven and built once at import:
+1. NFKC width folding (full-width digits/letters/punctuation -> ASCII),
+2. Simplified -> Traditional for the command vocabulary (str.translate table),
+   then whole-word mappings for one-to-many characters ("以后" -> 以後 but
+   "皇后" stays, "哪里" -> 哪裡 but "公里" stays),
+3. punctuation / whitespace collapsing ("！！！" -> "!", "  " -> " ").
+
+SmartHomeAgent.handle calls `normalize()` once per turn; everything
+downstream sees the same normalized text.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, Optional
+
+# Simplified -> Traditional, limited to characters that appear in our command
+# vocabulary (devices, locations, verbs, question words, exit/reset words,
+# rule-teaching phrases). Single characters only, so str.translate can do it
+# in one pass. Characters that are also valid Traditional characters or map to
+# several Traditional ones (后/里/几/并/么/钟 ...) are NOT here: they only
+# convert inside the whole words of S2T_WORDS.
+S2T_CHARS: Dict[str, str] = {
+    # devices / locations
+    "灯": "燈", "风": "風", "厅": "廳", "厨": "廚", "门": "門", "气": "氣", "调": "調",
+    "温": "溫", "湿": "濕", "机": "機", "电": "電", "视": "視", "帘": "簾",
+    # verbs / states
+    "开": "開", "关": "關", "闭": "閉", "启": "啟", "设": "設", "将": "將", "帮": "幫",
+    "请": "請", "让": "讓", "给": "給", "变": "變", "减": "減", "强": "強", "热": "熱",
+    "凉": "涼", "执": "執", "处": "處", "着": "著", "转": "轉", "换": "換", "动": "動",
+    "点": "點", "两": "兩", "个": "個", "这": "這", "们": "們",
+    "静": "靜", "声": "聲", "响": "響",
+    # question / status words
+    "吗": "嗎", "态": "態", "状": "狀", "没": "沒", "现": "現", "为": "為", "时": "時",
+    "问": "問", "认": "認", "确": "確", "该": "該", "应": "應", "议": "議", "会": "會",
+    "间": "間", "号": "號", "询": "詢", "实": "實", "际": "際", "觉": "覺",
+    "谁": "誰", "闻": "聞", "钱": "錢", "样": "樣", "题": "題",
+    # connectives (clause splitting)
+    "还": "還", "与": "與", "顺": "順", "过": "過", "来": "來", "边": "邊", "对": "對", "从": "從",
+    # rules / memory / system / chat
+    "说": "說", "记": "記", "忆": "憶", "规": "規", "则": "則", "当": "當", "听": "聽",
+    "见": "見", "结": "結", "备": "備", "乐": "樂", "谢": "謝", "话": "話", "讲": "講",
+    "无": "無", "啰": "囉", "烦": "煩", "够": "夠", "试": "試", "错": "錯", "经": "經",
+}
+
+# Whole-word mappings applied after S2T_CHARS (keys are written with the other
+# characters already converted), for characters that must not be converted on
+# their own: 公里 / 皇后 / 茶几 stay as they are.
+S2T_WORDS: Dict[str, str] = {
+    # 后 -> 後
+    "以后": "以後", "然后": "然後", "之后": "之後", "后面": "後面", "最后": "最後", "稍后": "稍後", "后來": "後來",
+    # 里 -> 裡
+    "這里": "這裡", "那里": "那裡", "哪里": "哪裡", "里面": "裡面", "家里": "家裡", "屋里": "屋裡",
+    "房間里": "房間裡", "客廳里": "客廳裡", "廚房里": "廚房裡", "客房里": "客房裡",
+    # 几 -> 幾
+    "几度": "幾度", "几點": "幾點", "几個": "幾個", "几分": "幾分", "几號": "幾號", "几天": "幾天",
+    "几次": "幾次", "哪几": "哪幾", "好几": "好幾", "几乎": "幾乎",
+    # 并 -> 並
+    "并且": "並且", "并不": "並不", "并沒": "並沒",
+    # 么 -> 麼
+    "什么": "什麼", "怎么": "怎麼", "這么": "這麼", "那么": "那麼", "多么": "多麼", "要么": "要麼",
+    # 钟 -> 鐘
+    "點钟": "點鐘", "分钟": "分鐘", "钟头": "鐘頭",
+}
+
+# Characters NFKC leaves alone but we still want folded
+EXTRA_FOLD: Dict[str, str] = {
+    "〜": "~",   # wave dash
+    "〰": "~",
+    "‧": "·",
+}
+
+PUNCT_RUN_RE = re.compile(r"\.{3,}|([!?,.。、;:~])\1+")
+SPACE_RUN_RE = re.compile(r"\s+")
+
+
+def _build_word_re(mapping: Dict[str, str]) -> Optional["re.Pattern[str]"]:
+    if not mapping:
+        return None
+    return re.compile("|".join(re.escape(w) for w in sorted(mapping, key=len, reverse=True)))
+
+
+def _build_table(*maps: Dict[str, str]) -> Dict[int, str]:
+    table: Dict[int, str] = {}
+    for mapping in maps:
+        for src, dst in mapping.items():
+            if src != dst:
+                table[ord(src)] = dst
+    return table
+
+
+class TextNormalizer:
+    """NFKC width folding + S→T for the command vocabulary + punctuation collapsing."""
+
+    def __init__(
+        self,
+        s2t: Optional[Dict[str, str]] = None,
+        extra_fold: Optional[Dict[str, str]] = None,
+        s2t_words: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.s2t_table = _build_table(s2t if s2t is not None else S2T_CHARS)
+        self.s2t_words = dict(s2t_words if s2t_words is not None else S2T_WORDS)
+        self.s2t_word_re = _build_word_re(self.s2t_words)
+        self.fold_table = _build_table(extra_fold if extra_fold is not None else EXTRA_FOLD)
+
+    def fold_width(self, text: str) -> str:
+        if text.isascii():
+            return text
+        return unicodedata.normalize("NFKC", text).translate(self.fold_table)
+
+    def to_traditional(self, text: str) -> str:
+        text = text.translate(self.s2t_table)
+        if self.s2t_word_re is not None and not text.isascii():
+            text = self.s2t_word_re.sub(lambda m: self.s2t_words[m.group()], text)
+        return text
+
+    @staticmethod
+    def collapse(text: str) -> str:
+        text = PUNCT_RUN_RE.sub(lambda m: m.group(1) or "...", text)
+        return SPACE_RUN_RE.sub(" ", text).strip()
+
+    def normalize(self, text: str) -> str:
+        if not text:
+            return ""
+        return self.collapse(self.to_traditional(self.fold_width(text)))
+
+
+DEFAULT_TEXT_NORMALIZER = TextNormalizer()
+
+
+def normalize_text(text: str) -> str:
+    """Module-level shortcut for the shared normalizer."""
+    return DEFAULT_TEXT_NORMALIZER.normalize(text)
+
+
+if __name__ == "__main__":
+    # 測試區域：whisper 常見的簡體 / 全形輸出。
+    import time
+
+    samples = ["开客厅灯", "风扇关掉！！！", "温度调到２６度", "ｔｕｒｎ　ｏｎ　ｆａｎ", "客厅灯有开吗？？", "好热……",
+               "公里有多长", "皇后是谁", "然后关掉厨房里的灯", "现在几度", "为什么"]
+    for s in samples:
+        start = time.perf_counter()
+        out = normalize_text(s)
+        print(f"{s!r} -> {out!r} [{(time.perf_counter() - start) * 1e6:.1f} µs]")
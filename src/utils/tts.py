@@ -1,12 +1,13 @@
 # src/utils/tts.py
 import subprocess
 import os
-from src.utils.config import PIPER_EXE, TTS_MODEL
+from src.utils.config import PIPER_EXE, TTS_MODEL, TTS_WORKER_ENABLED
 
-def speak(text: str) -> None:
+def speak(text: str, wait: bool = True) -> None:
     """
     使用 Piper TTS 將文字轉為語音並播放。
     具備開發模式：若找不到引擎，僅印出文字。
+    wait=False 時排進佇列就返回（只有常駐 worker 支援）。
     """
     if not text:
         return
@@ -23,10 +24,28 @@ def speak(text: str) -> None:
         print("[系統提示] 未偵測到語音模型，請確認是否執行過 setup.sh。")
         return
 
+    # 常駐 Piper worker：模型只載入一次，句子直接走 pipe，不經過 shell
+    if TTS_WORKER_ENABLED:
+        from src.audio.tts_worker import get_default_worker  # 避免循環 import
+        get_default_worker().say(text, wait=wait)
+        return
+
     # 組合 Piper 與 aplay 播放指令 (適用於 Linux/樹莓派環境)
     command = f'echo "{text}" | {PIPER_EXE} --model {TTS_MODEL} --output-raw | aplay -r 22050 -f S16_LE -t raw -'
 
     try:
         subprocess.run(command, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except subprocess.CalledProcessError as e:
-        print(f"播放語音失敗: {e}")
\ No newline at end of file
+        print(f"播放語音失敗: {e}")
+
+def cancel_speech() -> None:
+    """停止正在播放與排隊中的語音（只對常駐 worker 有效）。"""
+    if TTS_WORKER_ENABLED:
+        from src.audio.tts_worker import get_default_worker  # 避免循環 import
+        get_default_worker().cancel()
+
+def wait_speech_done(timeout=None) -> None:
+    """等排隊中的語音全部播完（wait=False 排進去的句子）。"""
+    if TTS_WORKER_ENABLED:
+        from src.audio.tts_worker import get_default_worker  # 避免循環 import
+        get_default_worker().wait_idle(timeout)
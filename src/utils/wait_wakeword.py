@@ -17,28 +17,41 @@ PPN_PATHS = [
     BASE_DIR / "data" / "models" / "wakeword.ppn",
 ]
 
-def wait_for_wake_word():
+def create_porcupine(sensitivity: float = 0.5):
     """
-    阻塞程式，直到聽到指定的喚醒詞為止。
+    建立 Porcupine 喚醒詞引擎；套件、金鑰或 .ppn 缺一就印出原因並回傳 None。
+    （src/audio/wake_front_end.py 的常駐前端與下面的 wait_for_wake_word 共用）
     """
     access_key = os.getenv("PICOVOICE_API_KEY")
 
     try:
         import pvporcupine
-        import pyaudio
     except Exception as e:
         print(f"錯誤: 喚醒詞套件未安裝或不可用: {e}")
-        return False
+        return None
 
     if not access_key:
         print("錯誤: 找不到 PICOVOICE_API_KEY，請檢查 .env 檔案")
-        return False
+        return None
 
     # 檢查 .ppn 檔案是否存在（優先使用專案根目錄 models/）
     ppn_path = next((p for p in PPN_PATHS if p.exists()), None)
     if ppn_path is None:
         print("錯誤: 找不到 wakeword.ppn 模型檔")
         print(f"已檢查路徑: {PPN_PATHS[0]}、{PPN_PATHS[1]}")
+        return None
+
+    return pvporcupine.create(access_key=access_key, keyword_paths=[str(ppn_path)], sensitivities=[sensitivity])
+
+def wait_for_wake_word():
+    """
+    阻塞程式，直到聽到指定的喚醒詞為止。
+    （每次都重開 Porcupine 與 PyAudio；sounddevice 可用時 true_main 改用常駐的 WakeWordFrontEnd）
+    """
+    try:
+        import pyaudio
+    except Exception as e:
+        print(f"錯誤: 喚醒詞套件未安裝或不可用: {e}")
         return False
 
     porcupine = None
@@ -47,7 +60,9 @@ def wait_for_wake_word():
 
     try:
         # 初始化 Porcupine
-        porcupine = pvporcupine.create(access_key=access_key, keyword_paths=[str(ppn_path)])
+        porcupine = create_porcupine()
+        if porcupine is None:
+            return False
         pa = pyaudio.PyAudio()
 
         # 開啟麥克風串流
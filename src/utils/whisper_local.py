@@ -1,8 +1,15 @@
 from __future__ import annotations
+from concurrent.futures import Future
+from contextlib import contextmanager
 from functools import lru_cache
 from pathlib import Path
+import gc
 import os
-from typing import Optional
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
 
 try:
     from dotenv import load_dotenv
@@ -10,19 +17,24 @@ except Exception:
     def load_dotenv(*_args, **_kwargs):
         return False
 
-from src.utils.config import PROJECT_ROOT, WHISPER_MODEL_NAME
+from src.utils.config import (
+    PROJECT_ROOT,
+    WHISPER_MODEL_NAME,
+    WHISPER_IDLE_UNLOAD_SEC,
+    WHISPER_WARMUP_ENABLED,
+    AUDIO_SAMPLE_RATE,
+)
 
 load_dotenv()  # 載入 .env 的 HF_TOKEN（避免下載警告）
 
-@lru_cache(maxsize=2)
-def _get_model(
+def _load_model(
     model_name_or_path: str,
     device: str = "cpu",
     compute_type: str = "int8",
     cpu_threads: int = 4
 ) -> object:
     """
-    快取載入 faster-whisper 模型（避免每次轉錄都重新載入）
+    載入 faster-whisper 模型（不快取；快取交給 _get_model / WhisperModelManager）
     """
     try:
         from faster_whisper import WhisperModel
@@ -39,6 +51,201 @@ def _get_model(
         num_workers=1  # Pi 4 建議設 1，避免記憶體過載
     )
 
+@lru_cache(maxsize=2)
+def _get_model(
+    model_name_or_path: str,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    cpu_threads: int = 4
+) -> object:
+    """
+    快取載入 faster-whisper 模型（避免每次轉錄都重新載入）
+    """
+    return _load_model(model_name_or_path, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+def _rss_mb() -> Optional[float]:
+    """目前行程的常駐記憶體 (MB)；讀不到時回傳 None。"""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+class WhisperModelManager:
+    """
+    常駐的 Whisper 模型管理：
+    - preload()     : 背景執行緒載入模型 + 用一秒靜音跑一次推論暖機，回傳 readiness Future
+    - get() / use() : 取得模型（還沒載入就當場載入）
+    - 待機超過 idle_unload_sec 沒用到就卸載模型釋放 RAM，醒來再 preload()
+    - stats         : 載入 / 暖機時間與 RSS
+    """
+
+    def __init__(
+        self,
+        model_name: str = WHISPER_MODEL_NAME,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        cpu_threads: int = 4,
+        idle_unload_sec: float = WHISPER_IDLE_UNLOAD_SEC,
+        warmup: bool = WHISPER_WARMUP_ENABLED,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.idle_unload_sec = idle_unload_sec
+        self.warmup = warmup
+        self.stats: Dict[str, Any] = {
+            "loads": 0,
+            "unloads": 0,
+            "load_ms": None,
+            "warmup_ms": None,
+            "rss_before_mb": None,
+            "rss_after_mb": None,
+            "rss_after_unload_mb": None,
+        }
+        self._model: Any = None
+        self._future: Optional[Future] = None
+        self._lock = threading.RLock()
+        self._in_use = 0
+        self._last_used = time.monotonic()
+        self._standby = False
+        self._monitor: Optional[threading.Thread] = None
+
+    def matches(self, model_name: str, device: str, compute_type: str, cpu_threads: int) -> bool:
+        return (model_name, device, compute_type, cpu_threads) == (
+            self.model_name, self.device, self.compute_type, self.cpu_threads
+        )
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None and (self._future is None or self._future.done())
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            self.stats["rss_before_mb"] = _rss_mb()
+            t0 = time.perf_counter()
+            model = _load_model(self.model_name, device=self.device, compute_type=self.compute_type, cpu_threads=self.cpu_threads)
+            self.stats["load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            if self.warmup:
+                t0 = time.perf_counter()
+                silence = np.zeros(AUDIO_SAMPLE_RATE, dtype=np.float32)
+                segments, _info = model.transcribe(silence, beam_size=1, language="zh", vad_filter=False)
+                list(segments)  # segments 是 generator，要迭代才會真的跑推論
+                self.stats["warmup_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            self.stats["rss_after_mb"] = _rss_mb()
+            self.stats["loads"] += 1
+            self._model = model
+            self._last_used = time.monotonic()
+            return model
+
+    def preload(self, background: bool = True) -> Future:
+        """載入 + 暖機；回傳的 Future 完成時模型就緒（失敗時帶 exception）。"""
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return self._future
+            future: Future = Future()
+            if self._model is not None:
+                future.set_result(self._model)
+                self._future = future
+                return future
+            self._future = future
+
+        def _run() -> None:
+            try:
+                future.set_result(self._load())
+                print(f"✅ Whisper 模型就緒（載入 {self.stats['load_ms']} ms，暖機 {self.stats['warmup_ms']} ms，RSS {self.stats['rss_after_mb']} MB）")
+            except Exception as e:
+                print(f"⚠️ Whisper 模型預載失敗（第一次辨識時會再試）: {e}")
+                future.set_exception(e)
+
+        if background:
+            threading.Thread(target=_run, name="whisper-preload", daemon=True).start()
+        else:
+            _run()
+        return future
+
+    def get(self) -> Any:
+        """回傳已載入的模型；背景預載中就等它，還沒載入就當場載入。"""
+        future = self._future
+        if self._model is None and future is not None and not future.done():
+            try:
+                future.result()
+            except Exception:
+                pass
+        self._last_used = time.monotonic()
+        return self._model if self._model is not None else self._load()
+
+    @contextmanager
+    def use(self):
+        """轉錄期間持有模型，避免被閒置卸載。"""
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield self.get()
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._last_used = time.monotonic()
+
+    def set_standby(self, standby: bool) -> None:
+        """主迴圈進出待機時通知；只有待機中才會被閒置卸載。"""
+        self._standby = standby
+        if not standby:
+            self._last_used = time.monotonic()
+
+    def unload(self) -> bool:
+        with self._lock:
+            if self._model is None or self._in_use:
+                return False
+            self._model = None
+            self._future = None
+        gc.collect()
+        self.stats["unloads"] += 1
+        self.stats["rss_after_unload_mb"] = _rss_mb()
+        print(f"💤 Whisper 模型閒置已卸載（RSS {self.stats['rss_after_unload_mb']} MB）")
+        return True
+
+    def maybe_unload(self, now: Optional[float] = None) -> bool:
+        """待機且閒置超過 idle_unload_sec 就卸載；idle_unload_sec <= 0 代表永不卸載。"""
+        if self.idle_unload_sec <= 0 or not self._standby or self._model is None:
+            return False
+        now = time.monotonic() if now is None else now
+        if now - self._last_used < self.idle_unload_sec:
+            return False
+        return self.unload()
+
+    def start_idle_monitor(self, interval: Optional[float] = None) -> Optional[threading.Thread]:
+        """背景定期檢查閒置卸載（daemon thread，只啟動一次）。"""
+        if self.idle_unload_sec <= 0 or self._monitor is not None:
+            return self._monitor
+        interval = interval or max(5.0, min(60.0, self.idle_unload_sec / 4))
+
+        def _loop() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.maybe_unload()
+                except Exception as e:
+                    print(f"⚠️ Whisper 閒置卸載檢查失敗: {e}")
+
+        self._monitor = threading.Thread(target=_loop, name="whisper-idle", daemon=True)
+        self._monitor.start()
+        return self._monitor
+
+
+DEFAULT_WHISPER_MANAGER = WhisperModelManager()
+
 def _normalize_language(language: Optional[str]) -> Optional[str]:
     if language is None:
         return None
@@ -67,6 +274,58 @@ def transcribe_latest_wav(
     if not os.path.exists(input_wav):
         raise FileNotFoundError(f"找不到音檔：{input_wav}")
 
+    return _run_transcribe(
+        input_wav,
+        model_name=model_name,
+        language=language,
+        threads=threads,
+        device=device,
+        compute_type=compute_type,
+        beam_size=beam_size,
+        best_of=best_of,
+        vad_filter=vad_filter,
+    )
+
+def transcribe_array(
+    audio,                                     # 16 kHz mono float32 NumPy 陣列
+    model_name: Optional[str] = None,
+    language: str = "auto",
+    threads: int = 4,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    beam_size: int = 3,
+    best_of: int = 3,
+    vad_filter: bool = True
+) -> str:
+    """
+    直接轉錄記憶體中的 PCM（src/audio/capture.py 錄到的陣列），不經過 wav 檔
+    """
+    if audio is None or len(audio) == 0:
+        return "[無辨識結果]"
+
+    return _run_transcribe(
+        audio,
+        model_name=model_name,
+        language=language,
+        threads=threads,
+        device=device,
+        compute_type=compute_type,
+        beam_size=beam_size,
+        best_of=best_of,
+        vad_filter=vad_filter,
+    )
+
+def _run_transcribe(
+    source,                                    # wav 路徑或 float32 陣列，faster-whisper 兩者都吃
+    model_name: Optional[str],
+    language: str,
+    threads: int,
+    device: str,
+    compute_type: str,
+    beam_size: int,
+    best_of: int,
+    vad_filter: bool
+) -> str:
     # 預設使用設定檔中的模型（Hugging Face repo 名稱或本地路徑）
     if model_name is None:
         model_name = WHISPER_MODEL_NAME
@@ -78,32 +337,36 @@ def transcribe_latest_wav(
     else:
         print(f"使用本地模型路徑：{model_name}")
 
-    model = _get_model(
-        model_name,
-        device=device,
-        compute_type=compute_type,
-        cpu_threads=threads
-    )
-
     normalized_language = _normalize_language(language)
 
-    try:
-        segments, info = model.transcribe(
-            input_wav,
-            beam_size=beam_size,
-            best_of=best_of,
-            language=normalized_language,
-            vad_filter=vad_filter,
-            vad_parameters=dict(min_silence_duration_ms=500),  # 靜音超過 0.5 秒切段
-            condition_on_previous_text=True,                    # 用前文上下文
-            word_timestamps=False                               # 不需要單字時間戳
-        )
+    with _model_for(model_name, device, compute_type, threads) as model:
+        try:
+            segments, info = model.transcribe(
+                source,
+                beam_size=beam_size,
+                best_of=best_of,
+                language=normalized_language,
+                vad_filter=vad_filter,
+                vad_parameters=dict(min_silence_duration_ms=500),  # 靜音超過 0.5 秒切段
+                condition_on_previous_text=True,                    # 用前文上下文
+                word_timestamps=False                               # 不需要單字時間戳
+            )
 
-        text_parts = [seg.text.strip() for seg in segments if seg.text and seg.text.strip()]
-        text = " ".join(text_parts).strip()
+            # segments 是 generator，推論在迭代時才跑，所以要留在 with 裡面
+            text_parts = [seg.text.strip() for seg in segments if seg.text and seg.text.strip()]
+            text = " ".join(text_parts).strip()
 
-        #print(f"偵測語言：{info.language}，信心：{info.language_probability:.2f}")
-        return text if text else "[無辨識結果]"
+            #print(f"偵測語言：{info.language}，信心：{info.language_probability:.2f}")
+            return text if text else "[無辨識結果]"
 
-    except Exception as e:
-        raise RuntimeError(f"轉錄過程錯誤：{str(e)}")
\ No newline at end of file
+        except Exception as e:
+            raise RuntimeError(f"轉錄過程錯誤：{str(e)}")
+
+@contextmanager
+def _model_for(model_name: str, device: str, compute_type: str, threads: int):
+    """設定與預設管理器相同就用常駐模型（可被預載 / 閒置卸載），否則走 lru 快取"""
+    if DEFAULT_WHISPER_MANAGER.matches(model_name, device, compute_type, threads):
+        with DEFAULT_WHISPER_MANAGER.use() as model:
+            yield model
+    else:
+        yield _get_model(model_name, device=device, compute_type=compute_type, cpu_threads=threads)
@@ -0,0 +1,64 @@
+# src/utils/write_behind.py
+"""
+Debounced write-behind helper.
+
+Callers mark their in-memory data dirty as often as they like; the injected
+`write_fn` runs at most once per `delay` window on a background timer, or
+immediately on `flush()`. With delay <= 0 every mark writes synchronously.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Callable, Optional
+
+
+class WriteBehind:
+    """Coalesce many `mark_dirty()` calls into one `write_fn()` call."""
+
+    def __init__(self, write_fn: Callable[[], None], delay: float) -> None:
+        self.write_fn = write_fn
+        self.delay = delay
+        self.writes = 0
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self) -> None:
+        with self._lock:
+            self._dirty = True
+            if self.delay <= 0:
+                self._write_locked()
+                return
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._write_locked()
+
+    def _write_locked(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            self.write_fn()
+            self.writes += 1
+        except Exception as e:
+            # 寫入失敗時保留 dirty，下次 mark/flush 再試
+            self._dirty = True
+            print(f"背景寫入失敗: {e}")
+
+    def flush(self) -> None:
+        """Cancel the pending timer and write now if anything is dirty."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write_locked()